@@ -2,6 +2,9 @@
 Custom JWT authentication that works with or without 'Bearer' prefix.
 """
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from . import user_cache
+from .tokens import ROLES_CLAIM, VERSION_CLAIM, check_not_revoked, check_token_version
 
 
 class FlexibleJWTAuthentication(JWTAuthentication):
@@ -11,6 +14,13 @@ class FlexibleJWTAuthentication(JWTAuthentication):
     Accepts:
     - Authorization: Bearer <token>
     - Authorization: <token>
+
+    Tokens carrying role claims are checked against the user's
+    token_version, and their roles are memoized on the user so role
+    checks during the request cost no queries. The user itself comes from
+    a short-lived cache (apps/accounts/user_cache.py) when possible.
+    Revoked tokens (logout) are rejected via the in-memory revocation
+    filter, which only queries on a probable hit.
     """
     
     def get_header(self, request):
@@ -22,3 +32,37 @@ class FlexibleJWTAuthentication(JWTAuthentication):
             header = b'Bearer ' + header
         
         return header
+
+    def get_validated_token(self, raw_token):
+        """Validate the token and reject it if it has been revoked."""
+        validated_token = super().get_validated_token(raw_token)
+        check_not_revoked(validated_token)
+        return validated_token
+
+    def get_user(self, validated_token):
+        """Resolve the user, reject revoked role claims and memoize the roles."""
+        user = self._cached_user(validated_token)
+        if user is None:
+            user = super().get_user(validated_token)
+            check_token_version(validated_token, user)
+            user_cache.cache_user(user)
+        roles = validated_token.get(ROLES_CLAIM)
+        if roles is not None:
+            user.set_group_names(roles)
+        return user
+
+    def _cached_user(self, validated_token):
+        """
+        The cached user for a versioned token, or None. Entries only exist
+        for active users and are dropped when the user is saved, so a hit
+        needs no further checks. Tokens without a version, and deployments
+        that revoke tokens on password change (CHECK_REVOKE_TOKEN, which
+        needs the password hash), always load from the database.
+        """
+        version = validated_token.get(VERSION_CLAIM)
+        if version is None or api_settings.CHECK_REVOKE_TOKEN:
+            return None
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return None
+        return user_cache.cached_user(user_id, version)
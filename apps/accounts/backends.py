@@ -0,0 +1,31 @@
+"""
+Authentication backend for email logins.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashing import hash_password, verify_password
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    ModelBackend with a case-insensitive email lookup (served by the
+    lower(email) unique index) and password checks on the hashing pool.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so the response time doesn't reveal whether the email is registered
+            hash_password(password)
+            return None
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,26 @@
+"""
+Cached lookups of role groups by name.
+
+Registration adds every new user to Members; resolving the group id from
+the cache instead of get_or_create() saves a query per sign-up. The
+accounts signals drop the cache whenever a group is saved or deleted.
+"""
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+
+KEY = 'accounts:group_ids'
+TIMEOUT = 3600
+
+
+def group_id(name):
+    """Id of the named group, creating the group if needed."""
+    ids = cache.get(KEY) or {}
+    if name not in ids:
+        ids = {**ids, name: Group.objects.get_or_create(name=name)[0].pk}
+        cache.set(KEY, ids, TIMEOUT)
+    return ids[name]
+
+
+def forget_group_ids():
+    """Drop all cached group ids."""
+    cache.delete(KEY)
@@ -0,0 +1,80 @@
+"""
+Password hashing on a bounded worker pool.
+
+A PBKDF2 hash takes most of a login or registration request, and it runs
+in C with the GIL released. Hashing on a fixed pool of
+PASSWORD_HASH_WORKERS threads caps how many hashes run at once, so a burst
+of logins cannot take every core from the requests being served alongside
+it. Once PASSWORD_HASH_QUEUE requests are already waiting for the pool,
+further ones are refused with 503 instead of piling up behind it.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins at the moment. Please retry shortly.'
+    default_code = 'hashing_busy'
+
+
+class HashingPool:
+    """Per-process pool of hashing threads with a bounded wait queue."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.slots = None
+
+    def _start(self):
+        with self.lock:
+            if self.executor is None:
+                workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or min(4, os.cpu_count() or 1)
+                queue = getattr(settings, 'PASSWORD_HASH_QUEUE', 64)
+                self.slots = threading.BoundedSemaphore(workers + queue)
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+
+    def restart(self):
+        """Stop the pool; the next run() starts a new one from the current settings."""
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True)
+            self.executor = self.slots = None
+
+    def run(self, func, *args):
+        """Run func(*args) on the pool and return its result; HashingBusy if the queue is full."""
+        if self.executor is None:
+            self._start()
+        if not self.slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            return self.executor.submit(func, *args).result()
+        finally:
+            self.slots.release()
+
+
+pool = HashingPool()
+
+
+def hash_password(password):
+    """make_password() on the pool."""
+    return pool.run(hashers.make_password, password)
+
+
+def verify_password(user, password):
+    """
+    user.check_password() with the hash checked on the pool. A hash that
+    needs upgrading (new iteration count or hasher) is rehashed and saved.
+    """
+    upgrade = []
+    valid = pool.run(hashers.check_password, password, user.password, upgrade.append)
+    if valid and upgrade:
+        user.password = hash_password(password)
+        user.save(update_fields=['password'])
+    return valid
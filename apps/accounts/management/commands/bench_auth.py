@@ -0,0 +1,185 @@
+"""
+Management command to benchmark login and registration under bursts.
+
+Worker threads fire bursts of login and register requests through the
+real views (RegisterView, the JWT login view), all starting together on a
+barrier the way sign-ups arrive at semester start, then pause and repeat.
+Reports throughput, latency percentiles and outcomes, including 503s from
+the password hashing pool shedding load. Pass --workers to compare pool
+sizes. Throttles are off for the run, so any 429 reported is a bug.
+
+Example:
+    python manage.py bench_auth --threads 32 --duration 20 --burst 5 --register-ratio 0.3
+"""
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from apps.accounts.groups import group_id
+from apps.accounts.hashing import pool
+from apps.accounts.models import User
+from apps.accounts.views import RegisterView
+from apps.loans.management.commands.bench_borrow_concurrency import percentile, throttled_count, unthrottled
+
+PASSWORD = 'BenchPass123!'
+
+
+class Command(BaseCommand):
+    help = 'Burst benchmark for the login and registration path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent clients (default: 16)')
+        parser.add_argument('--duration', type=float, default=10.0, help='Run time in seconds (default: 10)')
+        parser.add_argument('--burst', type=int, default=5, help='Requests per client per burst (default: 5)')
+        parser.add_argument('--pause-ms', type=float, default=200.0, help='Pause between bursts in ms (default: 200)')
+        parser.add_argument(
+            '--register-ratio', type=float, default=0.3,
+            help='Share of requests that register a new user instead of logging in (default: 0.3)'
+        )
+        parser.add_argument('--users', type=int, default=200, help='Existing accounts used for logins (default: 200)')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing pool size (default: PASSWORD_HASH_WORKERS)')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark users')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                'Not running on PostgreSQL: SQLite serialises writers, so registration numbers will be pessimistic.'
+            ))
+
+        run_id = uuid.uuid4().hex[:8]
+        emails = self._setup(run_id, options['users'])
+        self.stdout.write(
+            f'Run {run_id}: {options["threads"]} threads, {options["duration"]}s, bursts of {options["burst"]}, '
+            f'{options["register_ratio"]:.0%} registrations'
+        )
+
+        overrides = {}
+        if options['workers'] is not None:
+            overrides['PASSWORD_HASH_WORKERS'] = options['workers']
+        latencies = {'login': [], 'register': []}
+        outcomes = Counter()
+        lock = threading.Lock()
+        barrier = threading.Barrier(options['threads'])
+        deadline = time.monotonic() + options['duration']
+
+        with override_settings(**overrides), unthrottled():
+            # A fresh pool so --workers takes effect
+            pool.restart()
+            workers = [
+                threading.Thread(
+                    target=self._worker,
+                    args=(run_id, index, emails, options, deadline, barrier, latencies, outcomes, lock),
+                )
+                for index in range(options['threads'])
+            ]
+            started = time.monotonic()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.monotonic() - started
+            pool.restart()
+
+        self._report(elapsed, latencies, outcomes)
+
+        if not options['keep']:
+            User.objects.filter(email__endswith=f'@bench-{run_id}.local').delete()
+
+    def _setup(self, run_id, count):
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create([
+            User(email=f'user{i}@bench-{run_id}.local', username=f'bench-{run_id}-{i}', password=password)
+            for i in range(count)
+        ])
+        members = group_id('Members')
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=user.pk, group_id=members) for user in users
+        ])
+        return [user.email for user in users]
+
+    def _worker(self, run_id, index, emails, options, deadline, barrier, latencies, outcomes, lock):
+        factory = APIRequestFactory()
+        login_view = TokenObtainPairView.as_view()
+        register_view = RegisterView.as_view()
+        rng = random.Random()
+        local_latencies = {'login': [], 'register': []}
+        local_outcomes = Counter()
+        sequence = 0
+
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    barrier.wait(timeout=options['duration'])
+                except threading.BrokenBarrierError:
+                    # Another worker passed the deadline; finish unsynchronised
+                    pass
+                for _ in range(options['burst']):
+                    if rng.random() < options['register_ratio']:
+                        sequence += 1
+                        kind = 'register'
+                        request = factory.post('/api/auth/register/', {
+                            'email': f'new-{index}-{sequence}@bench-{run_id}.local',
+                            'username': f'bench-{run_id}-new-{index}-{sequence}',
+                            'password': PASSWORD, 'password_confirm': PASSWORD,
+                            'first_name': 'Bench', 'last_name': 'User',
+                        }, format='json')
+                        view = register_view
+                    else:
+                        kind = 'login'
+                        request = factory.post(
+                            '/api/auth/login/', {'email': rng.choice(emails), 'password': PASSWORD}, format='json'
+                        )
+                        view = login_view
+                    status_code, elapsed = self._call(view, request)
+                    local_latencies[kind].append(elapsed)
+                    local_outcomes[f'{kind} {status_code}'] += 1
+                time.sleep(options['pause_ms'] / 1000)
+            barrier.abort()
+        finally:
+            connections.close_all()
+
+        with lock:
+            for kind, values in local_latencies.items():
+                latencies[kind].extend(values)
+            outcomes.update(local_outcomes)
+
+    def _call(self, view, request):
+        started = time.perf_counter()
+        try:
+            status_code = view(request).status_code
+        except Exception as exc:  # database is locked, ...
+            status_code = type(exc).__name__
+        return status_code, time.perf_counter() - started
+
+    def _report(self, elapsed, latencies, outcomes):
+        total = sum(len(values) for values in latencies.values())
+        succeeded = outcomes.get('login 200', 0) + outcomes.get('register 201', 0)
+        shed = outcomes.get('login 503', 0) + outcomes.get('register 503', 0)
+
+        self.stdout.write('')
+        self.stdout.write(f'Elapsed:          {elapsed:.2f}s')
+        self.stdout.write(f'Requests:         {total} ({total / elapsed:.1f} req/s)')
+        self.stdout.write(f'Succeeded:        {succeeded} ({succeeded / elapsed:.1f} req/s)')
+        self.stdout.write(f'Shed (503):       {shed}')
+        for kind, values in latencies.items():
+            if values:
+                self.stdout.write(
+                    f'{kind.capitalize():<8} latency:  p50 {percentile(values, 50) * 1000:.1f}ms  '
+                    f'p99 {percentile(values, 99) * 1000:.1f}ms  max {max(values) * 1000:.1f}ms'
+                )
+        self.stdout.write('Outcomes:')
+        for outcome, count in sorted(outcomes.items(), key=lambda item: str(item[0])):
+            self.stdout.write(f'  {outcome}: {count}')
+        if throttled_count(outcomes):
+            self.stdout.write(self.style.WARNING(
+                f'{throttled_count(outcomes)} requests were throttled (429); the numbers include rejected requests.'
+            ))
@@ -0,0 +1,235 @@
+"""
+Management command to bulk-import users from CSV or JSON.
+
+Rows are read as a stream and processed in batches. Each batch is
+validated, checked against existing emails (case-insensitively) and
+usernames in two queries, hashed on a process pool, and written with one
+bulk insert of users plus one bulk insert of their group memberships.
+Rows that fail are reported with their line number and skipped; the rest
+are imported.
+
+Columns / keys: email (required), username (defaults to the email),
+first_name, last_name, password (optional; without one the account gets
+an unusable password and must be reset), role (Members or Administrators,
+defaults to --role). Administrators are also added to Members, like
+accounts created through the API.
+
+Example:
+    python manage.py import_users students.csv --batch-size 1000 --processes 8
+    python manage.py import_users staff.jsonl --role Administrators --dry-run
+"""
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from apps.accounts.groups import group_id
+from apps.accounts.models import User
+
+ROLES = {'members': 'Members', 'administrators': 'Administrators'}
+# Groups each role is added to
+ROLE_GROUPS = {'Members': ['Members'], 'Administrators': ['Members', 'Administrators']}
+
+
+def read_rows(path):
+    """Yield (line number, row dict) from a CSV, JSON Lines or JSON array file."""
+    suffix = path.suffix.lower()
+    with path.open(newline='', encoding='utf-8-sig') as handle:
+        if suffix == '.csv':
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, row
+        elif suffix in ('.jsonl', '.ndjson'):
+            for line_num, line in enumerate(handle, start=1):
+                if line.strip():
+                    try:
+                        yield line_num, json.loads(line)
+                    except json.JSONDecodeError:
+                        # Reported as a bad row by the caller
+                        yield line_num, None
+        elif suffix == '.json':
+            # A JSON array can't be streamed with the standard library;
+            # prefer JSON Lines for very large files
+            for index, row in enumerate(json.load(handle), start=1):
+                yield index, row
+        else:
+            raise CommandError(f'Unsupported file type {suffix!r}: use .csv, .jsonl or .json')
+
+
+class Command(BaseCommand):
+    help = 'Bulk-import users from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path, help='CSV (.csv), JSON Lines (.jsonl) or JSON array (.json) file')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per batch (default: 1000)')
+        parser.add_argument(
+            '--processes', type=int, default=os.cpu_count() or 1,
+            help='Password hashing processes; 1 hashes inline (default: CPU count)'
+        )
+        parser.add_argument(
+            '--role', default='Members', choices=sorted(ROLE_GROUPS),
+            help='Role for rows without a role column (default: Members)'
+        )
+        parser.add_argument('--skip-password-validation', action='store_true', help='Accept passwords that fail AUTH_PASSWORD_VALIDATORS')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without writing')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.exists():
+            raise CommandError(f'File not found: {path}')
+
+        self.options = options
+        self.group_ids = {name: group_id(name) for name in ('Members', 'Administrators')}
+        self.seen_emails = set()
+        self.seen_usernames = set()
+        imported = failed = processed = 0
+
+        pool = None
+        if options['processes'] > 1:
+            # Workers set Django up themselves in case they are spawned rather than forked
+            pool = ProcessPoolExecutor(max_workers=options['processes'], initializer=django.setup)
+        try:
+            rows = read_rows(path)
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                created, errors = self._import_batch(batch, pool)
+                for line_num, message in errors:
+                    self.stderr.write(f'line {line_num}: {message}')
+                processed += len(batch)
+                imported += created
+                failed += len(errors)
+                self.stdout.write(f'Processed {processed} rows: {imported} imported, {failed} failed')
+        except (ValueError, csv.Error) as e:
+            raise CommandError(f'Could not read {path} after {processed} rows: {e}')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f'{verb} {imported} users; {failed} rows failed.'))
+
+    def _import_batch(self, batch, pool):
+        """Validate, hash and insert one batch. Returns (users created, [(line, error)])."""
+        candidates, errors = [], []
+        for line_num, row in batch:
+            try:
+                candidates.append((line_num, self._clean(row)))
+            except ValidationError as e:
+                errors.append((line_num, '; '.join(e.messages)))
+
+        candidates, taken = self._drop_existing(candidates)
+        errors.extend(taken)
+        if not candidates or self.options['dry_run']:
+            return len(candidates), sorted(errors)
+
+        passwords = [data.pop('password') for _, data in candidates]
+        if pool is not None:
+            chunksize = max(1, len(passwords) // (self.options['processes'] * 4))
+            hashes = list(pool.map(make_password, passwords, chunksize=chunksize))
+        else:
+            hashes = [make_password(password) for password in passwords]
+
+        users, roles = [], []
+        for (_, data), encoded in zip(candidates, hashes):
+            roles.append(data.pop('role'))
+            users.append(User(password=encoded, **data))
+
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                User.groups.through.objects.bulk_create([
+                    User.groups.through(user_id=user.pk, group_id=self.group_ids[name])
+                    for user, role in zip(users, roles)
+                    for name in ROLE_GROUPS[role]
+                ])
+        except IntegrityError:
+            # Someone registered one of these emails or usernames since the
+            # duplicate check; report the whole batch rather than guess
+            return 0, sorted(errors + [
+                (line_num, 'batch rejected: an email or username was taken during the import')
+                for line_num, _ in candidates
+            ])
+        return len(users), sorted(errors)
+
+    def _clean(self, row):
+        """Validate and normalize one row, raising ValidationError."""
+        if not isinstance(row, dict):
+            raise ValidationError('row is not a JSON object')
+        email = User.objects.normalize_email((row.get('email') or '').strip())
+        if not email:
+            raise ValidationError('email: this field is required')
+        try:
+            validate_email(email)
+        except ValidationError:
+            raise ValidationError(f'email: {email!r} is not a valid email address')
+        username = User.normalize_username((row.get('username') or '').strip() or email)
+        try:
+            User._meta.get_field('username').run_validators(username)
+        except ValidationError as e:
+            raise ValidationError([f'username: {message}' for message in e.messages])
+
+        role_value = (row.get('role') or '').strip()
+        role = ROLES.get(role_value.lower()) if role_value else self.options['role']
+        if role is None:
+            raise ValidationError(f'role: {role_value!r} is not one of {", ".join(sorted(ROLE_GROUPS))}')
+
+        password = row.get('password') or None
+        if password is not None and not self.options['skip_password_validation']:
+            try:
+                validate_password(password, User(email=email, username=username))
+            except ValidationError as e:
+                raise ValidationError([f'password: {message}' for message in e.messages])
+
+        email_key = email.lower()
+        if email_key in self.seen_emails:
+            raise ValidationError(f'email: {email} appears earlier in the file')
+        if username in self.seen_usernames:
+            raise ValidationError(f'username: {username} appears earlier in the file')
+        self.seen_emails.add(email_key)
+        self.seen_usernames.add(username)
+
+        return {
+            'email': email,
+            'username': username,
+            'first_name': (row.get('first_name') or '').strip()[:150],
+            'last_name': (row.get('last_name') or '').strip()[:150],
+            'password': password,
+            'role': role,
+        }
+
+    def _drop_existing(self, candidates):
+        """Split off rows whose email or username is already registered (two queries per batch)."""
+        if not candidates:
+            return candidates, []
+        existing_emails = set(
+            User.objects.alias(email_lower=Lower('email'))
+            .filter(email_lower__in=[data['email'].lower() for _, data in candidates])
+            .values_list(Lower('email'), flat=True)
+        )
+        existing_usernames = set(
+            User.objects.filter(username__in=[data['username'] for _, data in candidates])
+            .values_list('username', flat=True)
+        )
+        kept, errors = [], []
+        for line_num, data in candidates:
+            if data['email'].lower() in existing_emails:
+                errors.append((line_num, f'email: {data["email"]} is already registered'))
+            elif data['username'] in existing_usernames:
+                errors.append((line_num, f'username: {data["username"]} is already taken'))
+            else:
+                kept.append((line_num, data))
+        return kept, errors
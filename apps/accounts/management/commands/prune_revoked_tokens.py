@@ -0,0 +1,16 @@
+"""
+Management command to delete expired token revocations.
+An expired token is rejected anyway, so its revocation record can go.
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked token records whose tokens have expired'
+
+    def handle(self, *args, **options):
+        from apps.accounts.models import RevokedToken
+
+        deleted, _ = RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired token revocations.'))
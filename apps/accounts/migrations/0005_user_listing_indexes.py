@@ -0,0 +1,39 @@
+# Generated by Django 4.2.17 on 2026-10-19 08:10
+
+from django.db import migrations, models
+
+SEARCH_FIELDS = ['email', 'username', 'first_name', 'last_name']
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in SEARCH_FIELDS:
+        # Matches the LOWER(field) LIKE '%term%' filter in apps/accounts/search.py
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS users_{field}_trgm_idx ON users USING gin (LOWER({field}) gin_trgm_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS users_{field}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_email_lower_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-created_at', '-id'], name='users_recent_idx'),
+        ),
+        # Trigram indexes for the admin user search (PostgreSQL only)
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
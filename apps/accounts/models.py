@@ -2,8 +2,23 @@
 Accounts app models.
 Extended User model with Django Groups integration.
 """
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
 from django.db import models
+from django.db.models.functions import Lower
+
+from .user_cache import invalidate
+
+
+class UserManager(DjangoUserManager):
+    """User manager with case-insensitive email lookups."""
+
+    def get_by_natural_key(self, email):
+        """Find a user by email regardless of case, using the lower(email) index."""
+        return self.alias(email_lower=Lower('email')).get(email_lower=email.lower())
+
+    def email_taken(self, email):
+        """Whether any user has this email, ignoring case."""
+        return self.alias(email_lower=Lower('email')).filter(email_lower=email.lower()).exists()
 
 
 class User(AbstractUser):
@@ -16,23 +31,102 @@ class User(AbstractUser):
     email = models.EmailField(unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on role changes; tokens issued with an older version are revoked
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    objects = UserManager()
+
     class Meta:
         db_table = 'users'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(Lower('email'), name='users_email_lower_uniq'),
+        ]
+        indexes = [
+            # Admin listing cursor order (apps/accounts/pagination.py)
+            models.Index(fields=['-created_at', '-id'], name='users_recent_idx'),
+        ]
+
+    @property
+    def group_names(self):
+        """
+        Names of the user's groups, loaded once per instance.
+        Uses prefetch_related('groups') when present, so listing users does
+        not query per row. The memo is cleared when the groups change.
+        """
+        if '_group_names' not in self.__dict__:
+            prefetched = getattr(self, '_prefetched_objects_cache', {})
+            if 'groups' in prefetched:
+                names = {group.name for group in prefetched['groups']}
+            else:
+                names = set(self.groups.values_list('name', flat=True))
+            self.__dict__['_group_names'] = frozenset(names)
+        return self.__dict__['_group_names']
+
+    def set_groups(self, groups):
+        """
+        Replace the user's groups in one pass and revoke their role claims
+        once. groups.set() would remove and then add, firing the m2m signal
+        (and its token_version bump) twice.
+        """
+        Membership = User.groups.through
+        prefetched = getattr(self, '_prefetched_objects_cache', {}).pop('groups', None)
+        if prefetched is not None:
+            current = {group.pk for group in prefetched}
+        else:
+            current = set(Membership.objects.filter(user_id=self.pk).values_list('group_id', flat=True))
+        wanted = {group.pk for group in groups}
+        if wanted == current:
+            return
+
+        Membership.objects.filter(user_id=self.pk, group_id__in=current - wanted).delete()
+        Membership.objects.bulk_create(
+            [Membership(user_id=self.pk, group_id=group_id) for group_id in wanted - current]
+        )
+        User.objects.filter(pk=self.pk).update(token_version=models.F('token_version') + 1)
+        self.token_version += 1
+        invalidate(self.pk)
+        self.set_group_names(group.name for group in groups)
+
+    def set_group_names(self, names):
+        """Memoize group names from a trusted source (verified token claims)."""
+        self.__dict__['_group_names'] = frozenset(names)
+
+    def clear_group_cache(self):
+        """Forget the memoized group names."""
+        self.__dict__.pop('_group_names', None)
 
     @property
     def is_administrator(self):
         """Check if user belongs to Administrators group."""
-        return self.groups.filter(name='Administrators').exists()
+        return 'Administrators' in self.group_names
 
     @property
     def is_member(self):
         """Check if user belongs to Members group."""
-        return self.groups.filter(name='Members').exists()
+        return 'Members' in self.group_names
 
     def __str__(self):
         return self.email
+
+
+class RevokedToken(models.Model):
+    """
+    A revoked JWT, by jti. Rows are the durable record behind the in-memory
+    revocation filter (apps/accounts/revocation.py) and can be pruned once
+    the token has expired.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    token_type = models.CharField(max_length=16)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='revoked_tokens')
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'revoked_tokens'
+
+    def __str__(self):
+        return f'{self.token_type} {self.jti}'
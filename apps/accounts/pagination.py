@@ -0,0 +1,21 @@
+"""
+Accounts app pagination.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    """
+    Newest-first cursor pagination for the admin user listing.
+
+    Each page is a range scan on users_recent_idx from the cursor
+    position, so the last page of 100k users costs the same as the first.
+
+    Query parameters:
+    - cursor: Opaque position from the next/previous links
+    - page_size: Items per page (default: 50, max: 200)
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
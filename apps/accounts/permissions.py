@@ -13,7 +13,7 @@ class IsAdministrator(BasePermission):
     def has_permission(self, request, view):
         return (
             request.user.is_authenticated and
-            request.user.groups.filter(name='Administrators').exists()
+            request.user.is_administrator
         )
 
 
@@ -36,7 +36,7 @@ class IsAdministratorOrReadOnly(BasePermission):
             return True
         return (
             request.user.is_authenticated and
-            request.user.groups.filter(name='Administrators').exists()
+            request.user.is_administrator
         )
 
 
@@ -46,7 +46,7 @@ class IsOwnerOrAdministrator(BasePermission):
     """
     def has_object_permission(self, request, view, obj):
         # Administrators have full access
-        if request.user.groups.filter(name='Administrators').exists():
+        if request.user.is_authenticated and request.user.is_administrator:
             return True
         # Check if the object belongs to the user
         return hasattr(obj, 'user') and obj.user == request.user
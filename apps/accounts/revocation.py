@@ -0,0 +1,176 @@
+"""
+JWT revocation.
+
+Revoked token ids (jti) are stored in the revoked_tokens table. Checking
+that table on every request would cost a query, so each process keeps a
+Bloom filter of the revoked ids and only asks the database when the
+filter reports a probable hit. A miss is definitive: a Bloom filter has no
+false negatives.
+
+The filter is rebuilt from the table on first use and every
+REVOCATION_REBUILD_INTERVAL seconds, dropping expired tokens, and picks up
+revocations made by other processes every REVOCATION_SYNC_INTERVAL
+seconds. Revocations made in this process are added at once. A rebuild
+sizes the filter for twice the unexpired revocations (at least
+REVOCATION_FILTER_CAPACITY), and the filter is rebuilt early once that
+fills. One thread refreshes at a time; the others keep checking against
+the current filter meanwhile.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import RevokedToken
+
+# Ids are assigned before commit, so a revocation can commit with an id
+# lower than one already synced. Re-reading this many ids behind the
+# cursor catches those late commits.
+LATE_COMMIT_WINDOW = 100
+
+
+def _setting(name, default):
+    return getattr(settings, f'REVOCATION_{name}', default)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        positions = self._positions(key)
+        if self._has(positions):
+            return  # Already added: count only distinct keys toward capacity
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def _has(self, positions):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def __contains__(self, key):
+        return self._has(self._positions(key))
+
+
+class RevocationFilter:
+    """Per-process filter of revoked jtis, synced from revoked_tokens."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.bloom = None
+        self.cursor = 0
+        self.synced_at = None
+        self.built_at = None
+
+    def _new_bloom(self, revocations):
+        capacity = max(_setting('FILTER_CAPACITY', 100000), 2 * revocations)
+        return BloomFilter(capacity, _setting('FILTER_ERROR_RATE', 0.001))
+
+    def rebuild(self, rows=None):
+        """
+        Replace the filter with the unexpired revocations in the database,
+        or with the given (id, jti) rows.
+        """
+        if rows is None:
+            rows = RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('id', 'jti')
+        rows = list(rows)
+        bloom = self._new_bloom(len(rows))
+        cursor = 0
+        for row_id, jti in rows:
+            bloom.add(jti)
+            cursor = max(cursor, row_id)
+        with self.lock:
+            self.bloom, self.cursor = bloom, cursor
+            self.synced_at = self.built_at = time.monotonic()
+
+    def sync(self):
+        """Add revocations committed since the last sync."""
+        rows = list(
+            RevokedToken.objects.filter(id__gt=max(0, self.cursor - LATE_COMMIT_WINDOW))
+            .order_by('id').values_list('id', 'jti')
+        )
+        with self.lock:
+            for row_id, jti in rows:
+                self.bloom.add(jti)
+                self.cursor = max(self.cursor, row_id)
+            self.synced_at = time.monotonic()
+
+    def _due(self):
+        """rebuild or sync if one is due, else None."""
+        now = time.monotonic()
+        if (
+            self.bloom is None
+            or now - self.built_at >= _setting('REBUILD_INTERVAL', 3600)
+            or self.bloom.count >= self.bloom.capacity
+        ):
+            return self.rebuild
+        if now - self.synced_at >= _setting('SYNC_INTERVAL', 5):
+            return self.sync
+        return None
+
+    def _refresh(self):
+        if self._due() is None:
+            return
+        # Only wait for another thread's refresh when there is no filter yet
+        if not self.refresh_lock.acquire(blocking=self.bloom is None):
+            return
+        try:
+            refresh = self._due()
+            if refresh is not None:
+                refresh()
+        finally:
+            self.refresh_lock.release()
+
+    def add(self, jti):
+        if self.bloom is None:
+            return
+        with self.lock:
+            self.bloom.add(jti)
+
+    def might_contain(self, jti):
+        self._refresh()
+        return jti in self.bloom
+
+
+revoked = RevocationFilter()
+
+
+def is_revoked(token):
+    """Whether token has been revoked. Costs a query only on a probable hit."""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti is None or not revoked.might_contain(jti):
+        return False
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def revoke(token):
+    """Record token as revoked until it expires."""
+    jti = token[api_settings.JTI_CLAIM]
+    RevokedToken.objects.bulk_create([
+        RevokedToken(
+            jti=jti,
+            token_type=token.get(api_settings.TOKEN_TYPE_CLAIM, ''),
+            user_id=token.get(api_settings.USER_ID_CLAIM),
+            expires_at=datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc),
+        )
+    ], ignore_conflicts=True)
+    revoked.add(jti)
@@ -0,0 +1,27 @@
+"""
+Search over the admin user listing.
+"""
+from django.db.models import Q
+from django.db.models.functions import Lower
+from apps.books.search import PostgresSearchFilter
+
+
+class UserSearchFilter(PostgresSearchFilter):
+    """
+    Case-insensitive substring search over the view's search_fields.
+
+    Each field is matched as LOWER(field) LIKE '%term%'. On PostgreSQL that
+    is served by a trigram GIN index on LOWER(field) (migration 0005), so
+    results keep the listing's newest-first cursor order instead of being
+    ranked.
+    """
+
+    def _postgres_search(self, queryset, search_term, view):
+        return self._basic_search(queryset, search_term, view)
+
+    def _basic_search(self, queryset, search_term, view):
+        aliases = {f'{field}_lower': Lower(field) for field in getattr(view, 'search_fields', [])}
+        matches = Q()
+        for alias in aliases:
+            matches |= Q(**{f'{alias}__contains': search_term.lower()})
+        return queryset.alias(**aliases).filter(matches)
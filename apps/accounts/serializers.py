@@ -1,16 +1,24 @@
 """
 Accounts app serializers.
 """
+from drf_yasg.utils import swagger_serializer_method
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.models import Group
+from .hashing import hash_password
 
 User = get_user_model()
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
-    """Serializer for user registration."""
+    """
+    Serializer for user registration.
+    Duplicate emails and usernames are caught by the unique indexes when
+    the user is inserted rather than checked up front, so a successful
+    sign-up is one transaction with no lookups.
+    """
     email = serializers.EmailField(help_text="e.g. john@example.com")
     username = serializers.CharField(help_text="e.g. johndoe")
     first_name = serializers.CharField(help_text="e.g. John")
@@ -31,11 +39,6 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ['email', 'username', 'password', 'password_confirm', 'first_name', 'last_name']
 
-    def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError('A user with this email already exists.')
-        return value
-
     def validate(self, attrs):
         if attrs['password'] != attrs['password_confirm']:
             raise serializers.ValidationError({
@@ -45,14 +48,22 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        password = validated_data.pop('password')
-        user = User.objects.create_user(password=password, **validated_data)
-        return user
+        validated_data['password'] = hash_password(validated_data['password'])
+        validated_data['email'] = User.objects.normalize_email(validated_data['email'])
+        validated_data['username'] = User.normalize_username(validated_data['username'])
+        try:
+            with transaction.atomic():
+                return User.objects.create(**validated_data)
+        except IntegrityError:
+            if User.objects.email_taken(validated_data['email']):
+                raise serializers.ValidationError({'email': 'A user with this email already exists.'})
+            raise serializers.ValidationError({'username': 'A user with this username already exists.'})
 
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user details."""
-    groups = serializers.StringRelatedField(many=True, read_only=True)
+    # From group_names: the memo set at registration or from the token's role claims
+    groups = serializers.SerializerMethodField()
     is_administrator = serializers.BooleanField(read_only=True)
 
     class Meta:
@@ -63,6 +74,10 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'is_administrator']
 
+    @swagger_serializer_method(serializer_or_field=serializers.ListField(child=serializers.CharField()))
+    def get_groups(self, obj):
+        return sorted(obj.group_names)
+
 
 class UserUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating user profile."""
@@ -89,3 +104,11 @@ class UserAdminSerializer(serializers.ModelSerializer):
             'groups', 'is_administrator', 'is_active', 'is_staff', 'created_at'
         ]
         read_only_fields = ['id', 'created_at', 'is_administrator']
+
+    def update(self, instance, validated_data):
+        """Apply group changes with a single role-claim revocation."""
+        groups = validated_data.pop('groups', None)
+        instance = super().update(instance, validated_data)
+        if groups is not None:
+            instance.set_groups(groups)
+        return instance
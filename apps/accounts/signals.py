@@ -1,10 +1,14 @@
 """
 Accounts app signals.
-Auto-assign users to Members group on registration.
+Auto-assign users to Members group on registration, revoke role claims
+on group changes and keep the authenticated user cache fresh.
 """
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
+from . import user_cache
+from .groups import forget_group_ids, group_id
 from .models import User
 
 
@@ -13,7 +17,53 @@ def assign_default_group(sender, instance, created, **kwargs):
     """
     Automatically assign new users to the 'Members' group.
     Administrators must be assigned manually via admin panel.
+    The membership row is inserted directly: a new user has no memberships
+    to check against and no tokens to revoke, so groups.add() and its
+    m2m_changed handling would only cost queries.
     """
     if created and not instance.is_superuser:
-        members_group, _ = Group.objects.get_or_create(name='Members')
-        instance.groups.add(members_group)
+        User.groups.through.objects.create(user_id=instance.pk, group_id=group_id('Members'))
+        instance.set_group_names(['Members'])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_ids(sender, **kwargs):
+    """Drop cached group ids when a group is created, renamed or deleted."""
+    forget_group_ids()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached user on save (including deactivation and password changes) and delete."""
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def revoke_role_claims(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Bump token_version of users whose groups changed, revoking tokens that
+    carry their old roles, and drop the memoized group names.
+    Handles both user.groups.* and group.user_set.* changes.
+    """
+    if reverse:
+        # instance is a Group; for clear, collect its members before removal
+        if action == 'pre_clear':
+            user_ids = list(instance.user_set.values_list('pk', flat=True))
+        elif action in ('post_add', 'post_remove') and pk_set:
+            user_ids = list(pk_set)
+        else:
+            return
+        User.objects.filter(pk__in=user_ids).update(token_version=F('token_version') + 1)
+        user_cache.invalidate(*user_ids)
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    instance.clear_group_cache()
+    if action == 'post_clear' or pk_set:
+        User.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        # Keep a later save of this instance from writing the old version back
+        instance.token_version += 1
+        user_cache.invalidate(instance.pk)
@@ -0,0 +1,227 @@
+"""
+Token bucket throttles with state shared across worker processes.
+
+Each scope has a rate in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], e.g.
+'60/min': a bucket of 60 tokens refilled at one per second. A scope
+without a rate is not throttled.
+
+Buckets live in a shared backend (THROTTLE_BACKEND) so every gunicorn
+worker draws from the same bucket:
+- SQLiteBucketBackend: a local SQLite file, shared by the workers on one
+  host. The default.
+- CacheBucketBackend: the Django cache. Use it with a networked cache
+  (Redis, Memcached) when serving from several hosts.
+
+Buckets are kept as a GCRA "theoretical arrival time", a single number
+per key. To keep the per-request cost to a few microseconds, a worker
+takes up to THROTTLE_LEASE of a bucket at once and spends those tokens
+locally for up to LEASE_SECONDS. Only then does it go back to the
+backend. A lease never exceeds what the bucket refills in LEASE_SECONDS,
+so scopes slower than one request a second are not leased. Tokens a
+worker leased but did not spend are given back on its next backend call
+for the key; until then they are unavailable to the other workers.
+
+If the backend fails, the request is let through.
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# Leased tokens not spent within this long are dropped
+LEASE_SECONDS = 1.0
+
+
+def parse_rate(rate):
+    """'60/min' -> (60, 60.0): tokens per period and the period in seconds."""
+    count, period = rate.split('/')
+    return int(count), float(PERIODS[period[0]])
+
+
+def gcra(tat, now, n, interval, capacity, returned=0):
+    """
+    Give back returned unspent tokens, then take up to n tokens from a
+    bucket of capacity tokens refilled one per interval seconds, whose
+    theoretical arrival time is tat (None for a full bucket). Returns
+    (tokens granted, new tat, seconds until a token is available if none
+    were granted).
+    """
+    if tat is not None:
+        tat -= returned * interval
+    tat = max(tat or now, now)
+    available = int((now + capacity * interval - tat) / interval + 1e-9)
+    granted = max(0, min(n, available))
+    if granted:
+        return granted, tat + granted * interval, 0.0
+    return 0, tat, tat - (capacity - 1) * interval - now
+
+
+class CacheBucketBackend:
+    """
+    Buckets in the Django cache. The read and write are not atomic, so
+    workers racing on one key can admit a few requests over the rate.
+    """
+
+    key_prefix = 'throttle:'
+
+    def take(self, key, n, interval, capacity, now, returned=0):
+        cache_key = self.key_prefix + key
+        granted, tat, wait = gcra(cache.get(cache_key), now, n, interval, capacity, returned)
+        if granted or returned:
+            cache.set(cache_key, tat, timeout=math.ceil(tat - now) + 1)
+        return granted, wait
+
+
+class SQLiteBucketBackend:
+    """
+    Buckets in a SQLite file (THROTTLE_SQLITE_PATH) shared by the workers
+    on one host. Each take is one short IMMEDIATE transaction in WAL mode.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self.path = settings.THROTTLE_SQLITE_PATH
+        self.local = threading.local()
+        self.takes = 0
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Losing bucket state in a power cut is harmless
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL)')
+            self.local.connection = connection
+        return connection
+
+    def take(self, key, n, interval, capacity, now, returned=0):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tat FROM buckets WHERE key = ?', (key,)).fetchone()
+            granted, tat, wait = gcra(row[0] if row else None, now, n, interval, capacity, returned)
+            if granted or returned:
+                connection.execute(
+                    'INSERT INTO buckets (key, tat) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET tat = excluded.tat',
+                    (key, tat),
+                )
+            self.takes += 1
+            if self.takes % self.PRUNE_EVERY == 0:
+                # Buckets that have refilled completely are the same as no row
+                connection.execute('DELETE FROM buckets WHERE tat < ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return granted, wait
+
+
+_backends = {}
+_leases = {}
+_leases_lock = threading.Lock()
+
+
+def get_backend():
+    path = getattr(settings, 'THROTTLE_BACKEND', 'apps.accounts.throttling.SQLiteBucketBackend')
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def clear_leases():
+    """Forget the tokens leased by this process."""
+    with _leases_lock:
+        _leases.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle drawing one token per request from a shared bucket.
+    Subclasses set scope and implement get_ident_key().
+    """
+
+    scope = None
+
+    def get_ident_key(self, request, view):
+        """Bucket key for this request, or None to skip throttling."""
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+        if not rate:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        key = f'{self.scope}:{ident}'
+        now = time.time()
+
+        with _leases_lock:
+            lease = _leases.get(key)
+            if lease is not None and lease[0] > 0 and lease[1] > now:
+                lease[0] -= 1
+                return True
+            # Expired: its unspent tokens go back to the bucket with this take
+            returned = _leases.pop(key, [0])[0]
+
+        count, period = parse_rate(rate)
+        interval = period / count
+        lease_size = max(1, min(
+            int(count * getattr(settings, 'THROTTLE_LEASE', 0.1)),
+            int(LEASE_SECONDS / interval),
+        ))
+        try:
+            granted, self._wait = get_backend().take(key, lease_size, interval, count, now, returned)
+        except Exception:
+            logger.exception('Throttle backend failed; allowing request')
+            return True
+        if not granted:
+            return False
+        if granted > 1:
+            with _leases_lock:
+                _leases[key] = [granted - 1, now + LEASE_SECONDS]
+        return True
+
+    def wait(self):
+        return getattr(self, '_wait', None)
+
+
+class AnonSearchThrottle(TokenBucketThrottle):
+    """Anonymous ?search= listings, per client address."""
+
+    scope = 'anon_search'
+
+    def get_ident_key(self, request, view):
+        if request.user.is_authenticated or not request.query_params.get('search'):
+            return None
+        return self.get_ident(request)
+
+
+class BorrowThrottle(TokenBucketThrottle):
+    """Borrow attempts, per member."""
+
+    scope = 'borrow'
+
+    def get_ident_key(self, request, view):
+        return request.user.pk if request.user.is_authenticated else self.get_ident(request)
+
+
+class AuthThrottle(TokenBucketThrottle):
+    """Login, registration, token refresh and logout, per client address."""
+
+    scope = 'auth'
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
@@ -0,0 +1,108 @@
+"""
+JWT serializers that embed the user's roles in issued tokens.
+
+Tokens carry the user's group names ("roles") and the user's
+token_version ("ver"). FlexibleJWTAuthentication checks the version
+against the user it resolves (cached entries are keyed by version), then
+serves role checks from the claim. Bumping token_version (on any group change) revokes every token
+issued with the old roles. Individual tokens are revoked through
+apps/accounts/revocation.py (logout, refresh rotation).
+"""
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import revocation
+
+ROLES_CLAIM = 'roles'
+VERSION_CLAIM = 'ver'
+
+REVOKED_MESSAGE = 'Your roles have changed. Please log in again.'
+TOKEN_REVOKED_MESSAGE = 'Token has been revoked.'
+
+
+def set_role_claims(token, user):
+    """Write the user's current roles and token version into token."""
+    token[ROLES_CLAIM] = sorted(user.group_names)
+    token[VERSION_CLAIM] = user.token_version
+
+
+def check_token_version(token, user):
+    """
+    Reject tokens issued before the user's last role change.
+    Tokens issued before role claims existed carry no version and pass.
+    """
+    version = token.get(VERSION_CLAIM)
+    if version is not None and version != user.token_version:
+        raise AuthenticationFailed(REVOKED_MESSAGE, code='token_revoked')
+
+
+def check_not_revoked(token):
+    """Reject tokens revoked by logout or refresh rotation."""
+    if revocation.is_revoked(token):
+        raise AuthenticationFailed(TOKEN_REVOKED_MESSAGE, code='token_revoked')
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login serializer whose tokens carry role claims."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        set_role_claims(token, user)
+        return token
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh serializer that refuses revoked refresh tokens and re-issues
+    role claims from the database. A rotated refresh token is revoked.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        check_not_revoked(refresh)
+
+        try:
+            user = get_user_model().objects.get(
+                **{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}
+            )
+        except (KeyError, get_user_model().DoesNotExist):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        check_token_version(refresh, user)
+
+        # Claims on the refresh token are copied into the access token
+        set_role_claims(refresh, user)
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                revocation.revoke(refresh)
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class LogoutSerializer(serializers.Serializer):
+    """Revokes a refresh token."""
+
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        try:
+            return RefreshToken(value)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+    def save(self):
+        revocation.revoke(self.validated_data['refresh'])
@@ -7,7 +7,8 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from .views import RegisterView, ProfileView, UserViewSet
+from .throttling import AuthThrottle
+from .views import RegisterView, LogoutView, ProfileView, UserViewSet
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -15,8 +16,9 @@ router.register(r'users', UserViewSet, basename='user')
 urlpatterns = [
     # Authentication endpoints
     path('register/', RegisterView.as_view(), name='register'),
-    path('login/', TokenObtainPairView.as_view(), name='login'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('login/', TokenObtainPairView.as_view(throttle_classes=[AuthThrottle]), name='login'),
+    path('token/refresh/', TokenRefreshView.as_view(throttle_classes=[AuthThrottle]), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('me/', ProfileView.as_view(), name='profile'),
     # Admin user management
     path('', include(router.urls)),
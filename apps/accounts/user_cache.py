@@ -0,0 +1,58 @@
+"""
+Short-lived cache of authenticated users.
+
+FlexibleJWTAuthentication resolves the user behind a token from here
+instead of running a SELECT on users for every request. An entry holds
+the user's field values (except the password hash) and is only served to
+tokens carrying the same token_version, so a role change revokes cached
+entries along with the tokens. Saving or deleting a user, or bumping
+token_version, drops the entry, and drops it again once the transaction
+commits, in case a concurrent request re-cached the row as it was before.
+
+The cache is the default Django cache: process-local unless CACHES points
+at a shared backend. Invalidations only reach the worker that made the
+change, so USER_CACHE_TIMEOUT bounds how long the other workers (and
+changes made outside the ORM) can serve a stale user. Keep it to a few
+seconds unless CACHES is shared.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+KEY = 'accounts:user:{}'
+
+
+def _key(user_id):
+    return KEY.format(user_id)
+
+
+def _cached_fields():
+    return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname != 'password']
+
+
+def cache_user(user):
+    """Store user's field values, tagged with their token_version."""
+    values = tuple(getattr(user, name) for name in _cached_fields())
+    entry = (user.token_version, user._state.db, values)
+    cache.set(_key(user.pk), entry, getattr(settings, 'USER_CACHE_TIMEOUT', 5))
+
+
+def cached_user(user_id, token_version):
+    """
+    Return the cached user if the entry was stored at token_version, else
+    None. The returned instance is not bound to a query: the password is
+    deferred and loaded from the database if it is ever accessed.
+    """
+    entry = cache.get(_key(user_id))
+    if entry is None or entry[0] != token_version:
+        return None
+    _, db, values = entry
+    return get_user_model().from_db(db, _cached_fields(), values)
+
+
+def invalidate(*user_ids):
+    """Drop the cached entries of the given users, now and after commit."""
+    keys = [_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -5,13 +5,20 @@ from rest_framework import generics, status, viewsets
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import get_user_model
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
 from .serializers import (
     UserRegistrationSerializer,
     UserSerializer,
     UserUpdateSerializer,
     UserAdminSerializer
 )
+from .pagination import UserCursorPagination
 from .permissions import IsAdministrator
+from .revocation import revoke
+from .search import UserSearchFilter
+from .throttling import AuthThrottle
+from .tokens import LogoutSerializer
 
 User = get_user_model()
 
@@ -24,6 +31,9 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [AuthThrottle]
+    # Queries per request, enforced by the test suite (tests/query_budget.py)
+    query_budget = {'post': 4}
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -35,6 +45,27 @@ class RegisterView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 
+class LogoutView(generics.GenericAPIView):
+    """
+    Logout endpoint.
+    Revokes the given refresh token and, when called with one, the access
+    token used for the request.
+    """
+    serializer_class = LogoutSerializer
+    permission_classes = [AllowAny]
+    throttle_classes = [AuthThrottle]
+    # Queries per request, enforced by the test suite (tests/query_budget.py)
+    query_budget = {'post': 3}
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        if request.auth is not None:
+            revoke(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class ProfileView(generics.RetrieveUpdateAPIView):
     """
     Current user profile endpoint.
@@ -42,6 +73,8 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     PUT/PATCH: Update current user's profile
     """
     permission_classes = [IsAuthenticated]
+    # Queries per request, enforced by the test suite (tests/query_budget.py)
+    query_budget = {'get': 3, 'put': 4, 'patch': 4}
 
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -56,12 +89,34 @@ class UserViewSet(viewsets.ModelViewSet):
     """
     Admin endpoint for managing users.
     Only Administrators can access.
+    Listed newest first with cursor pagination; ?search= matches email,
+    username and names.
     """
     queryset = User.objects.all()
     serializer_class = UserAdminSerializer
     permission_classes = [IsAdministrator]
-    filter_backends = []  # Disable search/ordering/pagination in Swagger
-    pagination_class = None  # Simple list
+    filter_backends = [UserSearchFilter]
+    search_fields = ['email', 'username', 'first_name', 'last_name']
+    pagination_class = UserCursorPagination
+    # Queries per request, enforced by the test suite (tests/query_budget.py)
+    query_budget = {
+        'list': 4, 'retrieve': 4,
+        'create': 8, 'update': 10, 'partial_update': 10, 'destroy': 8,
+    }
 
     def get_queryset(self):
-        return User.objects.prefetch_related('groups').order_by('-created_at')
+        # is_administrator and groups are read from the prefetched groups
+        return User.objects.prefetch_related('groups').order_by('-created_at', '-id')
+
+    @swagger_auto_schema(
+        operation_summary="List users",
+        operation_description="Users newest first, cursor-paginated. "
+                              "?search= matches email, username, first or last name (case-insensitive substring).",
+        manual_parameters=[
+            openapi.Parameter('search', openapi.IN_QUERY, description="Search email, username and names", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Page cursor from the next/previous link", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Items per page (max: 200)", type=openapi.TYPE_INTEGER, required=False, default=50),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
@@ -0,0 +1,169 @@
+"""
+Server-Sent Events stream of book availability changes.
+
+Events are written to the book_availability_events table by the books
+signals, so every worker process sees every change. Each process runs a
+single polling task that reads new events and fans them out to the
+streams connected to it; the task only runs while someone is listening.
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import AvailabilityEvent
+
+logger = logging.getLogger(__name__)
+
+# How often the per-process poller checks for new events (seconds)
+POLL_INTERVAL = getattr(settings, 'AVAILABILITY_STREAM_POLL_INTERVAL', 1.0)
+# Idle streams get a comment line this often so proxies keep them open
+HEARTBEAT_INTERVAL = getattr(settings, 'AVAILABILITY_STREAM_HEARTBEAT', 15.0)
+# Maximum number of missed events replayed on resume
+REPLAY_LIMIT = getattr(settings, 'AVAILABILITY_STREAM_REPLAY_LIMIT', 1000)
+# Per-stream buffer; a client that falls this far behind is disconnected
+# and resumes from its last event id
+QUEUE_SIZE = 256
+# Ids are assigned before commit, so a transaction can commit an id lower
+# than one already seen. Re-reading this many ids behind the cursor
+# catches those late commits.
+LATE_COMMIT_WINDOW = 100
+
+
+class EventFilter:
+    """Book id / genre filter requested by a client."""
+
+    def __init__(self, book_ids=None, genre=None):
+        self.book_ids = set(book_ids) if book_ids else None
+        self.genre = genre.lower() if genre else None
+
+    def matches(self, event):
+        if self.book_ids is not None and event.book_id not in self.book_ids:
+            return False
+        if self.genre is not None and event.genre.lower() != self.genre:
+            return False
+        return True
+
+    def apply(self, queryset):
+        if self.book_ids is not None:
+            queryset = queryset.filter(book_id__in=self.book_ids)
+        if self.genre is not None:
+            queryset = queryset.filter(genre__iexact=self.genre)
+        return queryset
+
+
+def format_event(event):
+    """Serialize an event in the text/event-stream wire format."""
+    data = json.dumps({
+        'book_id': event.book_id,
+        'is_available': event.is_available,
+        'genre': event.genre,
+        'timestamp': event.created_at.isoformat(),
+    })
+    return f'id: {event.id}\nevent: availability\ndata: {data}\n\n'
+
+
+def _fetch_events(after_id, event_filter=None, limit=REPLAY_LIMIT):
+    queryset = AvailabilityEvent.objects.filter(id__gt=after_id)
+    if event_filter is not None:
+        queryset = event_filter.apply(queryset)
+    return list(queryset.order_by('id')[:limit])
+
+
+def _latest_event_id():
+    latest = AvailabilityEvent.objects.order_by('-id').values_list('id', flat=True).first()
+    return latest or 0
+
+
+class AvailabilityBroadcaster:
+    """Per-process fan-out of new availability events to connected streams."""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.task = None
+        self.loop = None
+        self.cursor = None
+        self.recent_ids = deque(maxlen=LATE_COMMIT_WINDOW * 2)
+
+    def subscribe(self, event_filter):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers[queue] = event_filter
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.loop is not loop:
+            self.loop = loop
+            self.task = loop.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+            # Start from the newest event again when the next client connects
+            self.cursor = None
+
+    async def _run(self):
+        if self.cursor is None:
+            self.cursor = await sync_to_async(_latest_event_id)()
+        while self.subscribers:
+            await asyncio.sleep(POLL_INTERVAL)
+            try:
+                events = await sync_to_async(_fetch_events)(
+                    max(0, self.cursor - LATE_COMMIT_WINDOW), limit=None
+                )
+            except Exception:
+                # Keep streams open through a database blip; retry next tick
+                logger.exception('Polling availability events failed')
+                continue
+            for event in events:
+                if event.id in self.recent_ids:
+                    continue
+                self.recent_ids.append(event.id)
+                self.cursor = max(self.cursor, event.id)
+                self._dispatch(event)
+
+    def _dispatch(self, event):
+        for queue, event_filter in list(self.subscribers.items()):
+            if not event_filter.matches(event):
+                continue
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too slow to keep up: end its stream, the client resumes
+                # from the last id it received
+                self.subscribers.pop(queue, None)
+
+
+broadcaster = AvailabilityBroadcaster()
+
+
+async def stream_events(event_filter, last_event_id=None):
+    """
+    Yield text/event-stream chunks: missed events after last_event_id first,
+    then live events as they are committed.
+    """
+    queue = broadcaster.subscribe(event_filter)
+    try:
+        yield f'retry: {int(POLL_INTERVAL * 3000)}\n\n'
+
+        sent_up_to = 0
+        if last_event_id is not None:
+            missed = await sync_to_async(_fetch_events)(last_event_id, event_filter)
+            for event in missed:
+                sent_up_to = event.id
+                yield format_event(event)
+
+        while queue in broadcaster.subscribers or not queue.empty():
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if event.id <= sent_up_to:
+                continue
+            yield format_event(event)
+    finally:
+        broadcaster.unsubscribe(queue)
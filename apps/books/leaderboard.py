@@ -0,0 +1,171 @@
+"""
+Top-rated books leaderboard, overall and per genre.
+
+Books are ranked by Bayesian average: each book's ratings are blended
+with PRIOR_WEIGHT phantom reviews at the board's mean rating, so a single
+5-star review does not outrank hundreds of 4.5s. A second rank orders by
+reviews received in the last VELOCITY_DAYS (trending).
+
+refresh() rebuilds the book_rankings table with one INSERT ... SELECT
+over the rating aggregates on books, so reads are a range scan on
+(genre, rank). Refreshes are serialized with a transaction-level advisory
+lock on PostgreSQL (SQLite serializes writers itself).
+
+Review changes request a refresh after commit. It runs on a background
+thread of the process, at most once per REFRESH_INTERVAL seconds: the
+first change is applied at once, later ones when the interval is up, so
+the boards trail review changes by at most the interval. A refresh is
+skipped when another process refreshed after the change committed. The
+refresh_leaderboard command covers scheduled refreshes (trending ranks
+age without review changes).
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import BookRanking
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock key serializing refreshes across processes
+REFRESH_LOCK_ID = 0x6c62_7261_6e6b  # 'lbrank'
+
+
+def _setting(name, default):
+    return getattr(settings, f'LEADERBOARD_{name}', default)
+
+
+REFRESH_SQL = """
+WITH stats AS (
+    SELECT b.id AS book_id, b.genre AS genre, b.review_count AS n,
+           (b.rating_1_count + 2 * b.rating_2_count + 3 * b.rating_3_count
+            + 4 * b.rating_4_count + 5 * b.rating_5_count) AS total,
+           COALESCE(recent.n, 0) AS recent
+    FROM books b
+    LEFT JOIN (
+        SELECT book_id, COUNT(*) AS n FROM reviews WHERE created_at >= %(since)s GROUP BY book_id
+    ) recent ON recent.book_id = b.id
+    WHERE b.review_count > 0
+),
+overall AS (
+    SELECT SUM(total) * 1.0 / SUM(n) AS mean FROM stats
+),
+genres AS (
+    SELECT genre, SUM(total) * 1.0 / SUM(n) AS mean FROM stats WHERE genre <> '' GROUP BY genre
+),
+scored AS (
+    SELECT s.book_id, NULL AS board, s.n, s.total, s.recent,
+           (%(prior)s * o.mean + s.total) / (%(prior)s + s.n) AS score
+    FROM stats s CROSS JOIN overall o
+    UNION ALL
+    SELECT s.book_id, s.genre, s.n, s.total, s.recent,
+           (%(prior)s * g.mean + s.total) / (%(prior)s + s.n)
+    FROM stats s JOIN genres g ON g.genre = s.genre
+),
+ranked AS (
+    SELECT scored.*,
+           ROW_NUMBER() OVER (PARTITION BY board ORDER BY score DESC, n DESC, book_id) AS score_rank,
+           ROW_NUMBER() OVER (PARTITION BY board ORDER BY recent DESC, score DESC, book_id) AS recent_rank
+    FROM scored
+)
+INSERT INTO book_rankings (
+    book_id, genre, rank, trending_rank, score, avg_rating,
+    review_count, recent_review_count, computed_at
+)
+SELECT book_id, board, score_rank, recent_rank, score, total * 1.0 / n, n, recent, %(now)s
+FROM ranked
+WHERE score_rank <= %(size)s OR recent_rank <= %(size)s
+"""
+
+
+def refresh(changed_at=None):
+    """
+    Rebuild every board from the rating aggregates on books.
+    Readers keep seeing the previous boards until the transaction commits.
+    With changed_at, skip the rebuild if the boards were computed after it.
+    Returns the number of ranking rows written.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [REFRESH_LOCK_ID])
+            # Taken after the lock, so the rebuild sees everything committed before now
+            now = timezone.now()
+            if changed_at is not None:
+                computed_at = BookRanking.objects.aggregate(latest=Max('computed_at'))['latest']
+                if computed_at is not None and computed_at >= changed_at:
+                    return 0
+            since = now - timedelta(days=_setting('VELOCITY_DAYS', 30))
+            params = {
+                'since': connection.ops.adapt_datetimefield_value(since),
+                'now': connection.ops.adapt_datetimefield_value(now),
+                'prior': float(_setting('PRIOR_WEIGHT', 10)),
+                'size': _setting('SIZE', 100),
+            }
+            BookRanking.objects.all().delete()
+            cursor.execute(REFRESH_SQL, params)
+            return cursor.rowcount
+
+
+class RefreshScheduler:
+    """Per-process debounce of review-triggered refreshes, leading and trailing edge."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timer = None
+        self.changed_at = None     # Latest change the pending refresh must include
+        self.refreshed_at = None   # monotonic start of the last refresh
+
+    def request(self):
+        interval = _setting('REFRESH_INTERVAL', 60)
+        if interval <= 0:
+            refresh()
+            return
+        with self.lock:
+            self.changed_at = timezone.now()
+            if self.timer is not None:
+                return  # The pending refresh starts after this change committed
+            delay = 0 if self.refreshed_at is None else self.refreshed_at + interval - time.monotonic()
+            self.timer = threading.Timer(max(0, delay), self.run)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def run(self):
+        with self.lock:
+            # Changes from here on schedule the next refresh
+            changed_at, self.changed_at = self.changed_at, None
+            self.timer = None
+            self.refreshed_at = time.monotonic()
+        try:
+            refresh(changed_at)
+        except Exception:
+            logger.exception('Refreshing the leaderboard failed')
+        finally:
+            connection.close()
+
+
+scheduler = RefreshScheduler()
+
+
+def request_refresh():
+    """
+    Schedule a refresh that includes the changes committed so far. Call
+    after commit; bursts of review changes cost one refresh per
+    REFRESH_INTERVAL. An interval of 0 refreshes inline.
+    """
+    scheduler.request()
+
+
+def board(genre=None, trending=False, limit=20):
+    """Top rows of a board: one range scan on (genre, rank) or (genre, trending_rank)."""
+    rank_field = 'trending_rank' if trending else 'rank'
+    queryset = BookRanking.objects.select_related('book').filter(genre=genre, **{f'{rank_field}__lte': limit})
+    if trending:
+        queryset = queryset.filter(recent_review_count__gt=0)
+    return queryset.order_by(rank_field)
@@ -0,0 +1,22 @@
+"""
+Management command to delete old availability events.
+Streams only replay recent events on resume, so older rows can go.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete availability stream events older than the given age'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Keep events from the last N hours (default: 24)')
+
+    def handle(self, *args, **options):
+        from apps.books.models import AvailabilityEvent
+
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        deleted, _ = AvailabilityEvent.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} availability events.'))
@@ -0,0 +1,15 @@
+"""
+Management command to recompute the rating aggregates of all books.
+Run this after bulk review edits or raw SQL that bypassed the review signals.
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Recompute avg_rating, review_count and the star histogram of all books'
+
+    def handle(self, *args, **options):
+        from apps.books.ratings import rebuild_ratings
+
+        count = rebuild_ratings()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates ({count} books with reviews).'))
@@ -0,0 +1,16 @@
+"""
+Management command to rebuild the top-rated books leaderboard.
+Schedule it (e.g. every few minutes via cron) so trending ranks age out
+even when no reviews are written.
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Recompute the overall and per-genre book leaderboards'
+
+    def handle(self, *args, **options):
+        from apps.books import leaderboard
+
+        count = leaderboard.refresh()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed leaderboard ({count} ranking rows).'))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.17 on 2026-10-19 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_enable_pg_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_id', models.BigIntegerField()),
+                ('is_available', models.BooleanField()),
+                ('genre', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'db_table': 'book_availability_events',
+                'ordering': ['id'],
+            },
+        ),
+    ]
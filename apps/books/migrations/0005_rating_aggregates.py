@@ -0,0 +1,65 @@
+# Generated by Django 4.2.17 on 2026-10-19 07:50
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_ratings(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    Review = apps.get_model('reviews', 'Review')
+    counts = {f'rating_{star}_count': Count('id', filter=Q(rating=star)) for star in range(1, 6)}
+    rows = Review.objects.order_by().values('book_id').annotate(total=Count('id'), **counts)
+    for row in rows:
+        rating_sum = sum(star * row[f'rating_{star}_count'] for star in range(1, 6))
+        Book.objects.filter(pk=row['book_id']).update(
+            review_count=row['total'],
+            avg_rating=rating_sum / row['total'],
+            **{field: row[field] for field in counts},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_availabilityevent'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='avg_rating',
+            field=models.FloatField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='review_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
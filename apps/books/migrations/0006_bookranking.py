@@ -0,0 +1,34 @@
+# Generated by Django 4.2.17 on 2026-10-19 07:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre', models.CharField(blank=True, max_length=100, null=True)),
+                ('rank', models.PositiveIntegerField()),
+                ('trending_rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('avg_rating', models.FloatField()),
+                ('review_count', models.PositiveIntegerField()),
+                ('recent_review_count', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='books.book')),
+            ],
+            options={
+                'db_table': 'book_rankings',
+                'ordering': ['genre', 'rank'],
+                'indexes': [models.Index(fields=['genre', 'rank'], name='book_rankings_rank_idx'), models.Index(fields=['genre', 'trending_rank'], name='book_rankings_trending_idx')],
+            },
+        ),
+    ]
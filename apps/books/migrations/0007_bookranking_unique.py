@@ -0,0 +1,26 @@
+# Generated by Django 4.2.17 on 2026-10-19 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_bookranking'),
+    ]
+
+    operations = [
+        # Concurrent refreshes could leave a book on a board twice; keep one row
+        migrations.RunSQL(
+            'DELETE FROM book_rankings WHERE id NOT IN (SELECT MIN(id) FROM book_rankings GROUP BY genre, book_id)',
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='bookranking',
+            constraint=models.UniqueConstraint(fields=('genre', 'book'), name='book_rankings_genre_book_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookranking',
+            constraint=models.UniqueConstraint(condition=models.Q(('genre__isnull', True)), fields=('book',), name='book_rankings_overall_book_uniq'),
+        ),
+    ]
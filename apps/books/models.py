@@ -17,6 +17,16 @@ class Book(models.Model):
     genre = models.CharField(max_length=100, blank=True, db_index=True)
     published_date = models.DateField(null=True, blank=True)
     is_available = models.BooleanField(default=True, db_index=True)
+
+    # Rating aggregates, maintained by the review signals (see ratings.py)
+    avg_rating = models.FloatField(null=True, blank=True, editable=False, db_index=True)
+    review_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -35,6 +45,34 @@ class Book(models.Model):
 
     def __str__(self):
         return f"{self.title} by {self.author}"
+
+    def save(self, *args, **kwargs):
+        """
+        Leave the rating aggregates and search vector out of full saves of
+        an existing book. Both are maintained by their own UPDATEs, and a
+        stale instance (borrow, return, admin edit) must not overwrite
+        counts that reviews changed after it was loaded.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            from .ratings import RATING_FIELDS
+            derived = {'search_vector', *RATING_FIELDS}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in derived
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def rating_histogram(self):
+        """Review counts keyed by star rating."""
+        return {str(star): getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded availability so saves can detect changes."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_available = instance.__dict__.get('is_available')
+        return instance
     
     def update_search_vector(self):
         """
@@ -57,3 +95,59 @@ class Book(models.Model):
                 """, [self.pk])
         except Exception:
             pass  # Silently fail for non-PostgreSQL databases
+
+
+class AvailabilityEvent(models.Model):
+    """
+    Append-only log of book availability changes.
+    The id doubles as the Server-Sent Events id clients resume from.
+    """
+
+    book_id = models.BigIntegerField()
+    is_available = models.BooleanField()
+    genre = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'book_availability_events'
+        ordering = ['id']
+
+    def __str__(self):
+        state = 'available' if self.is_available else 'unavailable'
+        return f"#{self.id}: book {self.book_id} {state}"
+
+
+class BookRanking(models.Model):
+    """
+    Precomputed leaderboard row, rebuilt wholesale by leaderboard.refresh().
+    genre is NULL on the overall board, otherwise the genre board it belongs to.
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='rankings')
+    genre = models.CharField(max_length=100, null=True, blank=True)
+    rank = models.PositiveIntegerField()
+    trending_rank = models.PositiveIntegerField()
+    score = models.FloatField()
+    avg_rating = models.FloatField()
+    review_count = models.PositiveIntegerField()
+    recent_review_count = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'book_rankings'
+        ordering = ['genre', 'rank']
+        indexes = [
+            models.Index(fields=['genre', 'rank'], name='book_rankings_rank_idx'),
+            models.Index(fields=['genre', 'trending_rank'], name='book_rankings_trending_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['genre', 'book'], name='book_rankings_genre_book_uniq'),
+            # NULLs are distinct in the constraint above, so the overall board needs its own
+            models.UniqueConstraint(
+                fields=['book'], condition=models.Q(genre__isnull=True), name='book_rankings_overall_book_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        board = self.genre or 'overall'
+        return f"#{self.rank} {board}: book {self.book_id} ({self.score:.2f})"
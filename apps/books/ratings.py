@@ -0,0 +1,76 @@
+"""
+Denormalized rating aggregates on Book.
+
+Review signals apply each change as a delta in a single UPDATE, so
+concurrent reviews of the same book never overwrite each other and no
+request recomputes over the reviews table. rebuild_ratings() recomputes
+the aggregates from scratch to repair drift (bulk edits, raw SQL).
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
+
+from .models import Book
+
+STARS = range(1, 6)
+HISTOGRAM_FIELDS = [f'rating_{star}_count' for star in STARS]
+RATING_FIELDS = ['avg_rating', 'review_count', *HISTOGRAM_FIELDS]
+
+
+def _histogram_field(rating):
+    return f'rating_{rating}_count'
+
+
+def apply_rating_delta(book_id, rating, delta):
+    """
+    Add (delta=1) or remove (delta=-1) one review of the given rating.
+
+    Every SET expression reads the row as it was before the UPDATE, so
+    avg_rating is derived from the new histogram in the same statement and
+    never accumulates floating point error.
+    """
+    counts = {field: F(field) for field in HISTOGRAM_FIELDS}
+    counts[_histogram_field(rating)] = F(_histogram_field(rating)) + delta
+    review_count = F('review_count') + delta
+    rating_sum = sum(star * counts[_histogram_field(star)] for star in STARS)
+
+    Book.objects.filter(pk=book_id).update(
+        review_count=review_count,
+        avg_rating=Case(
+            When(review_count=-delta, then=Value(None)),  # Last review removed
+            default=Cast(rating_sum, FloatField()) / review_count,
+            output_field=FloatField(),
+        ),
+        **{_histogram_field(rating): counts[_histogram_field(rating)]},
+    )
+
+
+def rebuild_ratings(batch_size=1000):
+    """
+    Recompute the aggregates of every book from the reviews table with one
+    grouped query. Returns the number of books that have reviews.
+    """
+    from apps.reviews.models import Review
+
+    rows = (
+        Review.objects.order_by()
+        .values('book_id')
+        .annotate(
+            total=Count('id'),
+            **{field: Count('id', filter=Q(rating=star)) for star, field in zip(STARS, HISTOGRAM_FIELDS)},
+        )
+    )
+    books = []
+    for row in rows:
+        rating_sum = sum(star * row[field] for star, field in zip(STARS, HISTOGRAM_FIELDS))
+        books.append(Book(
+            pk=row['book_id'],
+            review_count=row['total'],
+            avg_rating=rating_sum / row['total'],
+            **{field: row[field] for field in HISTOGRAM_FIELDS},
+        ))
+
+    with transaction.atomic():
+        Book.objects.update(review_count=0, avg_rating=None, **{field: 0 for field in HISTOGRAM_FIELDS})
+        Book.objects.bulk_update(books, RATING_FIELDS, batch_size=batch_size)
+    return len(books)
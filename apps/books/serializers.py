@@ -2,7 +2,7 @@
 Books app serializers.
 """
 from rest_framework import serializers
-from .models import Book
+from .models import Book, BookRanking
 
 
 class BookSerializer(serializers.ModelSerializer):
@@ -20,12 +20,14 @@ class BookSerializer(serializers.ModelSerializer):
 
 class BookListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for book listing."""
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = Book
         fields = [
             'id', 'title', 'author', 'isbn',
-            'genre', 'is_available'
+            'genre', 'is_available',
+            'avg_rating', 'review_count', 'rating_histogram'
         ]
 
 
@@ -52,3 +54,15 @@ class BookCreateUpdateSerializer(serializers.ModelSerializer):
                 'ISBN must contain only digits.'
             )
         return isbn
+
+
+class BookRankingSerializer(serializers.ModelSerializer):
+    """Leaderboard entry."""
+    book = BookListSerializer(read_only=True)
+
+    class Meta:
+        model = BookRanking
+        fields = [
+            'rank', 'trending_rank', 'book', 'score', 'avg_rating',
+            'review_count', 'recent_review_count', 'computed_at'
+        ]
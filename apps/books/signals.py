@@ -1,10 +1,10 @@
 """
 Books app signals.
-Auto-update search vector when books are saved.
+Auto-update search vector when books are saved and log availability changes.
 """
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import Book
+from .models import Book, AvailabilityEvent
 
 
 @receiver(post_save, sender=Book)
@@ -20,3 +20,20 @@ def update_book_search_vector(sender, instance, created, **kwargs):
     except Exception:
         # Silently fail for non-PostgreSQL databases
         pass
+
+
+@receiver(post_save, sender=Book)
+def log_availability_change(sender, instance, created, **kwargs):
+    """
+    Record an availability event when a book is created or its is_available
+    flag changes (borrow, return, hold handoff, admin edits).
+    Runs inside the caller's transaction, so rolled back changes leave no event.
+    """
+    loaded = getattr(instance, '_loaded_is_available', None)
+    if created or loaded != instance.is_available:
+        AvailabilityEvent.objects.create(
+            book_id=instance.pk,
+            is_available=instance.is_available,
+            genre=instance.genre,
+        )
+    instance._loaded_is_available = instance.is_available
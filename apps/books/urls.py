@@ -3,11 +3,12 @@ Books app URL configuration.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import BookViewSet
+from .views import BookViewSet, availability_stream
 
 router = DefaultRouter()
 router.register(r'books', BookViewSet, basename='book')
 
 urlpatterns = [
+    path('books/availability/stream/', availability_stream, name='book-availability-stream'),
     path('', include(router.urls)),
 ]
@@ -1,20 +1,29 @@
 """
 Books app views.
 """
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .models import Book
-from .serializers import BookSerializer, BookListSerializer, BookCreateUpdateSerializer
+from .serializers import BookSerializer, BookListSerializer, BookCreateUpdateSerializer, BookRankingSerializer
 from .filters import BookFilter
 from .search import BookSearchFilter
 from .ordering import CustomOrderingFilter
 from .pagination import CustomPageNumberPagination
+from .events import EventFilter, stream_events
+from . import leaderboard
 from apps.accounts.permissions import IsAdministratorOrReadOnly
+from config.routers import ReplicaReadsMixin
+from apps.accounts.throttling import AnonSearchThrottle
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     Book Catalog API - Search, filter, and browse books
     
@@ -27,9 +36,17 @@ class BookViewSet(viewsets.ModelViewSet):
     filter_backends = [BookSearchFilter, DjangoFilterBackend, CustomOrderingFilter]
     filterset_class = BookFilter
     search_fields = ['title', 'author', 'description', 'isbn', 'genre']
-    ordering_fields = ['title', 'author', 'created_at', 'published_date']
+    ordering_fields = ['title', 'author', 'created_at', 'published_date', 'avg_rating', 'review_count']
     ordering = ['created_at']
     pagination_class = CustomPageNumberPagination
+    throttle_classes = [AnonSearchThrottle]
+    # Queries per request, enforced by the test suite (tests/query_budget.py)
+    query_budget = {
+        'list': 3, 'retrieve': 2, 'leaderboard': 2,
+        'create': 6, 'update': 6, 'partial_update': 6, 'destroy': 7,
+    }
+    # Served from a read replica when one is configured (config/routers.py)
+    replica_actions = {'list', 'retrieve', 'leaderboard'}
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -99,7 +116,7 @@ class BookViewSet(viewsets.ModelViewSet):
                 openapi.IN_QUERY,
                 description="Sort results (default: asc)",
                 type=openapi.TYPE_STRING,
-                enum=['title_asc', 'title_desc', 'author_asc', 'author_desc', 'created_at_asc', 'created_at_desc', 'published_date_asc', 'published_date_desc'],
+                enum=['title_asc', 'title_desc', 'author_asc', 'author_desc', 'created_at_asc', 'created_at_desc', 'published_date_asc', 'published_date_desc', 'avg_rating_asc', 'avg_rating_desc', 'review_count_asc', 'review_count_desc'],
                 required=False,
                 default='created_at_asc',
             ),
@@ -125,19 +142,76 @@ class BookViewSet(viewsets.ModelViewSet):
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
-    
-    def perform_create(self, serializer):
-        """Create book and update search vector."""
-        book = serializer.save()
-        try:
-            book.update_search_vector()
-        except Exception:
-            pass
-    
-    def perform_update(self, serializer):
-        """Update book and refresh search vector."""
-        book = serializer.save()
+
+    @swagger_auto_schema(
+        operation_summary="Top rated books",
+        operation_description="""Books ranked by Bayesian average rating, overall or within a genre.
+Rankings are precomputed and refreshed shortly after reviews change.
+`sort=trending` ranks by reviews received recently instead.""",
+        manual_parameters=[
+            openapi.Parameter('genre', openapi.IN_QUERY, description="Genre board (exact name); omit for overall", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('sort', openapi.IN_QUERY, description="Ranking", type=openapi.TYPE_STRING, enum=['rating', 'trending'], required=False, default='rating'),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Number of books (max: 100)", type=openapi.TYPE_INTEGER, required=False, default=20),
+        ],
+        responses={200: BookRankingSerializer(many=True)},
+        filter_inspectors=[],
+    )
+    @action(detail=False, methods=['get'], pagination_class=None, filter_backends=[])
+    def leaderboard(self, request):
+        """Top rated (or trending) books from the precomputed rankings."""
+        sort = request.query_params.get('sort', 'rating')
+        if sort not in ('rating', 'trending'):
+            raise ValidationError({'sort': 'Use rating or trending.'})
         try:
-            book.update_search_vector()
-        except Exception:
-            pass
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
+        if not 1 <= limit <= 100:
+            raise ValidationError({'limit': 'Must be between 1 and 100.'})
+
+        rankings = leaderboard.board(
+            genre=request.query_params.get('genre') or None,
+            trending=sort == 'trending',
+            limit=limit,
+        )
+        return Response(BookRankingSerializer(rankings, many=True).data)
+
+
+async def availability_stream(request):
+    """
+    Server-Sent Events stream of book availability changes.
+
+    Query parameters:
+    - book_ids: Comma-separated book ids to watch (default: all)
+    - genre: Only books of this genre
+    - last_event_id: Resume after this event id (the Last-Event-ID header
+      that EventSource sends on reconnect takes precedence)
+
+    Each event carries book_id, is_available, genre and timestamp. The
+    stream never ends, so it needs an ASGI server (config.asgi). Under WSGI
+    Django would buffer the whole stream before sending a byte, holding a
+    worker thread forever, so the request is refused with 501.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'The availability stream is only served by the ASGI application (config.asgi).'},
+            status=501,
+        )
+
+    try:
+        book_ids = [int(value) for value in request.GET.get('book_ids', '').split(',') if value.strip()]
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({'error': 'book_ids and last_event_id must be integers.'}, status=400)
+
+    event_filter = EventFilter(book_ids=book_ids, genre=request.GET.get('genre'))
+    response = StreamingHttpResponse(
+        stream_events(event_filter, last_event_id),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
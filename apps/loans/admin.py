@@ -2,7 +2,7 @@
 Loans app admin configuration.
 """
 from django.contrib import admin
-from .models import Loan
+from .models import Loan, Hold, CirculationRollup
 
 
 @admin.register(Loan)
@@ -25,3 +25,31 @@ class LoanAdmin(admin.ModelAdmin):
             return 'Overdue'
         return 'Active'
     loan_status.short_description = 'Status'
+
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    """Admin configuration for Hold model."""
+    list_display = ['user', 'book', 'created_at', 'fulfilled_at']
+    list_filter = ['fulfilled_at', 'created_at']
+    search_fields = ['user__email', 'user__username', 'book__title', 'book__isbn']
+    readonly_fields = ['created_at']
+    ordering = ['book', 'id']
+    autocomplete_fields = ['user', 'book']
+    list_per_page = 25
+
+
+@admin.register(CirculationRollup)
+class CirculationRollupAdmin(admin.ModelAdmin):
+    """Read-only admin view of the daily circulation rollups."""
+    list_display = ['day', 'genre', 'cohort', 'borrows', 'returns', 'overdues']
+    list_filter = ['genre', 'cohort']
+    date_hierarchy = 'day'
+    ordering = ['-day', 'genre']
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,307 @@
+"""
+Management command to stress the borrow/return path under concurrency.
+
+Worker threads hammer LoanViewSet.borrow on one hot book and/or a spread of
+books, interleaved with return_book. A monitor thread samples pg_locks and
+pg_stat_activity for lock waits, and the loan/book invariants are checked
+when the run ends. PostgreSQL only: SQLite serialises writers and ignores
+SELECT ... FOR UPDATE, so its numbers would say nothing about production.
+Throttles are off for the run, so the numbers measure the locking, not
+BorrowThrottle.
+
+Example:
+    python manage.py bench_borrow_concurrency --threads 32 --duration 20 --books 4
+"""
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, Exists, OuterRef
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.accounts.models import User
+from apps.books.models import AvailabilityEvent, Book
+from apps.loans.models import CirculationRollup, Loan, Hold
+from apps.loans.views import LoanViewSet
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def unthrottled():
+    """
+    Settings override that switches off every throttle scope. The benchmarks
+    drive many requests per member (and register from one address), so the
+    production rates would turn most of the run into 429s.
+    """
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}})
+
+
+def throttled_count(outcomes):
+    """Number of 429 outcomes in a Counter keyed like 'borrow 429'."""
+    return sum(count for outcome, count in outcomes.items() if str(outcome).endswith(' 429'))
+
+
+def check_invariants(book_ids, user_ids):
+    """
+    Return a dict of invariant violations among the given books and users:
+    - double_loans: books with more than one unreturned loan
+    - over_limit_users: users with more than one unreturned loan
+    - availability_drift: books whose is_available disagrees with their loans
+    """
+    active = Loan.objects.filter(returned_at__isnull=True)
+    double_loans = list(
+        active.filter(book_id__in=book_ids)
+        .values('book_id').annotate(n=Count('id')).filter(n__gt=1)
+        .values_list('book_id', flat=True)
+    )
+    over_limit_users = list(
+        active.filter(user_id__in=user_ids)
+        .values('user_id').annotate(n=Count('id')).filter(n__gt=1)
+        .values_list('user_id', flat=True)
+    )
+    on_loan = active.filter(book=OuterRef('pk'))
+    availability_drift = [
+        book.pk
+        for book in Book.objects.filter(pk__in=book_ids).annotate(on_loan=Exists(on_loan))
+        if book.is_available == book.on_loan
+    ]
+    return {
+        'double_loans': double_loans,
+        'over_limit_users': over_limit_users,
+        'availability_drift': availability_drift,
+    }
+
+
+class LockMonitor(threading.Thread):
+    """Samples lock waits of this database's backends at a fixed interval."""
+
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.samples = 0
+        self.waiting_samples = 0
+        self.peak_waiters = 0
+        self.peak_ungranted_locks = 0
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self.stopped.is_set():
+                    cursor.execute("""
+                        SELECT
+                            (SELECT count(*) FROM pg_stat_activity
+                             WHERE datname = current_database() AND wait_event_type = 'Lock'),
+                            (SELECT count(*) FROM pg_locks l
+                             JOIN pg_database d ON d.oid = l.database
+                             WHERE d.datname = current_database() AND NOT l.granted)
+                    """)
+                    waiters, ungranted = cursor.fetchone()
+                    self.samples += 1
+                    self.waiting_samples += waiters
+                    self.peak_waiters = max(self.peak_waiters, waiters)
+                    self.peak_ungranted_locks = max(self.peak_ungranted_locks, ungranted)
+                    self.stopped.wait(self.interval)
+        finally:
+            connection.close()
+
+    @property
+    def lock_wait_seconds(self):
+        """Approximate total backend time spent waiting on locks."""
+        return self.waiting_samples * self.interval
+
+
+class Command(BaseCommand):
+    help = 'Concurrency stress benchmark for the borrow/return path (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent workers (default: 16)')
+        parser.add_argument('--duration', type=float, default=10.0, help='Run time in seconds (default: 10)')
+        parser.add_argument('--books', type=int, default=4, help='Books in the spread pool (default: 4)')
+        parser.add_argument(
+            '--hot-ratio', type=float, default=0.5,
+            help='Share of borrow attempts aimed at the single hot book (default: 0.5)'
+        )
+        parser.add_argument(
+            '--hold-ms', type=float, default=5.0,
+            help='Time a worker keeps a book before returning it, in ms (default: 5)'
+        )
+        parser.add_argument('--sample-ms', type=float, default=20.0, help='Lock sampling interval in ms (default: 20)')
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Keep the benchmark users, books, loans, rollups and availability events'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError(
+                'This benchmark requires PostgreSQL: SQLite serialises writers and ignores row locks.'
+            )
+
+        run_id = uuid.uuid4().hex[:8]
+        admin, members, hot_book, books = self._setup(run_id, options)
+        book_ids = [hot_book.pk] + [book.pk for book in books]
+
+        self.stdout.write(
+            f'Run {run_id}: {options["threads"]} threads, {options["duration"]}s, '
+            f'1 hot book + {len(books)} spread books'
+        )
+
+        latencies = {'borrow': [], 'return': []}
+        outcomes = Counter()
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        monitor = LockMonitor(options['sample_ms'] / 1000)
+        monitor.start()
+        workers = [
+            threading.Thread(
+                target=self._worker,
+                args=(member, admin, hot_book, books, options, deadline, latencies, outcomes, lock),
+            )
+            for member in members
+        ]
+        started = time.monotonic()
+        with unthrottled():
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        elapsed = time.monotonic() - started
+        monitor.stopped.set()
+        monitor.join()
+
+        violations = check_invariants(book_ids, [member.pk for member in members])
+        self._report(elapsed, latencies, outcomes, monitor, violations)
+
+        if not options['keep']:
+            self._teardown(run_id, book_ids)
+
+        if any(violations.values()):
+            raise CommandError('Invariant violations detected.')
+
+    def _setup(self, run_id, options):
+        admin_group, _ = Group.objects.get_or_create(name='Administrators')
+        admin = User.objects.create_user(
+            email=f'bench-admin-{run_id}@bench.local', username=f'bench-admin-{run_id}', password=None
+        )
+        admin.groups.add(admin_group)
+        members = [
+            User.objects.create_user(
+                email=f'bench-{run_id}-{i}@bench.local', username=f'bench-{run_id}-{i}', password=None
+            )
+            for i in range(options['threads'])
+        ]
+
+        def make_book(i):
+            return Book.objects.create(
+                title=f'Bench {run_id} #{i}', author='Benchmark', isbn=f'9{run_id[:6]}{i:06d}'[:13],
+                genre=f'Benchmark {run_id}', is_available=True,
+            )
+
+        hot_book = make_book(0)
+        books = [make_book(i) for i in range(1, options['books'] + 1)]
+        return admin, members, hot_book, books
+
+    def _teardown(self, run_id, book_ids):
+        Hold.objects.filter(book_id__in=book_ids).delete()
+        Loan.objects.filter(book_id__in=book_ids).delete()
+        # The run's books have a genre of their own, so its rollup buckets hold only its loans
+        CirculationRollup.objects.filter(genre=f'Benchmark {run_id}').delete()
+        AvailabilityEvent.objects.filter(book_id__in=book_ids).delete()
+        Book.objects.filter(pk__in=book_ids).delete()
+        User.objects.filter(email__endswith='@bench.local', username__contains=run_id).delete()
+
+    def _worker(self, member, admin, hot_book, books, options, deadline, latencies, outcomes, lock):
+        factory = APIRequestFactory()
+        borrow_view = LoanViewSet.as_view({'post': 'borrow'})
+        return_view = LoanViewSet.as_view({'post': 'return_book'})
+        rng = random.Random()
+        local_latencies = {'borrow': [], 'return': []}
+        local_outcomes = Counter()
+
+        try:
+            while time.monotonic() < deadline:
+                use_hot = not books or rng.random() < options['hot_ratio']
+                book = hot_book if use_hot else rng.choice(books)
+
+                request = factory.post('/api/loans/borrow/', {'book_id': book.pk}, format='json')
+                force_authenticate(request, user=member)
+                response, status_code, elapsed = self._call(borrow_view, request)
+                local_latencies['borrow'].append(elapsed)
+                local_outcomes[f'borrow {status_code}'] += 1
+                if status_code != 201:
+                    continue
+
+                time.sleep(options['hold_ms'] / 1000)
+                loan_id = response.data['id']
+                request = factory.post(f'/api/loans/{loan_id}/return_book/')
+                force_authenticate(request, user=admin)
+                _, status_code, elapsed = self._call(return_view, request, pk=loan_id)
+                local_latencies['return'].append(elapsed)
+                local_outcomes[f'return {status_code}'] += 1
+        finally:
+            connections.close_all()
+
+        with lock:
+            for kind, values in local_latencies.items():
+                latencies[kind].extend(values)
+            outcomes.update(local_outcomes)
+
+    def _call(self, view, request, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = view(request, **kwargs)
+            status_code = response.status_code
+        except Exception as exc:  # deadlocks, serialization failures, ...
+            response = None
+            status_code = type(exc).__name__
+        return response, status_code, time.perf_counter() - started
+
+    def _report(self, elapsed, latencies, outcomes, monitor, violations):
+        total = sum(len(values) for values in latencies.values())
+        completed = outcomes.get('return 200', 0)
+
+        self.stdout.write('')
+        self.stdout.write(f'Elapsed:          {elapsed:.2f}s')
+        self.stdout.write(f'Requests:         {total} ({total / elapsed:.1f} req/s)')
+        self.stdout.write(f'Borrow cycles:    {completed} ({completed / elapsed:.1f} cycles/s)')
+        for kind, values in latencies.items():
+            if values:
+                self.stdout.write(
+                    f'{kind.capitalize():<8} latency:  p50 {percentile(values, 50) * 1000:.1f}ms  '
+                    f'p99 {percentile(values, 99) * 1000:.1f}ms  max {max(values) * 1000:.1f}ms'
+                )
+        self.stdout.write(
+            f'Lock waits:       ~{monitor.lock_wait_seconds:.2f}s total, peak {monitor.peak_waiters} '
+            f'waiting backends, peak {monitor.peak_ungranted_locks} ungranted locks'
+        )
+        self.stdout.write('Outcomes:')
+        for outcome, count in sorted(outcomes.items(), key=lambda item: str(item[0])):
+            self.stdout.write(f'  {outcome}: {count}')
+        if throttled_count(outcomes):
+            self.stdout.write(self.style.WARNING(
+                f'{throttled_count(outcomes)} requests were throttled (429); the numbers include rejected requests.'
+            ))
+
+        if any(violations.values()):
+            for name, ids in violations.items():
+                if ids:
+                    self.stdout.write(self.style.ERROR(f'Invariant violated - {name}: {ids}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Invariants held: no double loans, no over-limit users, no availability drift.'))
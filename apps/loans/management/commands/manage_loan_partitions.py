@@ -0,0 +1,82 @@
+"""
+Management command to maintain the monthly partitions of the loans table.
+Creates partitions ahead of time and archives old ones. PostgreSQL only.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.loans import partitions
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming loan partitions and archive or drop old ones (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=3,
+            help='Ensure partitions exist up to this many months from now (default: 3)'
+        )
+        parser.add_argument(
+            '--retain-months', type=int, default=None,
+            help='Archive partitions that ended more than this many months ago'
+        )
+        parser.add_argument(
+            '--archive-schema', type=str, default=partitions.ARCHIVE_SCHEMA,
+            help=f'Schema that archived partitions are moved to (default: {partitions.ARCHIVE_SCHEMA})'
+        )
+        parser.add_argument('--drop', action='store_true', help='Drop old partitions instead of archiving them')
+        parser.add_argument('--dry-run', action='store_true', help='Show what would be done without changing anything')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Loan partitioning requires PostgreSQL.')
+
+        with connection.cursor() as cursor:
+            if not partitions.is_partitioned(cursor):
+                raise CommandError('The loans table is not partitioned. Run migrations first.')
+
+        current = partitions.month_start(datetime.now(dt_timezone.utc))
+        self._create_upcoming(current, options)
+        if options['retain_months'] is not None:
+            self._archive_old(current, options)
+
+        self.stdout.write(self.style.SUCCESS('Loan partition maintenance completed!'))
+
+    def _create_upcoming(self, current, options):
+        for offset in range(options['months_ahead'] + 1):
+            month = partitions.add_months(current, offset)
+            name = partitions.partition_name(month)
+            if options['dry_run']:
+                self.stdout.write(f'Would ensure partition {name}')
+                continue
+            with transaction.atomic(), connection.cursor() as cursor:
+                if partitions.create_partition(cursor, month):
+                    self.stdout.write(self.style.SUCCESS(f'Created partition {name}'))
+
+    def _archive_old(self, current, options):
+        cutoff = partitions.add_months(current, -options['retain_months'])
+        verb, done = ('drop', 'Dropped') if options['drop'] else ('archive', 'Archived')
+
+        with connection.cursor() as cursor:
+            names = partitions.list_partitions(cursor)
+
+        for name in names:
+            # Only partitions whose whole month ends before the cutoff
+            if partitions.add_months(partitions.partition_month(name), 1) > cutoff:
+                continue
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                if partitions.has_active_loans(cursor, name):
+                    self.stdout.write(self.style.WARNING(
+                        f'Skipping {name}: it still has unreturned loans'
+                    ))
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(f'Would {verb} partition {name}')
+                    continue
+                partitions.archive_partition(
+                    cursor, name, schema=options['archive_schema'], drop=options['drop']
+                )
+            self.stdout.write(self.style.SUCCESS(f'{done} partition {name}'))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.17 on 2026-10-19 07:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('books', '0003_enable_pg_trgm'),
+        ('loans', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('fulfilled_at', models.DateTimeField(blank=True, null=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='books.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'holds',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('fulfilled_at__isnull', True)), fields=['book', 'id'], name='holds_open_queue_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='hold',
+            constraint=models.UniqueConstraint(condition=models.Q(('fulfilled_at__isnull', True)), fields=('user', 'book'), name='holds_one_open_hold_per_book'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Range-partition the loans table by borrowed_at (PostgreSQL only)
+
+from django.db import migrations
+
+
+def partition_loans(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from apps.loans.partitions import partition_loans_table
+    partition_loans_table(schema_editor.connection)
+
+
+def unpartition_loans(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from apps.loans.partitions import unpartition_loans_table
+    unpartition_loans_table(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0002_hold'),
+    ]
+
+    operations = [
+        # Existing rows are copied into monthly partitions; ids and indexes are kept
+        migrations.RunPython(partition_loans, unpartition_loans),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.17 on 2026-10-19 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0003_partition_loans'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('returned_at__isnull', True)), fields=['user'], name='loans_active_user_idx'),
+        ),
+    ]
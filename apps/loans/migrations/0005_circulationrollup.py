@@ -0,0 +1,33 @@
+# Generated by Django 4.2.17 on 2026-10-19 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0004_loans_active_user_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('genre', models.CharField(blank=True, max_length=100)),
+                ('cohort', models.DateField(help_text='First day of the month the member signed up')),
+                ('borrows', models.PositiveIntegerField(default=0)),
+                ('returns', models.PositiveIntegerField(default=0)),
+                ('overdues', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'circulation_rollups',
+                'ordering': ['day', 'genre', 'cohort'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='circulationrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'genre', 'cohort'), name='circulation_rollups_bucket_uniq'),
+        ),
+    ]
@@ -2,11 +2,13 @@
 Loans app models.
 """
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import timedelta
 
+
 class Loan(models.Model):
     """
     Tracks which user borrowed which book and when.
@@ -35,7 +37,17 @@ class Loan(models.Model):
         indexes = [
             models.Index(fields=['user', 'returned_at']),
             models.Index(fields=['book', 'returned_at']),
+            # Active-loan checks only ever look at unreturned rows; this stays
+            # small no matter how much returned history a partition holds
+            models.Index(
+                fields=['user'],
+                condition=Q(returned_at__isnull=True),
+                name='loans_active_user_idx',
+            ),
         ]
+        # On PostgreSQL the table is range-partitioned by borrowed_at
+        # (migration 0003, see apps/loans/partitions.py). Filter on
+        # borrowed_at where possible so the planner can prune partitions.
 
     def save(self, *args, **kwargs):
         # Set default due_date if not provided
@@ -63,3 +75,77 @@ class Loan(models.Model):
     def __str__(self):
         status = 'Active' if self.is_active else 'Returned'
         return f"{self.user.email} - {self.book.title} ({status})"
+
+
+class Hold(models.Model):
+    """
+    A member's place in the FIFO queue for a book that is currently out.
+    When the book is returned it is handed to the oldest open hold.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='holds'
+    )
+    book = models.ForeignKey(
+        'books.Book',
+        on_delete=models.CASCADE,
+        related_name='holds'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    fulfilled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'holds'
+        ordering = ['id']
+        indexes = [
+            # Queue order and position lookups: open holds of a book by id
+            models.Index(
+                fields=['book', 'id'],
+                condition=Q(fulfilled_at__isnull=True),
+                name='holds_open_queue_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'book'],
+                condition=Q(fulfilled_at__isnull=True),
+                name='holds_one_open_hold_per_book',
+            ),
+        ]
+
+    @property
+    def is_open(self):
+        """Check if the hold is still waiting in the queue."""
+        return self.fulfilled_at is None
+
+    def __str__(self):
+        status = 'Waiting' if self.is_open else 'Fulfilled'
+        return f"{self.user.email} - {self.book.title} ({status})"
+
+
+class CirculationRollup(models.Model):
+    """
+    Daily circulation counts per genre and member cohort (signup month).
+    Borrows and returns are incremented as they happen; overdues are
+    filled in by the rebuild_circulation_rollups catch-up job.
+    """
+
+    day = models.DateField()
+    genre = models.CharField(max_length=100, blank=True)
+    cohort = models.DateField(help_text='First day of the month the member signed up')
+    borrows = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    overdues = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'circulation_rollups'
+        ordering = ['day', 'genre', 'cohort']
+        constraints = [
+            # Also serves date-range scans, as day leads the index
+            models.UniqueConstraint(fields=['day', 'genre', 'cohort'], name='circulation_rollups_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.genre or '-'} ({self.borrows} borrows, {self.returns} returns)"
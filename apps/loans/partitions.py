@@ -0,0 +1,222 @@
+"""
+PostgreSQL range partitioning of the loans table by borrowed_at.
+
+The table is split into monthly partitions named loans_pYYYY_MM plus a
+loans_default catch-all. Partitioning is PostgreSQL-only; every helper
+here expects a PostgreSQL connection.
+"""
+from datetime import date, datetime, time, timezone as dt_timezone
+
+TABLE = 'loans'
+DEFAULT_PARTITION = 'loans_default'
+PARTITION_PREFIX = 'loans_p'
+ARCHIVE_SCHEMA = 'loans_archive'
+
+
+def month_start(value):
+    """Return the first day of the month containing value."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Return the first day of the month count months after month."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Partition table name for the month starting at month."""
+    return f'{PARTITION_PREFIX}{month.year:04d}_{month.month:02d}'
+
+
+def partition_month(name):
+    """Month a partition covers, or None if name is not a monthly partition."""
+    suffix = name[len(PARTITION_PREFIX):]
+    try:
+        year, month = suffix.split('_')
+        return date(int(year), int(month), 1)
+    except ValueError:
+        return None
+
+
+def partition_bounds(month):
+    """Inclusive lower and exclusive upper borrowed_at bounds of a month."""
+    lower = datetime.combine(month, time.min, tzinfo=dt_timezone.utc)
+    upper = datetime.combine(add_months(month, 1), time.min, tzinfo=dt_timezone.utc)
+    return lower, upper
+
+
+def is_partitioned(cursor):
+    """Check if the loans table is already a partitioned table."""
+    cursor.execute(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE]
+    )
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions(cursor):
+    """Return the names of monthly partitions attached to loans, oldest first."""
+    cursor.execute("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.oid = to_regclass(%s)
+    """, [TABLE])
+    names = [row[0] for row in cursor.fetchall()]
+    return sorted(name for name in names if partition_month(name))
+
+
+def create_partition(cursor, month):
+    """
+    Create and attach the partition for month if it does not exist.
+    Rows that already landed in the default partition for that month are
+    moved into the new partition so the attach does not fail.
+    Returns True if a partition was created.
+    """
+    name = partition_name(month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+
+    lower, upper = partition_bounds(month)
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE {TABLE} INCLUDING DEFAULTS)')
+    cursor.execute(
+        f'INSERT INTO "{name}" SELECT * FROM {DEFAULT_PARTITION} '
+        f'WHERE borrowed_at >= %s AND borrowed_at < %s',
+        [lower, upper],
+    )
+    cursor.execute(
+        f'DELETE FROM {DEFAULT_PARTITION} WHERE borrowed_at >= %s AND borrowed_at < %s',
+        [lower, upper],
+    )
+    cursor.execute(
+        f'ALTER TABLE {TABLE} ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+        [lower, upper],
+    )
+    return True
+
+
+def has_active_loans(cursor, name):
+    """Check if a partition still holds unreturned loans."""
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{name}" WHERE returned_at IS NULL)')
+    return cursor.fetchone()[0]
+
+
+def archive_partition(cursor, name, schema=ARCHIVE_SCHEMA, drop=False):
+    """Detach a partition and move it to the archive schema (or drop it)."""
+    cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION "{name}"')
+    if drop:
+        cursor.execute(f'DROP TABLE "{name}"')
+    else:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        cursor.execute(f'ALTER TABLE "{name}" SET SCHEMA "{schema}"')
+
+
+def _table_definition(cursor, table):
+    """Secondary index and foreign key DDL of table, for replaying on a rebuilt table."""
+    cursor.execute("""
+        SELECT indexdef FROM pg_indexes
+        WHERE schemaname = current_schema() AND tablename = %s
+          AND indexname NOT IN (
+              SELECT conname FROM pg_constraint
+              WHERE conrelid = to_regclass(%s) AND contype = 'p'
+          )
+    """, [table, table])
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'f'
+    """, [table])
+    foreign_keys = cursor.fetchall()
+    return indexes, foreign_keys
+
+
+def _rebuild_loans_table(cursor, create_sql):
+    """
+    Replace loans with a new table created by create_sql, keeping rows,
+    ids, secondary indexes and foreign keys.
+    """
+    indexes, foreign_keys = _table_definition(cursor, TABLE)
+    cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {TABLE}_old')
+    cursor.execute(create_sql)
+    return indexes, foreign_keys
+
+
+def _finish_rebuild(cursor, indexes, foreign_keys):
+    columns = 'id, borrowed_at, due_date, returned_at, book_id, user_id'
+    cursor.execute(f'INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {TABLE}_old')
+    cursor.execute(f'DROP TABLE {TABLE}_old')
+
+    cursor.execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+    cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+    cursor.execute(
+        f"SELECT setval('{TABLE}_id_seq', COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false)"
+    )
+
+    for index_sql in indexes:
+        cursor.execute(index_sql)
+    for name, definition in foreign_keys:
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT "{name}" {definition}')
+
+
+def partition_loans_table(connection, months_ahead=3):
+    """
+    Convert loans into a table range-partitioned by borrowed_at, with one
+    partition per month from the oldest loan up to months_ahead months from
+    now. The primary key becomes (id, borrowed_at), as PostgreSQL requires
+    the partition key in every unique constraint.
+    """
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return
+
+        cursor.execute(f'SELECT MIN(borrowed_at) FROM {TABLE}')
+        oldest = cursor.fetchone()[0]
+        current = month_start(datetime.now(dt_timezone.utc))
+        first = month_start(oldest) if oldest else current
+
+        indexes, foreign_keys = _rebuild_loans_table(cursor, f"""
+            CREATE TABLE {TABLE} (
+                id bigint NOT NULL,
+                borrowed_at timestamp with time zone NOT NULL,
+                due_date timestamp with time zone NOT NULL,
+                returned_at timestamp with time zone NULL,
+                book_id bigint NOT NULL,
+                user_id bigint NOT NULL,
+                PRIMARY KEY (id, borrowed_at)
+            ) PARTITION BY RANGE (borrowed_at)
+        """)
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+
+        month = first
+        while month <= add_months(current, months_ahead):
+            lower, upper = partition_bounds(month)
+            cursor.execute(
+                f'CREATE TABLE "{partition_name(month)}" PARTITION OF {TABLE} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [lower, upper],
+            )
+            month = add_months(month, 1)
+
+        _finish_rebuild(cursor, indexes, foreign_keys)
+
+
+def unpartition_loans_table(connection):
+    """Convert a partitioned loans table back into a plain table."""
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return
+
+        indexes, foreign_keys = _rebuild_loans_table(cursor, f"""
+            CREATE TABLE {TABLE} (
+                id bigint NOT NULL PRIMARY KEY,
+                borrowed_at timestamp with time zone NOT NULL,
+                due_date timestamp with time zone NOT NULL,
+                returned_at timestamp with time zone NULL,
+                book_id bigint NOT NULL,
+                user_id bigint NOT NULL
+            )
+        """)
+        _finish_rebuild(cursor, indexes, foreign_keys)
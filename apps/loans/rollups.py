@@ -0,0 +1,129 @@
+"""
+Incremental maintenance of the daily circulation rollups.
+
+Borrows and returns bump their bucket as they happen, inside the same
+transaction as the loan change. rebuild() recomputes a date range from
+the loans table and is what fills in overdue counts.
+
+On PostgreSQL the two are serialized with an advisory lock: increments
+take it shared, so they never wait on each other, and rebuild() takes it
+exclusively before reading the loans. A rebuild therefore sees every
+increment that committed before it and replaces none that commit after.
+SQLite serializes writers itself.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, DateField, F, Q
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import Loan, CirculationRollup
+
+# pg_advisory_xact_lock key shared by increments and rebuilds
+ROLLUP_LOCK_ID = 0x6c62_726f_6c6c  # 'lbroll'
+
+
+def _lock(shared):
+    """Hold the rollup lock until the current transaction ends."""
+    if connection.vendor != 'postgresql':
+        return
+    function = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {function}(%s)', [ROLLUP_LOCK_ID])
+
+
+def _cohort(user):
+    """Signup month of a member."""
+    joined = timezone.localdate(user.created_at)
+    return date(joined.year, joined.month, 1)
+
+
+def _increment(when, book, user, field):
+    bucket = {'day': timezone.localdate(when), 'genre': book.genre, 'cohort': _cohort(user)}
+    _lock(shared=True)
+    # The bucket usually exists already, so try the UPDATE first
+    if CirculationRollup.objects.filter(**bucket).update(**{field: F(field) + 1}):
+        return
+    row, _ = CirculationRollup.objects.get_or_create(**bucket)
+    CirculationRollup.objects.filter(pk=row.pk).update(**{field: F(field) + 1})
+
+
+def record_borrow(loan):
+    """Count a new loan. Call inside the transaction that created it."""
+    _increment(loan.borrowed_at, loan.book, loan.user, 'borrows')
+
+
+def record_return(loan):
+    """Count a returned loan. Call inside the transaction that returned it."""
+    _increment(loan.returned_at, loan.book, loan.user, 'returns')
+
+
+def _day_bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.combine(start, time.min, tzinfo=tz),
+        datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+    )
+
+
+def _grouped_counts(queryset, field):
+    """Loan counts per (day of field, genre, cohort)."""
+    rows = (
+        queryset.annotate(
+            bucket_day=TruncDate(field),
+            bucket_cohort=TruncMonth('user__created_at', output_field=DateField()),
+        )
+        .order_by()
+        .values('bucket_day', 'book__genre', 'bucket_cohort')
+        .annotate(count=Count('id'))
+    )
+    return {
+        (row['bucket_day'], row['book__genre'], row['bucket_cohort']): row['count']
+        for row in rows
+    }
+
+
+def rebuild(start, end):
+    """
+    Recompute the rollups for days start..end (inclusive) from the loans
+    table with three grouped queries, replacing the existing rows.
+    Returns the number of rollup rows written.
+    """
+    with transaction.atomic():
+        # Waits for in-flight borrows and returns to commit; new ones wait for us
+        _lock(shared=False)
+        rows = _rebuilt_rows(start, end)
+        CirculationRollup.objects.filter(day__gte=start, day__lte=end).delete()
+        CirculationRollup.objects.bulk_create(rows)
+    return len(rows)
+
+
+def _rebuilt_rows(start, end):
+    lower, upper = _day_bounds(start, end)
+    now = timezone.now()
+
+    borrows = _grouped_counts(
+        Loan.objects.filter(borrowed_at__gte=lower, borrowed_at__lt=upper), 'borrowed_at'
+    )
+    returns = _grouped_counts(
+        Loan.objects.filter(returned_at__gte=lower, returned_at__lt=upper), 'returned_at'
+    )
+    # Overdues are counted on the day the loan fell due
+    overdues = _grouped_counts(
+        Loan.objects.filter(due_date__gte=lower, due_date__lt=min(upper, now)).filter(
+            Q(returned_at__isnull=True) | Q(returned_at__gt=F('due_date'))
+        ),
+        'due_date',
+    )
+
+    buckets = defaultdict(dict)
+    for field, counts in (('borrows', borrows), ('returns', returns), ('overdues', overdues)):
+        for key, count in counts.items():
+            buckets[key][field] = count
+
+    return [
+        CirculationRollup(day=day, genre=genre, cohort=cohort, **counts)
+        for (day, genre, cohort), counts in buckets.items()
+    ]
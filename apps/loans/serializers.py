@@ -2,9 +2,8 @@
 Loans app serializers.
 """
 from rest_framework import serializers
-from .models import Loan
+from .models import Loan, Hold
 from apps.books.serializers import BookListSerializer
-from apps.books.models import Book
 
 
 class LoanSerializer(serializers.ModelSerializer):
@@ -44,18 +43,27 @@ class LoanDetailSerializer(serializers.ModelSerializer):
 class BorrowBookSerializer(serializers.Serializer):
     """Serializer for borrowing a book."""
 
+    # Existence and availability are checked by the view under the row lock
     book_id = serializers.IntegerField()
 
-    def validate_book_id(self, value):
-        try:
-            book = Book.objects.get(pk=value)
-        except Book.DoesNotExist:
-            raise serializers.ValidationError('Book not found.')
 
-        if not book.is_available:
-            raise serializers.ValidationError('Book is not available for borrowing.')
+class HoldSerializer(serializers.ModelSerializer):
+    """Serializer for a hold with the member's place in the queue."""
 
-        return value
+    book = BookListSerializer(read_only=True)
+    position = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Hold
+        fields = ['id', 'book', 'position', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+
+class PlaceHoldSerializer(serializers.Serializer):
+    """Serializer for joining the hold queue of a book."""
+
+    # Existence is checked by the view under the row lock
+    book_id = serializers.IntegerField()
 
 
 class EmptySerializer(serializers.Serializer):
@@ -3,10 +3,11 @@ Loans app URL configuration.
 """
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LoanViewSet
+from .views import LoanViewSet, HoldViewSet
 
 router = DefaultRouter()
 router.register(r'loans', LoanViewSet, basename='loan')
+router.register(r'holds', HoldViewSet, basename='hold')
 
 urlpatterns = [
     path('', include(router.urls)),
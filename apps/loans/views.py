@@ -5,17 +5,41 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from datetime import datetime, time, timedelta
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Subquery, Sum
 from drf_yasg.utils import swagger_auto_schema, no_body
 from drf_yasg import openapi
-from .models import Loan
-from .serializers import LoanSerializer, LoanDetailSerializer, BorrowBookSerializer, EmptySerializer
+from .models import Loan, Hold, CirculationRollup
+from . import rollups
+from .serializers import (
+    LoanSerializer,
+    LoanDetailSerializer,
+    BorrowBookSerializer,
+    EmptySerializer,
+    HoldSerializer,
+    PlaceHoldSerializer,
+)
 from apps.books.models import Book
 from apps.accounts.permissions import IsAdministrator, IsOwnerOrAdministrator
+from apps.accounts.throttling import BorrowThrottle
+from config.routers import ReplicaReadsMixin
 
 
-class LoanViewSet(viewsets.ModelViewSet):
+# borrowed_at range filters; the loans table is partitioned by borrowed_at
+# on PostgreSQL, so these let the planner skip whole partitions.
+BORROWED_RANGE_PARAMETERS = [
+    openapi.Parameter('since', openapi.IN_QUERY, description="Only loans borrowed on or after this date (YYYY-MM-DD)", type=openapi.TYPE_STRING, required=False),
+    openapi.Parameter('until', openapi.IN_QUERY, description="Only loans borrowed on or before this date (YYYY-MM-DD)", type=openapi.TYPE_STRING, required=False),
+]
+
+ANALYTICS_GROUPINGS = ('day', 'genre', 'cohort')
+
+
+class LoanViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     Borrowing Management API
     
@@ -27,6 +51,14 @@ class LoanViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post']
     filter_backends = []  # Disable all filters to clean up Swagger
     pagination_class = None  # Simple list without pagination for loans
+    # Queries per request, enforced by the test suite (tests/query_budget.py)
+    query_budget = {
+        'list': 3, 'retrieve': 3, 'create': 4,
+        'active': 3, 'my_loans': 3, 'all_loans': 3, 'overdue': 3, 'analytics': 3,
+        'borrow': 12, 'return_book': 16,
+    }
+    # Listings served from a read replica when one is configured (config/routers.py)
+    replica_actions = {'list', 'active', 'my_loans', 'all_loans', 'overdue'}
 
     def get_queryset(self):
         """Members see only their loans. Admins see all."""
@@ -36,7 +68,7 @@ class LoanViewSet(viewsets.ModelViewSet):
         if getattr(self, 'swagger_fake_view', False):
             return Loan.objects.none()
         
-        if user.groups.filter(name='Administrators').exists():
+        if user.is_administrator:
             return queryset.order_by('-borrowed_at')
         return queryset.filter(user=user).order_by('-borrowed_at')
 
@@ -45,6 +77,30 @@ class LoanViewSet(viewsets.ModelViewSet):
             return LoanDetailSerializer
         return LoanSerializer
 
+    def _parse_date_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: 'Use the YYYY-MM-DD format.'})
+        return parsed
+
+    def filter_borrowed_range(self, queryset):
+        """Apply the ?since= / ?until= borrowed_at bounds."""
+        since = self._parse_date_param('since')
+        until = self._parse_date_param('until')
+        tz = timezone.get_current_timezone()
+        if since:
+            queryset = queryset.filter(borrowed_at__gte=datetime.combine(since, time.min, tzinfo=tz))
+        if until:
+            end = datetime.combine(until + timedelta(days=1), time.min, tzinfo=tz)
+            queryset = queryset.filter(borrowed_at__lt=end)
+        return queryset
+
     @swagger_auto_schema(
         operation_summary="List loans (Admin: all, Members: own)",
         operation_description="""**Administrators**: View all loans in the system  
@@ -78,7 +134,7 @@ class LoanViewSet(viewsets.ModelViewSet):
             400: "Book not available or already borrowed"
         }
     )
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], throttle_classes=[BorrowThrottle])
     def borrow(self, request):
         """Borrow a book by ID."""
         serializer = BorrowBookSerializer(data=request.data)
@@ -89,7 +145,7 @@ class LoanViewSet(viewsets.ModelViewSet):
             try:
                 book = Book.objects.select_for_update().get(pk=book_id)
             except Book.DoesNotExist:
-                return Response({'error': 'Book not found.'}, status=status.HTTP_404_NOT_FOUND)
+                return Response({'error': 'Book not found.'}, status=status.HTTP_400_BAD_REQUEST)
 
             if not book.is_available:
                 return Response({'error': 'Book is not available.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -104,6 +160,7 @@ class LoanViewSet(viewsets.ModelViewSet):
             loan = Loan.objects.create(user=request.user, book=book)
             book.is_available = False
             book.save()
+            rollups.record_borrow(loan)
 
         return Response(LoanSerializer(loan).data, status=status.HTTP_201_CREATED)
 
@@ -122,17 +179,51 @@ class LoanViewSet(viewsets.ModelViewSet):
         """Return a borrowed book by loan ID (Admin only)."""
         loan = self.get_object()
 
-        if loan.returned_at:
-            return Response({'error': 'Book already returned.'}, status=status.HTTP_400_BAD_REQUEST)
-
         with transaction.atomic():
+            # Book first, as borrow does; then re-read the loan under its own
+            # lock, so a concurrent return of it fails here instead of handing
+            # the copy to a second hold
+            book = Book.objects.select_for_update().get(pk=loan.book_id)
+            loan = Loan.objects.select_for_update().get(pk=loan.pk)
+            loan.book = book
+            if loan.returned_at:
+                return Response({'error': 'Book already returned.'}, status=status.HTTP_400_BAD_REQUEST)
+
             loan.returned_at = timezone.now()
             loan.save()
-            loan.book.is_available = True
-            loan.book.save()
+            rollups.record_return(loan)
+
+            # Hand the copy straight to the head of the hold queue, if any
+            next_loan = self._hand_off_to_next_hold(book)
+            book.is_available = next_loan is None
+            book.save()
 
         return Response(LoanSerializer(loan).data)
 
+    def _hand_off_to_next_hold(self, book):
+        """
+        Lend a just-returned book to the oldest open hold.
+        Members who still have a book out keep their place and are skipped.
+        Must be called inside the transaction holding the book row lock.
+        """
+        has_active_loan = Loan.objects.filter(user=OuterRef('user'), returned_at__isnull=True)
+        hold = (
+            Hold.objects.select_for_update(of=('self',))
+            .select_related('user')
+            .filter(book=book, fulfilled_at__isnull=True)
+            .exclude(Exists(has_active_loan))
+            .order_by('id')
+            .first()
+        )
+        if hold is None:
+            return None
+
+        next_loan = Loan.objects.create(user=hold.user, book=book)
+        rollups.record_borrow(next_loan)
+        hold.fulfilled_at = timezone.now()
+        hold.save(update_fields=['fulfilled_at'])
+        return next_loan
+
     @swagger_auto_schema(
         operation_summary="My active loans (with loan IDs)",
         operation_description="""Get your currently active (unreturned) loans.
@@ -149,12 +240,14 @@ class LoanViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="All loans (Admin only)",
-        operation_description="View all loans in the system across all users - requires administrator access"
+        operation_description="View all loans in the system across all users - requires administrator access",
+        manual_parameters=BORROWED_RANGE_PARAMETERS
     )
     @action(detail=False, methods=['get'], permission_classes=[IsAdministrator])
     def all_loans(self, request):
         """Get all loans in the system (Admin only)."""
         queryset = Loan.objects.select_related('user', 'book').order_by('-borrowed_at')
+        queryset = self.filter_borrowed_range(queryset)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -165,20 +258,162 @@ class LoanViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAdministrator])
     def overdue(self, request):
         """Get overdue loans (Admin only)."""
+        now = timezone.now()
+        # A loan is always borrowed before it falls due, so the borrowed_at
+        # bound is implied; stating it lets the planner skip future partitions.
         queryset = Loan.objects.filter(
             returned_at__isnull=True,
-            due_date__lt=timezone.now()
+            due_date__lt=now,
+            borrowed_at__lt=now,
         ).select_related('user', 'book').order_by('-due_date')
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @swagger_auto_schema(
+        operation_summary="Circulation analytics (Admin only)",
+        operation_description="""Borrow, return and overdue counts from the daily circulation rollups.
+
+**group_by**: `day` (default), `genre` or `cohort` (member signup month)  
+**start** / **end**: date range (YYYY-MM-DD), defaults to the last 30 days
+        """,
+        manual_parameters=[
+            openapi.Parameter('start', openapi.IN_QUERY, description="First day (YYYY-MM-DD)", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('end', openapi.IN_QUERY, description="Last day (YYYY-MM-DD)", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('group_by', openapi.IN_QUERY, description="Grouping", type=openapi.TYPE_STRING, enum=['day', 'genre', 'cohort'], required=False, default='day'),
+        ]
+    )
+    @action(detail=False, methods=['get'], permission_classes=[IsAdministrator])
+    def analytics(self, request):
+        """Aggregate circulation rollups over a date range (Admin only)."""
+        end = self._parse_date_param('end') or timezone.localdate()
+        start = self._parse_date_param('start') or end - timedelta(days=29)
+        group_by = request.query_params.get('group_by', 'day')
+        if group_by not in ANALYTICS_GROUPINGS:
+            raise ValidationError({'group_by': f"Choose one of: {', '.join(ANALYTICS_GROUPINGS)}."})
+        if start > end:
+            raise ValidationError({'start': 'start must not be after end.'})
+
+        rows = (
+            CirculationRollup.objects.filter(day__gte=start, day__lte=end)
+            .values(group_by)
+            .annotate(borrows=Sum('borrows'), returns=Sum('returns'), overdues=Sum('overdues'))
+            .order_by(group_by)
+        )
+        return Response({
+            'start': start,
+            'end': end,
+            'group_by': group_by,
+            'results': list(rows),
+        })
+
     @swagger_auto_schema(
         operation_summary="My loans (all history)",
-        operation_description="Get all your loans including returned"
+        operation_description="Get all your loans including returned. Narrow the history with ?since= and ?until=.",
+        manual_parameters=BORROWED_RANGE_PARAMETERS
     )
     @action(detail=False, methods=['get'])
     def my_loans(self, request):
         """Get current user's all loans."""
         queryset = Loan.objects.filter(user=request.user).select_related('book').order_by('-borrowed_at')
+        queryset = self.filter_borrowed_range(queryset)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
+
+
+class HoldViewSet(viewsets.ModelViewSet):
+    """
+    Hold Queue API
+
+    Members: Join the queue for a book that is out, check your position, leave the queue
+    """
+    serializer_class = HoldSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete']
+    filter_backends = []
+    pagination_class = None
+    # Queries per request, enforced by the test suite (tests/query_budget.py)
+    query_budget = {'list': 2, 'retrieve': 2, 'create': 6, 'destroy': 3}
+
+    def get_queryset(self):
+        """Members see only their open holds, annotated with queue position."""
+        if getattr(self, 'swagger_fake_view', False):
+            return Hold.objects.none()
+
+        # Position = open holds on the same book up to and including this one
+        # (served by the partial holds_open_queue_idx index)
+        position = (
+            Hold.objects.filter(
+                book=OuterRef('book'),
+                fulfilled_at__isnull=True,
+                id__lte=OuterRef('id'),
+            )
+            .order_by()
+            .values('book')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return (
+            Hold.objects.filter(user=self.request.user, fulfilled_at__isnull=True)
+            .select_related('book')
+            .annotate(position=Subquery(position))
+            .order_by('id')
+        )
+
+    @swagger_auto_schema(
+        operation_summary="My holds (with queue position)",
+        operation_description="List your open holds. 'position' 1 means you are next in line.",
+        responses={200: HoldSerializer(many=True)}
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(operation_summary="Get hold details")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_summary="Place a hold",
+        operation_description="Join the queue for a book that is currently borrowed. "
+                              "The book is lent to you automatically when it comes back.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['book_id'],
+            properties={
+                'book_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='ID of the book to hold')
+            }
+        ),
+        responses={
+            201: HoldSerializer,
+            400: "Book is available or already held/borrowed by you"
+        }
+    )
+    def create(self, request, *args, **kwargs):
+        serializer = PlaceHoldSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        book_id = serializer.validated_data['book_id']
+
+        with transaction.atomic():
+            # Lock the book so a concurrent return cannot slip in between the
+            # availability check and joining the queue
+            try:
+                book = Book.objects.select_for_update().get(pk=book_id)
+            except Book.DoesNotExist:
+                return Response({'error': 'Book not found.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            if book.is_available:
+                return Response({'error': 'Book is available - borrow it instead.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            if Loan.objects.filter(user=request.user, book=book, returned_at__isnull=True).exists():
+                return Response({'error': 'You already have this book.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            if Hold.objects.filter(user=request.user, book=book, fulfilled_at__isnull=True).exists():
+                return Response({'error': 'You already have a hold on this book.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            hold = Hold.objects.create(user=request.user, book=book)
+
+        hold = self.get_queryset().get(pk=hold.pk)
+        return Response(HoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(operation_summary="Cancel a hold")
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
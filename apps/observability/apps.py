@@ -0,0 +1,15 @@
+"""
+Observability app configuration.
+"""
+from django.apps import AppConfig
+
+
+class ObservabilityConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.observability'
+    verbose_name = 'Observability'
+
+    def ready(self):
+        """Hook query and serializer timing."""
+        from .instrumentation import install
+        install()
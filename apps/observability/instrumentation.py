@@ -0,0 +1,163 @@
+"""
+Hooks that attribute work to the current request's metrics and trace.
+
+- Database: an execute wrapper installed on every connection as it is
+  opened, so it covers all aliases and threads. Counts queries and their
+  time, and adds a span per statement (without parameters) when traced.
+  Tags statements with the view that ran them when METRICS_SQL_COMMENTS
+  is on.
+- Serializers: BaseSerializer.data is wrapped. Only the outermost .data of
+  a request is timed for metrics; nested serializers are part of it. The
+  time includes queries the serializer triggers.
+- DRF stages, traced only: authentication, permission and throttle checks,
+  each filter backend, pagination and rendering.
+
+Outside a request (management commands, the shell) and in requests that
+are not traced, each hook costs a context variable lookup or two.
+"""
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_framework.views import APIView
+
+from .metrics import current, view_name
+from .tracing import CLIENT, call_in_span, current_span
+
+# Longer statements are truncated in spans
+MAX_STATEMENT = 2000
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current.get()
+    parent = current_span.get()
+    if stats is None and parent is None:
+        return execute(sql, params, many, context)
+    span = None
+    if parent is not None:
+        connection = context['connection']
+        span = parent.child(sql.split(None, 1)[0].upper() if sql else 'QUERY', CLIENT, {
+            'db.system': connection.vendor,
+            'db.alias': connection.alias,
+            'db.statement': sql[:MAX_STATEMENT],
+        })
+    if stats is not None and stats.request is not None:
+        sql = f'{sql} /* view={view_name(stats.request)} */'
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    except BaseException as exc:
+        if span is not None:
+            span.fail(exc)
+        raise
+    finally:
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+        if span is not None:
+            rowcount = getattr(context['cursor'], 'rowcount', -1)
+            if rowcount >= 0:
+                span.attributes['db.rows'] = rowcount
+            if many:
+                span.attributes['db.executemany'] = True
+            span.end()
+
+
+def _install_query_hook(sender, connection, **kwargs):
+    # Fires again when a persistent connection reconnects
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _serializer_name(serializer):
+    if isinstance(serializer, ListSerializer):
+        return f'{type(serializer.child).__name__}(many=True)'
+    return type(serializer).__name__
+
+
+def _timed_data(data):
+    def measured(self):
+        stats = current.get()
+        if stats is None or stats.serializer_depth:
+            return data.fget(self)
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data.fget(self)
+        finally:
+            stats.serializer_time += time.perf_counter() - started
+            stats.serializer_depth -= 1
+
+    def timed(self):
+        if current_span.get() is None:
+            return measured(self)
+        name = _serializer_name(self)
+        return call_in_span(f'serialize {name}', {'drf.serializer': name}, measured, self)
+    timed.__wrapped__ = data.fget
+    return property(timed)
+
+
+def _traced_method(cls, name, span_name):
+    """Wrap cls.name in a span when the request is traced."""
+    original = getattr(cls, name)
+
+    def traced(self, *args, **kwargs):
+        if current_span.get() is None:
+            return original(self, *args, **kwargs)
+        return call_in_span(span_name, {}, original, self, *args, **kwargs)
+    traced.__wrapped__ = original
+    setattr(cls, name, traced)
+
+
+def _traced_filter_queryset(original):
+    # One span per backend, in the order GenericAPIView.filter_queryset applies them
+    def filter_queryset(self, queryset):
+        if current_span.get() is None:
+            return original(self, queryset)
+        for backend in list(self.filter_backends):
+            queryset = call_in_span(
+                f'filter {backend.__name__}', {'drf.filter_backend': backend.__name__},
+                backend().filter_queryset, self.request, queryset, self,
+            )
+        return queryset
+    filter_queryset.__wrapped__ = original
+    return filter_queryset
+
+
+def _traced_paginate_queryset(original):
+    def paginate_queryset(self, queryset):
+        if current_span.get() is None or self.paginator is None:
+            return original(self, queryset)
+        name = type(self.paginator).__name__
+        return call_in_span(f'paginate {name}', {'drf.paginator': name}, original, self, queryset)
+    paginate_queryset.__wrapped__ = original
+    return paginate_queryset
+
+
+def _traced_rendered_content(rendered_content):
+    def traced(self):
+        if current_span.get() is None:
+            return rendered_content.fget(self)
+        name = type(self.accepted_renderer).__name__
+        return call_in_span(f'render {name}', {'drf.renderer': name}, rendered_content.fget, self)
+    traced.__wrapped__ = rendered_content.fget
+    return property(traced)
+
+
+def install():
+    connection_created.connect(_install_query_hook, dispatch_uid='observability.record_query')
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is not None:
+            _install_query_hook(None, connection)
+    if hasattr(BaseSerializer.data.fget, '__wrapped__'):
+        return  # Already installed
+    BaseSerializer.data = _timed_data(BaseSerializer.data)
+    Response.rendered_content = _traced_rendered_content(Response.rendered_content)
+    GenericAPIView.filter_queryset = _traced_filter_queryset(GenericAPIView.filter_queryset)
+    GenericAPIView.paginate_queryset = _traced_paginate_queryset(GenericAPIView.paginate_queryset)
+    _traced_method(APIView, 'perform_authentication', 'authenticate')
+    _traced_method(APIView, 'check_permissions', 'check_permissions')
+    _traced_method(APIView, 'check_throttles', 'check_throttles')
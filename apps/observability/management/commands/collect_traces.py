@@ -0,0 +1,113 @@
+"""
+Management command to run a local stand-in for an OTLP trace collector.
+
+Accepts OTLP/JSON exports over HTTP (POST /v1/traces), the format sent
+with TRACING_EXPORTER = 'otlp', and prints each trace as an indented tree
+of spans with their durations. With --output the raw exports are also
+appended to a file, one document per line, the same format as the 'file'
+exporter. --read prints the traces in such a file instead of listening.
+
+Example:
+    python manage.py collect_traces --port 4318
+    TRACING_SAMPLE_RATE=1 TRACING_EXPORTER=otlp python manage.py runserver
+    python manage.py collect_traces --read /tmp/library-traces.jsonl
+"""
+import json
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _attribute(value):
+    return next(iter(value.values()), '')
+
+
+def format_traces(document):
+    """Lines of an indented span tree per trace in an OTLP/JSON export."""
+    traces = defaultdict(list)
+    for resource_spans in document.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for span in scope_spans.get('spans', []):
+                traces[span['traceId']].append(span)
+
+    lines = []
+    for trace_id, spans in traces.items():
+        ids = {span['spanId'] for span in spans}
+        children = defaultdict(list)
+        for span in spans:
+            parent = span.get('parentSpanId') if span.get('parentSpanId') in ids else None
+            children[parent].append(span)
+        lines.append(f'trace {trace_id}')
+
+        def walk(parent, depth):
+            for span in sorted(children[parent], key=lambda item: int(item['startTimeUnixNano'])):
+                duration = (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e6
+                attributes = {item['key']: _attribute(item['value']) for item in span.get('attributes', [])}
+                detail = attributes.get('db.statement') or attributes.get('url.query') or ''
+                error = '  ERROR' if span.get('status', {}).get('code') == 2 else ''
+                line = f'{"  " * depth}{span["name"]:<{max(1, 48 - 2 * depth)}} {duration:9.3f}ms{error}'
+                lines.append(f'{line}  {detail[:120]}' if detail else line)
+                walk(span['spanId'], depth + 1)
+        walk(None, 1)
+    return lines
+
+
+class Command(BaseCommand):
+    help = 'Run a local OTLP/JSON trace collector that prints span trees'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=4318, help='Port to listen on (default: 4318, the OTLP/HTTP port)')
+        parser.add_argument('--output', help='Also append each export to this file')
+        parser.add_argument('--read', help='Print the traces in an exported file and exit')
+
+    def handle(self, *args, **options):
+        if options['read']:
+            try:
+                with open(options['read'], encoding='utf-8') as handle:
+                    for line in handle:
+                        if line.strip():
+                            self.stdout.write('\n'.join(format_traces(json.loads(line))))
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read {options["read"]}: {e}')
+            return
+
+        command = self
+        lock = Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.rstrip('/') != '/v1/traces':
+                    self.send_error(404)
+                    return
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                try:
+                    document = json.loads(body)
+                except ValueError:
+                    self.send_error(400, 'Expected OTLP/JSON')
+                    return
+                with lock:
+                    if options['output']:
+                        with open(options['output'], 'a', encoding='utf-8') as handle:
+                            handle.write(json.dumps(document, separators=(',', ':')) + '\n')
+                    command.stdout.write('\n'.join(format_traces(document)))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        self.stdout.write(self.style.SUCCESS(
+            f'Collecting traces on http://{options["host"]}:{options["port"]}/v1/traces (Ctrl-C to stop)'
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
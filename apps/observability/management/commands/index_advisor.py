@@ -0,0 +1,375 @@
+"""
+Management command to review the database's indexes against the queries
+the API actually runs. PostgreSQL only.
+
+Reads pg_stat_statements for the statements that took the most time and
+pg_stat_user_indexes / pg_stat_user_tables for how indexes and tables are
+scanned, then reports:
+- hot statements, attributed to the view that ran them. Statements carry
+  a /* view=... */ comment when METRICS_SQL_COMMENTS is on; otherwise the
+  viewsets serving the tables involved are listed with a ~ in front.
+  pg_stat_statements ignores comments when it groups statements and keeps
+  the text of the first call, so a statement several views run (the user
+  lookup, say) is credited to whichever ran it first. Per-view query
+  counts and time are in /metrics (library_db_queries_total,
+  library_db_query_duration_seconds_total).
+- unused indexes: never scanned since the statistics were reset, and not
+  backing a primary key, unique or exclusion constraint.
+- missing indexes: for each hot statement, the index its WHERE and ORDER
+  BY would use (equality columns, then the range or sort column; IS NULL
+  conditions become a partial index; icontains becomes a trigram index on
+  UPPER(column), ILIKE and LIKE a trigram index on the column),
+  unless an existing index already starts with those columns. Each comes
+  with a CREATE INDEX CONCURRENTLY statement and an estimated benefit: the
+  statement time spent in sequential scans of the table, scaled by the
+  share of scanned rows the statement did not return. It is a rough upper
+  bound for ranking, not a prediction; check with EXPLAIN before adding.
+
+Needs the pg_stat_statements extension (shared_preload_libraries, then
+CREATE EXTENSION pg_stat_statements). Run it after a representative
+period of traffic, or a loadgen run.
+
+Example:
+    python manage.py index_advisor --top 20 --min-calls 50
+"""
+import re
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import URLResolver, get_resolver
+
+# Identifiers are capped at 63 bytes
+MAX_NAME = 63
+
+TAG = re.compile(r'/\* view=(\S+) \*/')
+COLUMN = r'"(\w+)"\."(\w+)"'
+EQUALS = re.compile(COLUMN + r'(?:::\w+)? (?:= \$\d+|= ANY\(\$\d+|IN \(\$\d+)')
+IS_NULL = re.compile(COLUMN + r' IS NULL')
+RANGE = re.compile(COLUMN + r'(?:::\w+)? (?:<|<=|>|>=) \$\d+')
+# Django's icontains is UPPER("t"."c"::text) LIKE UPPER($1); an index on
+# the column itself cannot serve it, only one on the same expression
+CONTAINS = re.compile(r'(UPPER\()?' + COLUMN + r'(?:::text)?(?(1)\)) I?LIKE ')
+# Trigram index columns in pg_get_indexdef: upper((title)::text) or title
+TRIGRAM_COLUMN = re.compile(r'(?:upper\(\(?(\w+)\)?::text\)|(\w+)) gin_trgm_ops', re.IGNORECASE)
+ORDER_BY = re.compile(r'\bORDER BY (.+?)(?: LIMIT | OFFSET | FOR UPDATE|\)|$)', re.DOTALL)
+ORDER_TERM = re.compile(COLUMN + r'( DESC| ASC)?')
+
+STATEMENTS_SQL = """
+    SELECT query, calls, total_exec_time, rows
+    FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND calls >= %s AND query ~* '^\\s*(SELECT|UPDATE|DELETE)'
+    ORDER BY total_exec_time DESC
+    LIMIT %s
+"""
+
+# Every index on a table in the search path, with its columns in order
+INDEXES_SQL = """
+    SELECT t.relname, i.relname, am.amname, t.relkind = 'p',
+           ix.indisprimary OR ix.indisunique OR ix.indisexclusion,
+           pg_get_expr(ix.indpred, ix.indrelid),
+           ARRAY(
+               SELECT coalesce(a.attname, '')
+               FROM unnest(ix.indkey) WITH ORDINALITY AS k(attnum, position)
+               LEFT JOIN pg_attribute a ON a.attrelid = ix.indrelid AND a.attnum = k.attnum
+               ORDER BY k.position
+           ),
+           pg_get_indexdef(ix.indexrelid), s.idx_scan, pg_relation_size(ix.indexrelid)
+    FROM pg_index ix
+    JOIN pg_class i ON i.oid = ix.indexrelid
+    JOIN pg_class t ON t.oid = ix.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_am am ON am.oid = i.relam
+    LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = ix.indexrelid
+    WHERE n.nspname = ANY(current_schemas(false))
+"""
+
+# Scans per table, partitions summed into their parent
+TABLES_SQL = """
+    SELECT coalesce(p.relname, s.relname), sum(s.seq_scan), sum(s.seq_tup_read),
+           sum(coalesce(s.idx_scan, 0)), sum(s.n_live_tup)
+    FROM pg_stat_user_tables s
+    LEFT JOIN pg_inherits inh ON inh.inhrelid = s.relid
+    LEFT JOIN pg_class p ON p.oid = inh.inhparent
+    GROUP BY 1
+"""
+
+
+class Index:
+    """An existing index, or one the advisor proposes."""
+
+    def __init__(self, table, columns, method='btree', predicate=None, name=None, equality=0):
+        self.table = table
+        # (column, 'DESC' or '') pairs; the direction only matters for proposals
+        self.columns = tuple(columns)
+        self.method = method
+        self.predicate = predicate
+        self.name = name
+        # Leading columns compared for equality, which may come in any order
+        self.equality = equality
+
+    @property
+    def key(self):
+        return (self.table, self.method, self.columns, self.predicate)
+
+    def column_names(self):
+        return [column for column, _ in self.columns]
+
+    def covers(self, proposal):
+        """
+        Whether this index serves proposal: same table and method, and its
+        leading columns are proposal's equality columns in any order,
+        followed by the rest of proposal's columns in order.
+        """
+        if self.table != proposal.table or self.method != proposal.method:
+            return False
+        # pg_get_expr wraps predicates in parentheses
+        if self.predicate and self.predicate.strip('()') != proposal.predicate:
+            return False
+        mine, wanted = self.column_names(), proposal.column_names()
+        if len(mine) < len(wanted):
+            return False
+        lead = proposal.equality
+        return set(mine[:lead]) == set(wanted[:lead]) and mine[lead:len(wanted)] == wanted[lead:]
+
+    def create_sql(self, concurrently=True):
+        if self.method == 'gin':
+            columns = ', '.join(f'{column} gin_trgm_ops' for column, _ in self.columns)
+        else:
+            columns = ', '.join(f'{column}{" DESC" if direction == "DESC" else ""}' for column, direction in self.columns)
+        sql = (
+            f'CREATE INDEX {"CONCURRENTLY " if concurrently else ""}{self.name} '
+            f'ON {self.table} {"USING gin " if self.method == "gin" else ""}({columns})'
+        )
+        if self.predicate:
+            sql += f' WHERE {self.predicate}'
+        return sql + ';'
+
+    def describe(self):
+        text = f'{self.table} {"USING gin " if self.method == "gin" else ""}({", ".join(self.column_names())})'
+        return f'{text} WHERE {self.predicate}' if self.predicate else text
+
+
+def upper_expression(column):
+    """The expression icontains compares, as a trigram index column."""
+    return f'UPPER({column}::text)'
+
+
+def trigram_columns(definition):
+    """The columns of a trigram index from pg_get_indexdef, UPPER() expressions as proposed."""
+    return [upper_expression(upper) if upper else column for upper, column in TRIGRAM_COLUMN.findall(definition)]
+
+
+def index_name(table, columns, suffix):
+    name = f'{table}_{"_".join(columns)}_{suffix}'
+    return name if len(name) <= MAX_NAME else f'{name[:MAX_NAME - len(suffix) - 1].rstrip("_")}_{suffix}'
+
+
+def propose(sql):
+    """
+    The indexes the WHERE and ORDER BY of a normalized statement would use,
+    one btree per table plus a trigram index per icontains column.
+    """
+    sql = TAG.sub('', sql)
+    equality, ranges, nulls, order = defaultdict(list), defaultdict(list), defaultdict(list), defaultdict(list)
+    proposals = []
+
+    for upper, table, column in CONTAINS.findall(sql):
+        if upper:
+            index = Index(table, [(upper_expression(column), '')], 'gin',
+                          name=index_name(table, ['upper', column], 'trgm_idx'))
+        else:
+            index = Index(table, [(column, '')], 'gin', name=index_name(table, [column], 'trgm_idx'))
+        if index.key not in {proposal.key for proposal in proposals}:
+            proposals.append(index)
+    for pattern, found in ((EQUALS, equality), (RANGE, ranges), (IS_NULL, nulls)):
+        for table, column in pattern.findall(sql):
+            if column not in found[table]:
+                found[table].append(column)
+    match = ORDER_BY.search(sql)
+    if match:
+        for table, column, direction in ORDER_TERM.findall(match.group(1)):
+            order[table].append((column, direction.strip()))
+
+    for table in sorted(set(equality) | set(ranges) | set(nulls) | set(order)):
+        eq = [column for column in equality[table] if column not in nulls[table]]
+        columns = [(column, '') for column in eq]
+        if ranges[table]:
+            # A btree serves one range after the equality columns; ordering past it needs a sort anyway
+            columns.append((ranges[table][0], ''))
+        else:
+            columns.extend(term for term in order[table] if term[0] not in eq)
+        predicate = ' AND '.join(f'{column} IS NULL' for column in nulls[table]) or None
+        if not columns:
+            if not predicate:
+                continue
+            # Only IS NULL conditions: index the column itself
+            columns = [(nulls[table][0], '')]
+            predicate = None
+        name = index_name(table, [column for column, _ in columns], 'partial_idx' if predicate else 'idx')
+        proposals.append(Index(table, columns, predicate=predicate, name=name, equality=len(eq)))
+    return proposals
+
+
+def viewsets_by_table():
+    """{db_table: [viewset names]} from the URL configuration."""
+    tables = defaultdict(set)
+
+    def walk(patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns)
+                continue
+            view_class = getattr(pattern.callback, 'cls', None)
+            model = getattr(getattr(view_class, 'queryset', None), 'model', None)
+            if model is None:
+                serializer = getattr(view_class, 'serializer_class', None)
+                model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+            if model is not None:
+                tables[model._meta.db_table].add(view_class.__name__)
+    walk(get_resolver().url_patterns)
+    return {table: sorted(names) for table, names in tables.items()}
+
+
+def attribute(sql, viewsets):
+    """
+    The view that ran sql, from its tag, or ~ and the viewsets of its
+    tables. The tag is that of the first call pg_stat_statements saw.
+    """
+    match = TAG.search(sql)
+    if match:
+        return match.group(1)
+    names = sorted({name for table in re.findall(r'(?:FROM|JOIN) "(\w+)"', sql) for name in viewsets.get(table, [])})
+    return '~' + ', '.join(names) if names else '~unknown'
+
+
+def benefit(total_ms, calls, rows, table):
+    """Estimated ms saved: time in sequential scans of table times the share of scanned rows not returned."""
+    if not table or not calls:
+        return 0.0
+    seq_scan, seq_tup_read, idx_scan, _live = table
+    if not seq_scan:
+        return 0.0
+    scanned = seq_tup_read / seq_scan
+    returned = rows / calls
+    wasted = max(0.0, 1 - returned / scanned) if scanned else 0.0
+    return total_ms * seq_scan / (seq_scan + idx_scan) * wasted
+
+
+def shorten(sql, width=110):
+    sql = ' '.join(TAG.sub('', sql).split())
+    return sql if len(sql) <= width else sql[:width - 3] + '...'
+
+
+class Command(BaseCommand):
+    help = 'Report unused and missing indexes from pg_stat_statements (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Statements analysed, by total time (default: 25)')
+        parser.add_argument('--min-calls', type=int, default=10, help='Ignore statements run fewer times (default: 10)')
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help='Do not propose indexes on tables with fewer live rows (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The index advisor requires PostgreSQL.')
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_stat_statements'")
+            if cursor.fetchone() is None:
+                raise CommandError(
+                    'pg_stat_statements is not installed. Add it to shared_preload_libraries, '
+                    'restart PostgreSQL and run CREATE EXTENSION pg_stat_statements.'
+                )
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            has_trgm = cursor.fetchone() is not None
+            cursor.execute('SELECT stats_reset FROM pg_stat_database WHERE datname = current_database()')
+            stats_reset = cursor.fetchone()[0]
+            cursor.execute(STATEMENTS_SQL, [options['min_calls'], options['top']])
+            statements = cursor.fetchall()
+            cursor.execute(INDEXES_SQL)
+            indexes = cursor.fetchall()
+            cursor.execute(TABLES_SQL)
+            tables = {row[0]: tuple(int(value or 0) for value in row[1:]) for row in cursor.fetchall()}
+
+        since = f'since {stats_reset:%Y-%m-%d %H:%M}' if stats_reset else 'since the server started'
+        viewsets = viewsets_by_table()
+        self._report_statements(statements, viewsets, since)
+        self._report_unused(indexes, since)
+        self._report_missing(statements, indexes, tables, viewsets, has_trgm, options['min_rows'])
+        self.stdout.write(self.style.SUCCESS('Index review completed!'))
+
+    def _report_statements(self, statements, viewsets, since):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Hot statements ({since})'))
+        if not statements:
+            self.stdout.write('  No statements recorded yet; run some traffic first.')
+        for sql, calls, total_ms, _rows in statements:
+            self.stdout.write(
+                f'  {total_ms / 1000:>8.2f}s {calls:>9} calls {total_ms / calls:>8.2f}ms/call  '
+                f'{attribute(sql, viewsets)}\n      {shorten(sql)}'
+            )
+
+    def _report_unused(self, indexes, since):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nUnused indexes (no scans {since})'))
+        unused = [
+            row for row in indexes
+            # Partitioned parents have no statistics of their own; their partitions' indexes are listed
+            if not row[3] and not row[4] and row[8] == 0
+        ]
+        if not unused:
+            self.stdout.write('  None.')
+        for table, name, _method, _partitioned, _constraint, _predicate, _columns, definition, _scans, size in sorted(
+            unused, key=lambda row: -row[9]
+        ):
+            self.stdout.write(f'  {name} on {table}, {size / 1024 / 1024:.1f} MB\n      {definition}')
+            self.stdout.write(f'      DROP INDEX CONCURRENTLY {name};')
+
+    def _report_missing(self, statements, indexes, tables, viewsets, has_trgm, min_rows):
+        existing = defaultdict(list)
+        partitioned = set()
+        for table, name, method, is_partitioned, _constraint, predicate, columns, definition, _scans, _size in indexes:
+            if is_partitioned:
+                partitioned.add(table)
+            if method == 'gin' and 'gin_trgm_ops' in definition:
+                columns = trigram_columns(definition)
+            elif method != 'btree':
+                continue
+            existing[table].append(Index(table, [(column, '') for column in columns], method, predicate, name))
+
+        # Proposals from several statements are merged, with their benefits added up
+        proposals = {}
+        for sql, calls, total_ms, rows in statements:
+            for proposal in propose(sql):
+                if tables.get(proposal.table, (0, 0, 0, 0))[3] < min_rows:
+                    continue
+                if any(index.covers(proposal) for index in existing[proposal.table]):
+                    continue
+                entry = proposals.setdefault(proposal.key, {'index': proposal, 'benefit': 0.0, 'calls': 0, 'views': set()})
+                entry['benefit'] += benefit(total_ms, calls, rows, tables.get(proposal.table))
+                entry['calls'] += calls
+                entry['views'].add(attribute(sql, viewsets))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nMissing indexes (by estimated benefit)'))
+        if not proposals:
+            self.stdout.write('  None.')
+        for entry in sorted(proposals.values(), key=lambda entry: -entry['benefit']):
+            index = entry['index']
+            self.stdout.write(
+                f'  {index.describe()}  for {", ".join(sorted(entry["views"]))}\n'
+                f'      est. benefit {entry["benefit"] / 1000:.2f}s '
+                f'({entry["benefit"] / entry["calls"]:.2f}ms/call over {entry["calls"]} calls)'
+            )
+            if index.table in partitioned:
+                # CONCURRENTLY is not supported on partitioned tables
+                self.stdout.write(self.style.WARNING(
+                    '      Partitioned table: create it on each partition CONCURRENTLY and attach, '
+                    'or run this in a quiet period.'
+                ))
+                self.stdout.write(f'      {index.create_sql(concurrently=False)}')
+            else:
+                self.stdout.write(f'      {index.create_sql()}')
+            if index.method == 'gin' and not has_trgm:
+                self.stdout.write('      Needs CREATE EXTENSION pg_trgm;')
@@ -0,0 +1,501 @@
+"""
+Management command to load-test the API with a mixed workload.
+
+Replays the scenarios of a YAML file (apps/observability/scenarios/
+default.yaml describes the format) against a running server (--url) or
+against gunicorn started for the run. Iterations of the scenarios start
+on an open-loop schedule at the target request rate. Each request is timed
+from when it was due, so a server that falls behind shows up in the
+latencies instead of slowing the generator down.
+
+Requests go over keep-alive HTTP/1.1 connections driven by asyncio, a
+pool of --connections shared by all iterations. Members and administrators
+are created for the run in the configured database, with tokens signed
+locally, so --url must point at a server using the same database and
+SECRET_KEY; they are deleted afterwards. Run it against a staging or
+local database: the loans and reviews it writes are counted in the
+circulation analytics.
+
+Reports throughput, latency percentiles and status codes per step, and
+database queries and time per view from the server's /metrics (plus
+pg_stat_database counters on PostgreSQL).
+
+Example:
+    python manage.py loadgen --rate 100 --duration 30 --workers 4
+    python manage.py loadgen --url http://staging:8000 --scenario traffic.yaml
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import yaml
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.accounts.groups import group_id
+from apps.accounts.models import User
+from apps.accounts.tokens import RoleTokenObtainPairSerializer
+from apps.books.models import Book
+from apps.loans.management.commands.bench_borrow_concurrency import percentile
+
+DEFAULT_SCENARIO = Path(__file__).resolve().parents[2] / 'scenarios' / 'default.yaml'
+PLACEHOLDER = re.compile(r'\{(\w+)\}')
+# Throttle rates for a server started by the command; a load test from one
+# address would otherwise be mostly 429s
+UNTHROTTLED = '1000000/s'
+PG_COUNTERS = ('xact_commit', 'xact_rollback', 'blks_read', 'blks_hit', 'tup_returned', 'tup_fetched',
+               'tup_inserted', 'tup_updated', 'tup_deleted', 'deadlocks', 'temp_bytes')
+
+
+class StepFailed(Exception):
+    """Ends an iteration: an error status or a missing placeholder."""
+
+
+def load_scenarios(path):
+    """Parse and check a scenario file."""
+    try:
+        config = yaml.safe_load(Path(path).read_text())
+    except (OSError, yaml.YAMLError) as e:
+        raise CommandError(f'Could not read scenario file {path}: {e}')
+    if not isinstance(config, dict) or not config.get('scenarios'):
+        raise CommandError(f'{path}: expected a mapping with a scenarios list')
+    for scenario in config['scenarios']:
+        name = scenario.get('name', '?')
+        if not scenario.get('steps'):
+            raise CommandError(f'{path}: scenario {name} has no steps')
+        if scenario.get('weight', 1) <= 0:
+            raise CommandError(f'{path}: scenario {name} needs a positive weight')
+        for step in scenario['steps']:
+            if 'path' not in step:
+                raise CommandError(f'{path}: a step of scenario {name} has no path')
+            auth = step.get('auth', scenario.get('auth', 'anonymous'))
+            if auth not in ('anonymous', 'member', 'admin'):
+                raise CommandError(f'{path}: unknown auth {auth!r} in scenario {name}')
+            step.setdefault('name', f'{step.get("method", "GET").upper()} {step["path"]}')
+    return config
+
+
+def render(template, variables):
+    """Fill {placeholders}; a string that is a single placeholder keeps the value's type."""
+    if isinstance(template, dict):
+        return {key: render(value, variables) for key, value in template.items()}
+    if isinstance(template, list):
+        return [render(value, variables) for value in template]
+    if not isinstance(template, str):
+        return template
+    try:
+        whole = PLACEHOLDER.fullmatch(template)
+        if whole:
+            return variables[whole.group(1)]
+        return PLACEHOLDER.sub(lambda match: str(variables[match.group(1)]), template)
+    except KeyError as e:
+        raise StepFailed(f'no value for {{{e.args[0]}}}')
+
+
+def extract(data, path, rng):
+    """Value at a dotted path of a JSON response; * picks a random list element."""
+    value = data
+    for part in str(path).split('.'):
+        if part == '*':
+            value = rng.choice(value) if isinstance(value, list) and value else None
+        elif isinstance(value, list):
+            value = value[int(part)] if part.isdigit() and int(part) < len(value) else None
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            value = None
+        if value is None:
+            return None
+    return value
+
+
+class Variables(dict):
+    """Saved values, then vars (a random choice per use), then a random catalog book."""
+
+    def __init__(self, pools, book_ids, rng):
+        super().__init__()
+        self.pools, self.book_ids, self.rng = pools, book_ids, rng
+
+    def __missing__(self, key):
+        if key in self.pools:
+            values = self.pools[key]
+            return self.rng.choice(values) if isinstance(values, list) else values
+        if key == 'book_id' and self.book_ids:
+            return self.rng.choice(self.book_ids)
+        raise KeyError(key)
+
+
+class Connection:
+    """A keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, host, port, use_ssl):
+        self.host, self.port, self.ssl = host, port, use_ssl
+        self.reader = self.writer = None
+
+    async def request(self, method, target, headers, body=b''):
+        """Send a request and return (status, body)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port, ssl=ssl.create_default_context() if self.ssl else None
+            )
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        try:
+            self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            status_line = await self.reader.readline()
+            if not status_line:
+                raise ConnectionError('connection closed by server')
+            status = int(status_line.split()[1])
+            response_headers = {}
+            while True:
+                line = await self.reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                response_headers[name.strip().lower()] = value.strip()
+            if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+                chunks = []
+                while True:
+                    size = int((await self.reader.readline()).split(b';')[0], 16)
+                    chunk = await self.reader.readexactly(size + 2)
+                    if not size:
+                        break
+                    chunks.append(chunk[:-2])
+                content = b''.join(chunks)
+            else:
+                content = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+            if response_headers.get('connection', '').lower() == 'close':
+                self.close()
+            return status, content
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class LoadRun:
+    """One run of the scenario mix at a target rate."""
+
+    def __init__(self, config, base_url, rate, duration, connections, tokens, book_ids, seed):
+        self.config = config
+        parts = urlsplit(base_url)
+        self.prefix = parts.path.rstrip('/')
+        self.pool = [
+            Connection(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80), parts.scheme == 'https')
+            for _ in range(connections)
+        ]
+        self.rate, self.duration = rate, duration
+        self.tokens, self.book_ids = tokens, book_ids
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.iterations = Counter()
+        self.aborted = Counter()
+        self.dropped = 0
+
+    async def run(self):
+        scenarios = self.config['scenarios']
+        weights = [scenario.get('weight', 1) for scenario in scenarios]
+        steps_per_iteration = sum(w * len(s['steps']) for w, s in zip(weights, scenarios)) / sum(weights)
+        iteration_rate = self.rate / steps_per_iteration
+        max_in_flight = len(self.pool) * 20
+
+        self.connections = asyncio.Queue()
+        for conn in self.pool:
+            self.connections.put_nowait(conn)
+        self.members = asyncio.Queue()
+        for token in self.tokens['member']:
+            self.members.put_nowait(token)
+
+        tasks = set()
+        started = time.perf_counter()
+        due = started
+        loop = asyncio.get_running_loop()
+        while due < started + self.duration:
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(tasks) >= max_in_flight:
+                self.dropped += 1  # The server is this far behind; don't queue without bound
+            else:
+                scenario = self.rng.choices(scenarios, weights)[0]
+                task = loop.create_task(self._iteration(scenario, due))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # Poisson arrivals
+            due += self.rng.expovariate(iteration_rate)
+        if tasks:
+            await asyncio.wait(tasks)
+        self.elapsed = time.perf_counter() - started
+        for conn in self.pool:
+            conn.close()
+
+    async def _iteration(self, scenario, due):
+        self.iterations[scenario['name']] += 1
+        member = None
+        needs_member = any(step.get('auth', scenario.get('auth')) == 'member' for step in scenario['steps'])
+        if needs_member:
+            # One iteration per member at a time: borrowing is one book per member
+            member = await self.members.get()
+        variables = Variables(self.config.get('vars') or {}, self.book_ids, self.rng)
+        try:
+            for step in scenario['steps']:
+                auth = step.get('auth', scenario.get('auth', 'anonymous'))
+                token = member if auth == 'member' else (self.rng.choice(self.tokens['admin']) if auth == 'admin' else None)
+                await self._step(step, variables, token, due)
+                due = time.perf_counter()
+        except StepFailed:
+            self.aborted[scenario['name']] += 1
+        finally:
+            if member is not None:
+                self.members.put_nowait(member)
+
+    async def _step(self, step, variables, token, due):
+        method = step.get('method', 'GET').upper()
+        target = self.prefix + render(step['path'], variables)
+        headers = {'Accept': 'application/json'}
+        body = b''
+        if 'json' in step:
+            body = json.dumps(render(step['json'], variables)).encode()
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+
+        conn = await self.connections.get()
+        try:
+            status, content = await conn.request(method, target, headers, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+            status, content = type(e).__name__, b''
+        finally:
+            self.connections.put_nowait(conn)
+        self.latencies[step['name']].append(time.perf_counter() - due)
+        self.statuses[step['name']][status] += 1
+
+        if not isinstance(status, int) or status >= 400:
+            raise StepFailed(f'{step["name"]}: {status}')
+        for name, path in (step.get('save') or {}).items():
+            try:
+                value = extract(json.loads(content), path, self.rng)
+            except ValueError:
+                value = None
+            if value is None:
+                raise StepFailed(f'{step["name"]}: nothing at {path}')
+            variables[name] = value
+
+
+def scrape_metrics(base_url, token):
+    """{(series, view): value} of the per-view database counters at /metrics, or None."""
+    request = urllib.request.Request(base_url.rstrip('/') + '/metrics')
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            text = response.read().decode()
+    except OSError:
+        return None
+    values = Counter()
+    pattern = re.compile(
+        r'^(library_db_queries_total|library_db_query_duration_seconds_total|library_http_request_duration_seconds_count)'
+        r'\{view="([^"]*)",method="[^"]*"\} (\S+)$', re.MULTILINE
+    )
+    for series, view, value in pattern.findall(text):
+        values[series, view] += float(value)
+    return values
+
+
+def pg_counters():
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {", ".join(PG_COUNTERS)} FROM pg_stat_database WHERE datname = current_database()'
+        )
+        return dict(zip(PG_COUNTERS, cursor.fetchone()))
+
+
+class Command(BaseCommand):
+    help = 'Load-test the API with a mixed workload defined in YAML'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', default=str(DEFAULT_SCENARIO), help='Scenario file (default: the built-in mix)')
+        parser.add_argument('--url', help='Server to target; without it gunicorn is started for the run')
+        parser.add_argument('--rate', type=float, help='Requests per second (default: from the scenario file)')
+        parser.add_argument('--duration', type=float, help='Seconds to run (default: from the scenario file)')
+        parser.add_argument('--connections', type=int, default=32, help='HTTP connections (default: 32)')
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers when starting the app (default: 2)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker (default: 4)')
+        parser.add_argument('--metrics-token', default=settings.METRICS_TOKEN, help='Bearer token for /metrics')
+        parser.add_argument('--seed', type=int, help='Random seed, to repeat a run')
+        parser.add_argument('--keep', action='store_true', help='Keep the load test users and their loans and reviews')
+
+    def handle(self, *args, **options):
+        config = load_scenarios(options['scenario'])
+        rate = options['rate'] or config.get('rate', 20)
+        duration = options['duration'] or config.get('duration', 30)
+        if rate <= 0 or duration <= 0:
+            raise CommandError('--rate and --duration must be positive')
+
+        book_ids = list(Book.objects.values_list('id', flat=True))
+        if not book_ids:
+            self.stdout.write(self.style.WARNING('The catalog is empty; run seed_books first for realistic results.'))
+
+        run_id = uuid.uuid4().hex[:8]
+        users = config.get('users') or {}
+        tokens = self._setup(run_id, users.get('members', 50), users.get('admins', 2))
+        server = None
+        try:
+            base_url = options['url']
+            if not base_url:
+                server, base_url = self._start_server(options)
+            self.stdout.write(
+                f'Run {run_id}: {rate:g} req/s for {duration:g}s against {base_url}, '
+                f'{options["connections"]} connections, {len(config["scenarios"])} scenarios'
+            )
+
+            metrics_before = scrape_metrics(base_url, options['metrics_token'])
+            pg_before = pg_counters()
+            load = LoadRun(config, base_url, rate, duration, options['connections'], tokens, book_ids, options['seed'])
+            asyncio.run(load.run())
+            metrics_after = scrape_metrics(base_url, options['metrics_token'])
+            pg_after = pg_counters()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+            if not options['keep']:
+                self._cleanup(run_id)
+
+        self._report(load)
+        self._report_db(metrics_before, metrics_after, pg_before, pg_after)
+
+    def _setup(self, run_id, members, admins):
+        """Create the run's users; return {'member': [access tokens], 'admin': [...]}."""
+        password = make_password(None)
+        created = {}
+        for role, count in (('member', members), ('admin', admins)):
+            users = User.objects.bulk_create([
+                User(email=f'{role}{i}@loadgen-{run_id}.local', username=f'loadgen-{run_id}-{role}-{i}', password=password)
+                for i in range(max(1, count))
+            ])
+            groups = ['Members'] + (['Administrators'] if role == 'admin' else [])
+            User.groups.through.objects.bulk_create([
+                User.groups.through(user_id=user.pk, group_id=group_id(name)) for user in users for name in groups
+            ])
+            created[role] = [
+                str(RoleTokenObtainPairSerializer.get_token(user).access_token)
+                for user in User.objects.filter(pk__in=[user.pk for user in users])
+            ]
+        return created
+
+    def _cleanup(self, run_id):
+        run_users = User.objects.filter(email__endswith=f'@loadgen-{run_id}.local')
+        # Books still out on the run's loans become available again
+        Book.objects.filter(loans__user__in=run_users, loans__returned_at__isnull=True).update(is_available=True)
+        run_users.delete()
+
+    def _start_server(self, options):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'),
+            THROTTLE_ANON_SEARCH=UNTHROTTLED, THROTTLE_BORROW=UNTHROTTLED, THROTTLE_AUTH=UNTHROTTLED,
+            METRICS_DIR=tempfile.mkdtemp(prefix='loadgen-metrics-'),
+        )
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', 'config.wsgi:application', '--bind', f'127.0.0.1:{port}',
+             '--workers', str(options['workers']), '--threads', str(options['threads'])],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {server.returncode}')
+            try:
+                urllib.request.urlopen(base_url + '/metrics', timeout=1).close()
+                return server, base_url
+            except OSError as e:
+                if getattr(e, 'code', None):
+                    return server, base_url  # Up, but /metrics wants a token
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError('gunicorn did not start within 30 seconds')
+
+    def _report(self, load):
+        total = sum(len(values) for values in load.latencies.values())
+        errors = sum(
+            count for statuses in load.statuses.values()
+            for status, count in statuses.items() if not isinstance(status, int) or status >= 400
+        )
+        self.stdout.write('')
+        self.stdout.write(f'Elapsed:     {load.elapsed:.2f}s')
+        self.stdout.write(f'Requests:    {total} ({total / load.elapsed:.1f} req/s), {errors} errors '
+                          f'({errors / max(total, 1):.1%})')
+        for name, count in sorted(load.iterations.items()):
+            self.stdout.write(f'Scenario {name}: {count} iterations, {load.aborted[name]} stopped early')
+        if load.dropped:
+            self.stdout.write(self.style.WARNING(
+                f'{load.dropped} iterations not started: too many in flight, the server could not keep up'
+            ))
+        self.stdout.write('')
+        self.stdout.write(f'{"Step":<24} {"Count":>7} {"Req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+                          f'{"Max ms":>8} {"Errors":>7}  Statuses')
+        for name, values in load.latencies.items():
+            statuses = load.statuses[name]
+            failed = sum(count for status, count in statuses.items() if not isinstance(status, int) or status >= 400)
+            self.stdout.write(
+                f'{name[:24]:<24} {len(values):>7} {len(values) / load.elapsed:>8.1f} '
+                f'{percentile(values, 50) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f} '
+                f'{percentile(values, 99) * 1000:>8.1f} {max(values) * 1000:>8.1f} '
+                f'{failed / len(values):>7.1%}  '
+                + ' '.join(f'{status}:{count}' for status, count in sorted(statuses.items(), key=lambda item: str(item[0])))
+            )
+
+    def _report_db(self, before, after, pg_before, pg_after):
+        self.stdout.write('')
+        if before is None or after is None:
+            self.stdout.write(self.style.WARNING('No per-view database stats: /metrics was not reachable.'))
+        else:
+            self.stdout.write(f'{"View":<32} {"Requests":>9} {"Queries/req":>12} {"DB ms/req":>10}')
+            views = sorted({view for _, view in after})
+            for view in views:
+                requests = after['library_http_request_duration_seconds_count', view] - \
+                    before['library_http_request_duration_seconds_count', view]
+                if requests <= 0 or view == 'prometheus_metrics':
+                    continue
+                queries = after['library_db_queries_total', view] - before['library_db_queries_total', view]
+                db_time = after['library_db_query_duration_seconds_total', view] - \
+                    before['library_db_query_duration_seconds_total', view]
+                self.stdout.write(
+                    f'{view[:32]:<32} {requests:>9.0f} {queries / requests:>12.1f} {db_time / requests * 1000:>10.2f}'
+                )
+        if pg_before and pg_after:
+            self.stdout.write('')
+            self.stdout.write('pg_stat_database during the run:')
+            for counter in PG_COUNTERS:
+                self.stdout.write(f'  {counter:<14} {pg_after[counter] - pg_before[counter]}')
+            hits = pg_after['blks_hit'] - pg_before['blks_hit']
+            reads = pg_after['blks_read'] - pg_before['blks_read']
+            if hits + reads:
+                self.stdout.write(f'  cache hit ratio {hits / (hits + reads):.2%}')
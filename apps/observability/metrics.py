@@ -0,0 +1,325 @@
+"""
+Per-view request metrics.
+
+For every request the middleware records, under the view action that
+served it (BookViewSet.list, LoanViewSet.borrow, RegisterView.post, ...):
+latency as a histogram, status codes, database query count and time,
+serializer time and response bytes.
+
+Recording is lock-free: each thread writes to its own shard, a dict of
+plain lists, and shards are only merged when metrics are read. A lock is
+taken once per thread, to register its shard.
+
+Every METRICS_FLUSH_INTERVAL seconds a process writes its totals to
+METRICS_DIR/<parent pid>-<pid>.json. The Prometheus endpoint sums the
+files of all workers under the same gunicorn master, so every worker
+reports the same totals. Files left by a previous master are deleted;
+those of workers that exited under the current one are kept, so counters
+never go backwards.
+
+The files also carry the process's database connection pool statistics
+(config/postgres_pool): counters are summed over all workers, gauges
+(open and idle connections) over the workers still running.
+"""
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+from config.postgres_pool import pool
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Row layout: totals followed by one count per bucket (and +Inf)
+COUNT, DURATION, QUERIES, DB_TIME, SERIALIZER_TIME, BYTES = range(6)
+FIRST_BUCKET = 6
+ROW_SIZE = FIRST_BUCKET + len(BUCKETS) + 1
+
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+# Stats of the request being handled in this context
+current = contextvars.ContextVar('request_stats', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, f'METRICS_{name}', default)
+
+
+def metrics_dir():
+    return Path(_setting('DIR', os.path.join(tempfile.gettempdir(), 'library-metrics')))
+
+
+class RequestStats:
+    """Work done by one request, filled in by the instrumentation hooks."""
+
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializer_depth', 'request')
+
+    def __init__(self, request=None):
+        # Set only when statements are tagged with the view (METRICS_SQL_COMMENTS)
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+
+def view_name(request):
+    """'BookViewSet.list' for a viewset action, 'RegisterView.post' for an API view."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    view_class = getattr(func, 'cls', None)
+    if view_class is None:
+        return getattr(func, '__name__', 'unknown')
+    method = request.method.lower()
+    actions = getattr(func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class Shard:
+    """One thread's series; only that thread writes to it."""
+
+    def __init__(self):
+        self.requests = {}
+        self.statuses = {}
+
+
+class Registry:
+    """Process-wide metrics, merged from the per-thread shards."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = []
+        self.shards_lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def _shard(self):
+        shard = getattr(self.local, 'shard', None)
+        if shard is None:
+            shard = self.local.shard = Shard()
+            with self.shards_lock:
+                self.shards.append(shard)
+        return shard
+
+    def record(self, view, method, status, duration, stats, nbytes):
+        if method not in METHODS:
+            method = 'OTHER'
+        shard = self._shard()
+        key = (view, method)
+        row = shard.requests.get(key)
+        if row is None:
+            row = shard.requests[key] = [0] * ROW_SIZE
+        row[COUNT] += 1
+        row[DURATION] += duration
+        row[QUERIES] += stats.queries
+        row[DB_TIME] += stats.db_time
+        row[SERIALIZER_TIME] += stats.serializer_time
+        row[BYTES] += nbytes
+        row[FIRST_BUCKET + bisect_left(BUCKETS, duration)] += 1
+        status_key = (view, method, status)
+        shard.statuses[status_key] = shard.statuses.get(status_key, 0) + 1
+
+        if time.monotonic() - self.flushed_at >= _setting('FLUSH_INTERVAL', 5):
+            self.flush()
+
+    def snapshot(self):
+        """This process's totals: ({(view, method): row}, {(view, method, status): count})."""
+        requests, statuses = {}, {}
+        with self.shards_lock:
+            shards = list(self.shards)
+        for shard in shards:
+            # dict() copies in one step under the GIL, so a concurrent
+            # insert by the owning thread can't break the iteration
+            for key, row in dict(shard.requests).items():
+                _add_row(requests, key, row)
+            for key, count in dict(shard.statuses).items():
+                statuses[key] = statuses.get(key, 0) + count
+        return requests, statuses
+
+    def flush(self):
+        """Write this process's totals for the other workers to read."""
+        if not self.flush_lock.acquire(blocking=False):
+            return  # Another thread is flushing
+        try:
+            self.flushed_at = time.monotonic()
+            requests, statuses = self.snapshot()
+            directory = metrics_dir()
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'{os.getppid()}-{os.getpid()}.json'
+            temp = path.with_suffix('.tmp')
+            temp.write_text(json.dumps({
+                'requests': [[*key, row] for key, row in requests.items()],
+                'statuses': [[*key, count] for key, count in statuses.items()],
+                'pools': pool.stats(),
+            }))
+            os.replace(temp, path)
+        finally:
+            self.flush_lock.release()
+
+    def collect(self):
+        """
+        Totals of every worker under this process's master, including this
+        one: (requests, statuses, {alias: pool stats}).
+        """
+        self.flush()
+        requests, statuses, pools = {}, {}, {}
+        parent = str(os.getppid())
+        for path in metrics_dir().glob('*.json'):
+            parent_id, _, pid = path.stem.partition('-')
+            if parent_id != parent:
+                path.unlink(missing_ok=True)  # Left by a previous deployment
+                continue
+            try:
+                data = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for view, method, row in data['requests']:
+                if len(row) == ROW_SIZE:
+                    _add_row(requests, (view, method), row)
+            for view, method, status, count in data['statuses']:
+                key = (view, method, status)
+                statuses[key] = statuses.get(key, 0) + count
+            running = _running(int(pid))
+            for alias, stats in data.get('pools', {}).items():
+                _add_pool(pools, alias, stats, running)
+        return requests, statuses, pools
+
+    def reset(self):
+        """Forget this process's series (tests)."""
+        with self.shards_lock:
+            for shard in self.shards:
+                shard.requests.clear()
+                shard.statuses.clear()
+
+
+def _add_row(totals, key, row):
+    total = totals.get(key)
+    if total is None:
+        totals[key] = list(row)
+    else:
+        for index, value in enumerate(row):
+            total[index] += value
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        pass
+    return True
+
+
+# Pool statistics that describe the present rather than accumulate
+POOL_GAUGES = ('max_size', 'size', 'idle')
+
+
+def _add_pool(totals, alias, stats, running):
+    total = totals.setdefault(alias, {
+        **{name: 0 for name in POOL_GAUGES},
+        'checkouts': 0, 'wait_seconds': 0.0, 'wait_buckets': [0] * (len(pool.WAIT_BUCKETS) + 1),
+        'timeouts': 0, 'opened': 0, 'discarded': 0,
+    })
+    for name, value in stats.items():
+        if name == 'wait_buckets':
+            total[name] = [a + b for a, b in zip(total[name], value)]
+        elif name not in POOL_GAUGES or running:
+            total[name] = total.get(name, 0) + value
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render(requests, statuses, pools=None):
+    """Prometheus text exposition (format 0.0.4) of collected totals."""
+    lines = [
+        '# HELP library_http_requests_total Requests by view action and status code.',
+        '# TYPE library_http_requests_total counter',
+    ]
+    for (view, method, status), count in sorted(statuses.items()):
+        lines.append(f'library_http_requests_total{_labels(view=view, method=method, status=status)} {count}')
+
+    lines += [
+        '# HELP library_http_request_duration_seconds Request latency by view action.',
+        '# TYPE library_http_request_duration_seconds histogram',
+    ]
+    for (view, method), row in sorted(requests.items()):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, '+Inf'), row[FIRST_BUCKET:]):
+            cumulative += count
+            lines.append(
+                f'library_http_request_duration_seconds_bucket{_labels(view=view, method=method, le=bound)} {cumulative}'
+            )
+        labels = _labels(view=view, method=method)
+        lines.append(f'library_http_request_duration_seconds_sum{labels} {row[DURATION]}')
+        lines.append(f'library_http_request_duration_seconds_count{labels} {row[COUNT]}')
+
+    for name, index, help_text in (
+        ('library_db_queries_total', QUERIES, 'Database queries by view action.'),
+        ('library_db_query_duration_seconds_total', DB_TIME, 'Time spent in database queries by view action.'),
+        ('library_serializer_duration_seconds_total', SERIALIZER_TIME, 'Time spent serializing by view action.'),
+        ('library_http_response_bytes_total', BYTES, 'Response body bytes by view action.'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (view, method), row in sorted(requests.items()):
+            lines.append(f'{name}{_labels(view=view, method=method)} {row[index]}')
+
+    if pools:
+        lines += _render_pools(pools)
+    return '\n'.join(lines) + '\n'
+
+
+def _render_pools(pools):
+    lines = [
+        '# HELP library_db_pool_connections Open pooled database connections by state.',
+        '# TYPE library_db_pool_connections gauge',
+    ]
+    for alias, stats in sorted(pools.items()):
+        lines.append(f'library_db_pool_connections{_labels(alias=alias, state="in_use")} {stats["size"] - stats["idle"]}')
+        lines.append(f'library_db_pool_connections{_labels(alias=alias, state="idle")} {stats["idle"]}')
+    lines += [
+        '# HELP library_db_pool_max_connections Pool capacity, summed over running workers.',
+        '# TYPE library_db_pool_max_connections gauge',
+    ]
+    for alias, stats in sorted(pools.items()):
+        lines.append(f'library_db_pool_max_connections{_labels(alias=alias)} {stats["max_size"]}')
+
+    lines += [
+        '# HELP library_db_pool_wait_seconds Time requests waited to check out a connection.',
+        '# TYPE library_db_pool_wait_seconds histogram',
+    ]
+    for alias, stats in sorted(pools.items()):
+        cumulative = 0
+        for bound, count in zip((*pool.WAIT_BUCKETS, '+Inf'), stats['wait_buckets']):
+            cumulative += count
+            lines.append(f'library_db_pool_wait_seconds_bucket{_labels(alias=alias, le=bound)} {cumulative}')
+        lines.append(f'library_db_pool_wait_seconds_sum{_labels(alias=alias)} {stats["wait_seconds"]}')
+        lines.append(f'library_db_pool_wait_seconds_count{_labels(alias=alias)} {stats["checkouts"]}')
+
+    for name, key, help_text in (
+        ('library_db_pool_timeouts_total', 'timeouts', 'Checkouts that gave up waiting for a connection.'),
+        ('library_db_pool_opened_total', 'opened', 'Connections opened by the pool.'),
+        ('library_db_pool_discarded_total', 'discarded', 'Connections closed as broken, expired or lost.'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for alias, stats in sorted(pools.items()):
+            lines.append(f'{name}{_labels(alias=alias)} {stats[key]}')
+    return lines
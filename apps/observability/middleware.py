@@ -0,0 +1,202 @@
+"""
+Request metrics and profiling middleware.
+
+MetricsMiddleware times each request, attributes its database and
+serializer work (see instrumentation.py), records the result under the
+view action and adds a Server-Timing header so the breakdown shows in
+browser dev tools:
+
+    Server-Timing: app;dur=12.4, db;dur=3.1;desc="4 queries", serializer;dur=2.0
+
+With METRICS_SQL_COMMENTS on, every statement a request runs ends with a
+/* view=BookViewSet.list */ comment, so pg_stat_statements (and the
+index_advisor command) can tell which view it came from. pg_stat_statements
+keeps the comment of a statement's first call only, so statements shared
+by several views name just one of them.
+
+Place it first in MIDDLEWARE so the latency covers the whole stack. It
+runs natively under both WSGI and ASGI; streaming responses are timed to
+their first byte and their size is not counted.
+
+TracingMiddleware opens the root span of sampled requests (see
+tracing.py) and hands the finished trace to the exporter. Place it after
+MetricsMiddleware.
+
+ProfilingMiddleware profiles requests carrying an administrator's
+X-Profile header (see profiling.py). Place it after MetricsMiddleware.
+"""
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import profiling
+from .metrics import RequestStats, current, registry, view_name
+from .tracing import STATUS_ERROR, current_span, exporter, start_trace
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', True)
+        self.sql_comments = getattr(settings, 'METRICS_SQL_COMMENTS', False)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats(request if self.sql_comments else None)
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats(request if self.sql_comments else None)
+        token = current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def _finish(self, request, response, stats, duration):
+        nbytes = 0 if response.streaming else len(response.content)
+        registry.record(view_name(request), request.method, str(response.status_code), duration, stats, nbytes)
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'app;dur={duration * 1000:.1f}, '
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                f'serializer;dur={stats.serializer_time * 1000:.1f}'
+            )
+
+
+class TracingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        root = start_trace(request.method, request.META.get('HTTP_TRACEPARENT', ''))
+        if root is None:
+            return self.get_response(request)
+        token = current_span.set(root)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_span.reset(token)
+        self._finish(request, response, root)
+        return response
+
+    async def __acall__(self, request):
+        root = start_trace(request.method, request.META.get('HTTP_TRACEPARENT', ''))
+        if root is None:
+            return await self.get_response(request)
+        token = current_span.set(root)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_span.reset(token)
+        self._finish(request, response, root)
+        return response
+
+    def _finish(self, request, response, root):
+        view = view_name(request)
+        root.name = f'{request.method} {view}'
+        root.attributes.update({
+            'http.request.method': request.method,
+            'url.path': request.path,
+            'http.response.status_code': response.status_code,
+            'drf.view': view,
+        })
+        if request.META.get('QUERY_STRING'):
+            root.attributes['url.query'] = request.META['QUERY_STRING']
+        if getattr(request, 'resolver_match', None) is not None:
+            root.attributes['http.route'] = request.resolver_match.route
+        if response.status_code >= 500:
+            root.status = {'code': STATUS_ERROR, 'message': f'HTTP {response.status_code}'}
+        root.end()
+        exporter.submit(root.trace)
+        response['traceresponse'] = root.traceparent
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if profiling.HEADER not in request.META:
+            return self.get_response(request)
+        requested = profiling.requested_profile(request)
+        if requested is None:
+            return self.get_response(request)
+        if not profiling.acquire():
+            return self._busy(self.get_response(request))
+        try:
+            profile = profiling.Profile(requested[0], threading.get_ident())
+            profile.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.stop()
+        finally:
+            profiling.release()
+        return self._deliver(request, response, profile, inline=requested[1])
+
+    async def __acall__(self, request):
+        if profiling.HEADER not in request.META:
+            return await self.get_response(request)
+        requested = await sync_to_async(profiling.requested_profile)(request)
+        if requested is None:
+            return await self.get_response(request)
+        if not profiling.acquire():
+            return self._busy(await self.get_response(request))
+        try:
+            # Sync views run on executor threads, so sample every thread
+            profile = profiling.Profile(requested[0])
+            profile.start()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profile.stop()
+        finally:
+            profiling.release()
+        return self._deliver(request, response, profile, inline=requested[1])
+
+    def _busy(self, response):
+        response['X-Profile-Error'] = 'Another request is being profiled.'
+        return response
+
+    def _deliver(self, request, response, profile, inline):
+        if inline:
+            return profile.response(response)
+        profile.write(view_name(request))
+        response['X-Profile-Id'] = profile.id
+        return response
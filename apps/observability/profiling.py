@@ -0,0 +1,241 @@
+"""
+On-demand profiling of single requests.
+
+An administrator adds an X-Profile header to a request:
+
+    X-Profile: cpu              sampling CPU profile
+    X-Profile: memory           tracemalloc allocation snapshot
+    X-Profile: cpu,memory,inline
+
+Profiles are written to PROFILING_DIR as <id>.cpu.folded and
+<id>.memory.folded, the id being returned in X-Profile-Id. With inline the
+response body is replaced by a JSON document holding the profiles and the
+original status code. Both use the folded stack format ("frame;frame;frame
+count") read by flamegraph.pl, speedscope and inferno; memory stacks are
+weighted by bytes still allocated when the response is ready.
+
+The CPU profiler is a thread sampling the request thread's stack every
+PROFILING_INTERVAL seconds (under ASGI, every thread's, labelled by
+thread name). tracemalloc and the sampler are process-wide, so in a worker
+serving concurrent requests the memory profile includes their allocations
+too. One profile runs at a time per process.
+
+Requests without the header pay one dictionary lookup.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from apps.accounts.permissions import IsAdministrator
+
+HEADER = 'HTTP_X_PROFILE'
+KINDS = frozenset(('cpu', 'memory'))
+
+_running = threading.Lock()
+# Longest first, so frames show as django/db/models/query.py or apps/books/views.py
+_prefixes = sorted(
+    {os.path.abspath(path) + os.sep for path in sys.path if path} | {str(settings.BASE_DIR) + os.sep},
+    key=len, reverse=True,
+)
+
+
+def _setting(name, default):
+    return getattr(settings, f'PROFILING_{name}', default)
+
+
+def _short_path(filename):
+    for prefix in _prefixes:
+        if filename.startswith(prefix):
+            return filename[len(prefix):]
+    return filename
+
+
+def _frame_name(code):
+    return f'{code.co_qualname} ({_short_path(code.co_filename)}:{code.co_firstlineno})'
+
+
+def folded(stacks):
+    """Folded stack lines from a Counter of frame tuples, root first."""
+    return ''.join(f'{";".join(stack)} {weight}\n' for stack, weight in stacks.most_common())
+
+
+class Sampler:
+    """Samples the stack of one thread (or of all threads) from a background thread."""
+
+    def __init__(self, thread_id=None, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        # The sampler needs the GIL to take a sample; shorten the switch
+        # interval so a busy request thread hands it over on time
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                targets = [(None, frames.get(self.thread_id))]
+            else:
+                targets = [(names.get(ident, str(ident)), frame) for ident, frame in frames.items() if ident != own]
+            for thread_name, frame in targets:
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                if thread_name is not None:
+                    stack.append(thread_name)
+                if stack:
+                    self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+
+class MemoryTrace:
+    """Allocations made between start() and stop(), via tracemalloc."""
+
+    def start(self):
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(_setting('TRACEMALLOC_FRAMES', 25))
+            self.baseline = None
+        else:
+            self.baseline = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+
+    def stop(self):
+        """Return (peak traced bytes, [(traceback, bytes)]) of allocations still alive."""
+        _, self.peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        if self.started_tracing:
+            tracemalloc.stop()
+            return self.peak, [(stat.traceback, stat.size) for stat in snapshot.statistics('traceback')]
+        # Already tracing (PYTHONTRACEMALLOC): only what grew during the request
+        return self.peak, [
+            (stat.traceback, stat.size_diff)
+            for stat in snapshot.compare_to(self.baseline, 'traceback') if stat.size_diff > 0
+        ]
+
+
+class Profile:
+    """A CPU and/or memory profile of one request."""
+
+    def __init__(self, kinds, thread_id=None):
+        self.kinds = kinds
+        self.id = uuid.uuid4().hex[:12]
+        self.sampler = Sampler(thread_id, _setting('INTERVAL', 0.001)) if 'cpu' in kinds else None
+        self.memory = MemoryTrace() if 'memory' in kinds else None
+
+    def start(self):
+        if self.memory:
+            self.memory.start()
+        if self.sampler:
+            self.sampler.start()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.started
+        if self.sampler:
+            self.sampler.stop()
+        if self.memory:
+            peak, allocations = self.memory.stop()
+            self.peak = peak
+            self.allocations = Counter()
+            self.sites = Counter()
+            for traceback, size in allocations:
+                # Tracebacks run oldest frame first; the last one allocated
+                self.allocations[tuple(f'{_short_path(f.filename)}:{f.lineno}' for f in traceback)] += size
+                site = traceback[-1]
+                self.sites[f'{_short_path(site.filename)}:{site.lineno}'] += size
+
+    def files(self):
+        """{suffix: folded stacks} of the profiles taken."""
+        files = {}
+        if self.sampler:
+            files['cpu.folded'] = folded(self.sampler.stacks)
+        if self.memory:
+            files['memory.folded'] = folded(self.allocations)
+        return files
+
+    def write(self, name):
+        """Write the profiles to PROFILING_DIR as <id>.<kind>.folded, the id ending in name."""
+        directory = Path(_setting('DIR', os.path.join(tempfile.gettempdir(), 'library-profiles')))
+        directory.mkdir(parents=True, exist_ok=True)
+        self.id = f'{self.id}-{name}'
+        for suffix, text in self.files().items():
+            (directory / f'{self.id}.{suffix}').write_text(text)
+
+    def response(self, original):
+        """JSON response carrying the profiles in place of the original response."""
+        data = {'id': self.id, 'status': original.status_code, 'duration_ms': round(self.duration * 1000, 3)}
+        if self.sampler:
+            data['cpu'] = {
+                'interval_ms': self.sampler.interval * 1000,
+                'samples': self.sampler.samples,
+                'folded': self.files()['cpu.folded'],
+            }
+        if self.memory:
+            data['memory'] = {
+                'peak_bytes': self.peak,
+                'top': [
+                    {'site': site, 'bytes': size}
+                    for site, size in self.sites.most_common(_setting('TOP', 25))
+                ],
+                'folded': self.files()['memory.folded'],
+            }
+        return JsonResponse(data)
+
+
+def requested_profile(request):
+    """
+    (kinds, inline) asked for by an administrator's X-Profile header, or
+    None. Call only when the header is present: it authenticates the
+    request.
+    """
+    options = {option.strip().lower() for option in request.META[HEADER].split(',')}
+    kinds = options & KINDS
+    if not kinds:
+        return None
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        if not IsAdministrator().has_permission(drf_request, None):
+            return None
+    except APIException:
+        return None
+    return kinds, 'inline' in options
+
+
+def acquire():
+    """Claim the process's profiler; False if another request holds it."""
+    return _running.acquire(blocking=False)
+
+
+def release():
+    _running.release()
@@ -0,0 +1,262 @@
+"""
+Request tracing.
+
+A sampled request gets a trace: a root span for the request and nested
+spans for each DRF stage (authentication, permissions, throttles, each
+filter backend, pagination, serialization, rendering) and for every SQL
+statement, wherever it runs. The hooks live in instrumentation.py; a
+request that is not sampled pays one context variable lookup per hook.
+
+Sampling is decided when the request starts: TRACING_SAMPLE_RATE of
+requests are traced. A W3C traceparent header whose sampled flag is set
+also forces a trace, but any client can send one, so those are honoured
+at most TRACING_PARENT_RATE_LIMIT times a second per worker (0 ignores
+the flag). Sampled requests with a traceparent join the caller's trace.
+Sampled responses name their trace in a traceresponse header.
+
+Finished traces are exported in the OTLP/JSON format from a background
+thread, so the request never waits on I/O:
+- TRACING_EXPORTER = 'file': one OTLP/JSON document per line appended to
+  TRACING_FILE. Once it exceeds TRACING_FILE_MAX_BYTES it is moved to
+  TRACING_FILE.1, replacing the previous one.
+- TRACING_EXPORTER = 'otlp': POSTed to TRACING_OTLP_ENDPOINT, e.g. an
+  OpenTelemetry Collector at http://localhost:4318/v1/traces, or the
+  stand-in run by `python manage.py collect_traces`.
+If the exporter falls behind, whole traces are dropped.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.request
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+STATUS_ERROR = 2
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# Innermost open span of the sampled request in this context
+current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, f'TRACING_{name}', default)
+
+
+class Trace:
+    """The spans of one sampled request."""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or os.urandom(16).hex()
+        self.spans = []
+        self.max_spans = _setting('MAX_SPANS', 1000)
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'kind', 'span_id', 'parent_id', 'attributes', 'start_ns', 'end_ns', 'status')
+
+    def __init__(self, trace, name, parent_id='', kind=INTERNAL, attributes=None):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = None
+
+    def child(self, name, kind=INTERNAL, attributes=None):
+        return Span(self.trace, name, self.span_id, kind, attributes)
+
+    def fail(self, exc):
+        self.status = {'code': STATUS_ERROR, 'message': f'{type(exc).__name__}: {exc}'[:500]}
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        trace = self.trace
+        if len(trace.spans) < trace.max_spans:
+            trace.spans.append(self)  # list.append is atomic under the GIL
+        else:
+            trace.dropped += 1
+
+    @property
+    def traceparent(self):
+        return f'00-{self.trace.trace_id}-{self.span_id}-01'
+
+
+class ParentSampling:
+    """Token bucket capping the traces forced by incoming sampled flags."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = None
+        self.updated = time.monotonic()
+
+    def allow(self):
+        rate = _setting('PARENT_RATE_LIMIT', 1.0)
+        if rate <= 0:
+            return False
+        burst = max(1.0, rate)
+        with self.lock:
+            now = time.monotonic()
+            if self.tokens is None:
+                self.tokens = burst
+            self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+parent_sampling = ParentSampling()
+
+
+def start_trace(name, traceparent=''):
+    """Root span for a request, or None if it is not sampled."""
+    trace_id = parent_id = ''
+    match = _TRACEPARENT.match(traceparent)
+    if match:
+        trace_id, parent_id = match.group(1), match.group(2)
+    forced = match is not None and int(match.group(3), 16) & 1 and parent_sampling.allow()
+    if not forced and random.random() >= _setting('SAMPLE_RATE', 0.0):
+        return None
+    return Span(Trace(trace_id or None), name, parent_id, SERVER)
+
+
+def call_in_span(name, attributes, func, *args, **kwargs):
+    """func(*args, **kwargs) inside a child of the current span; the caller checked there is one."""
+    span = current_span.get().child(name, attributes=attributes)
+    token = current_span.set(span)
+    try:
+        return func(*args, **kwargs)
+    except BaseException as exc:
+        span.fail(exc)
+        raise
+    finally:
+        current_span.reset(token)
+        span.end()
+
+
+def _value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def otlp_json(traces):
+    """OTLP/JSON ExportTraceServiceRequest for finished traces."""
+    spans = []
+    for trace in traces:
+        for span in trace.spans:
+            data = {
+                'traceId': trace.trace_id,
+                'spanId': span.span_id,
+                'parentSpanId': span.parent_id,
+                'name': span.name,
+                'kind': span.kind,
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns),
+                'attributes': [{'key': key, 'value': _value(value)} for key, value in span.attributes.items()],
+            }
+            if span.status:
+                data['status'] = span.status
+            spans.append(data)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [
+            {'key': 'service.name', 'value': {'stringValue': _setting('SERVICE_NAME', 'library-api')}},
+        ]},
+        'scopeSpans': [{'scope': {'name': 'apps.observability'}, 'spans': spans}],
+    }]}
+
+
+class Exporter:
+    """Exports finished traces in batches from a background thread."""
+
+    BATCH_SIZE = 64
+    BATCH_DELAY = 1.0
+
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=2048)
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def submit(self, trace):
+        if self.pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            logger.warning('Trace export queue full; dropping trace %s', trace.trace_id)
+
+    def flush(self):
+        """Block until every submitted trace has been exported."""
+        self.queue.join()
+
+    def _start(self):
+        # Started lazily, and again after a fork: threads don't survive one
+        with self.lock:
+            if self.pid != os.getpid():
+                self.queue = queue.Queue(maxsize=2048)
+                self.thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self.pid = os.getpid()
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.BATCH_DELAY
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self.export(batch)
+            except Exception:
+                logger.exception('Exporting %d traces failed', len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def export(self, traces):
+        body = json.dumps(otlp_json(traces), separators=(',', ':'))
+        kind = _setting('EXPORTER', 'file')
+        if kind == 'otlp':
+            request = urllib.request.Request(
+                _setting('OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'),
+                data=body.encode(),
+                headers={'Content-Type': 'application/json'},
+            )
+            with urllib.request.urlopen(request, timeout=5):
+                pass
+        else:
+            path = _setting('FILE', os.path.join(tempfile.gettempdir(), 'library-traces.jsonl'))
+            try:
+                if os.path.getsize(path) > _setting('FILE_MAX_BYTES', 100 * 1024 * 1024):
+                    os.replace(path, f'{path}.1')
+            except FileNotFoundError:
+                pass
+            with open(path, 'a', encoding='utf-8') as handle:
+                handle.write(body + '\n')
+
+
+exporter = Exporter()
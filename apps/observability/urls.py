@@ -0,0 +1,9 @@
+"""
+Observability app URL configuration.
+"""
+from django.urls import path
+from .views import prometheus_metrics
+
+urlpatterns = [
+    path('metrics', prometheus_metrics, name='metrics'),
+]
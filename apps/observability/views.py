@@ -0,0 +1,29 @@
+"""
+Observability views.
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from .metrics import registry, render
+
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Request metrics of all workers in the Prometheus text format.
+
+    When METRICS_TOKEN is set, scrapers must send it as a bearer token.
+    Without one, scrapes are refused if METRICS_REQUIRE_TOKEN is on (the
+    production default), so the endpoint is never public by accident.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    elif getattr(settings, 'METRICS_REQUIRE_TOKEN', False):
+        return HttpResponse('Set METRICS_TOKEN to enable scraping\n', status=403, content_type='text/plain')
+    return HttpResponse(render(*registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -2,6 +2,7 @@
 Reviews app admin configuration.
 """
 from django.contrib import admin
+from apps.books.search import is_postgres
 from .models import Review
 
 
@@ -10,8 +11,28 @@ class ReviewAdmin(admin.ModelAdmin):
     """Admin configuration for Review model."""
     list_display = ['user', 'book', 'rating', 'created_at']
     list_filter = ['rating', 'created_at']
-    search_fields = ['user__email', 'user__username', 'book__title', 'text']
+    search_fields = ['user__email', 'user__username', 'book__title']
     readonly_fields = ['created_at', 'updated_at']
     ordering = ['-created_at']
     autocomplete_fields = ['user', 'book']
     list_per_page = 25
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('search_vector')
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match review text through the full-text index (icontains off
+        PostgreSQL), in addition to the user and book search_fields.
+        """
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if not search_term:
+            return results, may_have_duplicates
+        if is_postgres():
+            from django.contrib.postgres.search import SearchQuery
+            text_matches = queryset.filter(
+                search_vector=SearchQuery(search_term, config='english', search_type='websearch')
+            )
+        else:
+            text_matches = queryset.filter(text__icontains=search_term)
+        return results | text_matches, may_have_duplicates
@@ -8,3 +8,7 @@ class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reviews'
     verbose_name = 'Reviews'
+
+    def ready(self):
+        """Import signals when app is ready."""
+        import apps.reviews.signals  # noqa: F401
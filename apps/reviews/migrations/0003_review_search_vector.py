@@ -0,0 +1,53 @@
+# Generated by Django 4.2.17 on 2026-10-19 07:57
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("""
+        CREATE OR REPLACE FUNCTION reviews_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := to_tsvector('english', COALESCE(NEW.text, ''));
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    schema_editor.execute("""
+        CREATE TRIGGER reviews_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF text ON reviews
+        FOR EACH ROW EXECUTE FUNCTION reviews_search_vector_update()
+    """)
+    # Backfill existing rows
+    schema_editor.execute("UPDATE reviews SET search_vector = to_tsvector('english', COALESCE(text, ''))")
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP TRIGGER IF EXISTS reviews_search_vector_trigger ON reviews')
+    schema_editor.execute('DROP FUNCTION IF EXISTS reviews_search_vector_update()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_review_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='review_search_vector_idx'),
+        ),
+        # The database keeps search_vector in step with text (PostgreSQL only)
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
@@ -3,6 +3,8 @@ Reviews app models.
 """
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
@@ -26,10 +28,29 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Full-text search vector of text, maintained by a database trigger
+    # (PostgreSQL only, see migration 0003)
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
     class Meta:
         db_table = 'reviews'
         unique_together = ['user', 'book']
         ordering = ['-created_at']
+        indexes = [
+            # Newest-first listing per book, per user and overall
+            models.Index(fields=['book', '-created_at', '-id'], name='reviews_book_recent_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='reviews_user_recent_idx'),
+            models.Index(fields=['-created_at', '-id'], name='reviews_recent_idx'),
+            # GIN index for full-text search (PostgreSQL only)
+            GinIndex(fields=['search_vector'], name='review_search_vector_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.book.title} ({self.rating}/5)"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the loaded book and rating so saves can apply a delta."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rating = (instance.__dict__.get('book_id'), instance.__dict__.get('rating'))
+        return instance
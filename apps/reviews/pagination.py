@@ -0,0 +1,21 @@
+"""
+Reviews app pagination.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class ReviewCursorPagination(CursorPagination):
+    """
+    Newest-first cursor pagination for review listings.
+
+    Each page is an index range scan from the cursor position, so deep
+    pages of a heavily reviewed book cost the same as the first one.
+
+    Query parameters:
+    - cursor: Opaque position from the next/previous links
+    - page_size: Items per page (default: 20, max: 100)
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,29 @@
+"""
+Full-text search over review text.
+Uses the trigger-maintained search_vector on PostgreSQL and falls back to
+icontains for other databases.
+"""
+from django.db.models import F
+from apps.books.search import PostgresSearchFilter
+
+
+class ReviewSearchFilter(PostgresSearchFilter):
+    """
+    Search reviews by text, best matches first.
+
+    Matching goes through the GIN index on search_vector; results are
+    ranked with SearchRank, newest first among equal ranks.
+    """
+
+    def _postgres_search(self, queryset, search_term, view):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(search_term, config='english', search_type='websearch')
+        return queryset.annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).filter(
+            search_vector=search_query
+        ).order_by('-rank', '-created_at', '-id')
+
+    def _basic_search(self, queryset, search_term, view):
+        return queryset.filter(text__icontains=search_term).order_by('-created_at', '-id')
@@ -19,30 +19,28 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 class ReviewCreateSerializer(serializers.Serializer):
     """Simple review create serializer - just book_id, rating, text."""
-    book_id = serializers.IntegerField(help_text="ID of the book to review")
+    book_id = serializers.PrimaryKeyRelatedField(
+        source='book',
+        queryset=Book.objects.all(),
+        error_messages={'does_not_exist': 'Book not found.'},
+        help_text="ID of the book to review"
+    )
     rating = serializers.IntegerField(min_value=1, max_value=5, help_text="Rating 1-5")
     text = serializers.CharField(required=False, allow_blank=True, help_text="Review text (optional)")
 
-    def validate_book_id(self, value):
-        """Ensure book exists."""
-        if not Book.objects.filter(pk=value).exists():
-            raise serializers.ValidationError('Book not found.')
-        return value
-
     def validate(self, attrs):
         """Ensure user hasn't already reviewed this book."""
         request = self.context.get('request')
         if request and request.user:
-            if Review.objects.filter(user=request.user, book_id=attrs['book_id']).exists():
+            if Review.objects.filter(user=request.user, book=attrs['book']).exists():
                 raise serializers.ValidationError({'book_id': 'You have already reviewed this book.'})
         return attrs
 
     def create(self, validated_data):
-        """Create review with current user."""
-        book = Book.objects.get(pk=validated_data['book_id'])
+        """Create review with current user (the book was loaded once, by book_id)."""
         return Review.objects.create(
             user=self.context['request'].user,
-            book=book,
+            book=validated_data['book'],
             rating=validated_data['rating'],
             text=validated_data.get('text', '')
         )
@@ -0,0 +1,35 @@
+"""
+Reviews app signals.
+Keep the rating aggregates on Book in step with review changes and
+schedule a leaderboard refresh once they commit.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from apps.books import leaderboard
+from apps.books.ratings import apply_rating_delta
+from .models import Review
+
+
+@receiver(post_save, sender=Review)
+def add_rating(sender, instance, created, **kwargs):
+    """
+    Count a new review, or move an edited one between histogram buckets.
+    Runs inside the caller's transaction, so a rolled back save is not counted.
+    """
+    current = (instance.book_id, instance.rating)
+    loaded = None if created else getattr(instance, '_loaded_rating', None)
+    if loaded != current:
+        if loaded is not None:
+            apply_rating_delta(*loaded, delta=-1)
+        apply_rating_delta(*current, delta=1)
+        transaction.on_commit(leaderboard.request_refresh, robust=True)
+    instance._loaded_rating = current
+
+
+@receiver(post_delete, sender=Review)
+def remove_rating(sender, instance, **kwargs):
+    """Uncount a deleted review."""
+    book_id, rating = getattr(instance, '_loaded_rating', (instance.book_id, instance.rating))
+    apply_rating_delta(book_id, rating, delta=-1)
+    transaction.on_commit(leaderboard.request_refresh, robust=True)
@@ -9,11 +9,16 @@ from django.db.models import Avg, Count
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from .models import Review
+from .pagination import ReviewCursorPagination
+from .search import ReviewSearchFilter
+from apps.books.pagination import CustomPageNumberPagination
 from .serializers import ReviewSerializer, ReviewCreateSerializer, ReviewUpdateSerializer
 from apps.accounts.permissions import IsOwnerOrAdministrator
+from apps.accounts.throttling import AnonSearchThrottle
+from config.routers import ReplicaReadsMixin
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     Book Reviews API
     
@@ -23,11 +28,31 @@ class ReviewViewSet(viewsets.ModelViewSet):
     """
     permission_classes = [IsAuthenticatedOrReadOnly]
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
-    filter_backends = []  # Disable auto-generated filters
-    pagination_class = None  # Simple list
+    filter_backends = [ReviewSearchFilter]
+    search_fields = ['text']
+    pagination_class = ReviewCursorPagination
+    throttle_classes = [AnonSearchThrottle]
+    # Queries per request, enforced by the test suite (tests/query_budget.py)
+    query_budget = {
+        'list': 3, 'retrieve': 2, 'my_reviews': 2,
+        'create': 5, 'update': 6, 'partial_update': 6, 'destroy': 5,
+    }
+    # Served from a read replica when one is configured (config/routers.py)
+    replica_actions = {'list', 'retrieve', 'my_reviews'}
+
+    @property
+    def paginator(self):
+        """
+        Search results are ordered by rank, which cursors cannot follow,
+        so they are page-numbered instead.
+        """
+        if not hasattr(self, '_paginator'):
+            searching = self.action == 'list' and self.request.query_params.get('search')
+            self._paginator = CustomPageNumberPagination() if searching else self.pagination_class()
+        return self._paginator
 
     def get_queryset(self):
-        queryset = Review.objects.select_related('user', 'book').order_by('-created_at')
+        queryset = Review.objects.select_related('user', 'book').defer('search_vector')
         book_id = self.request.query_params.get('book_id')
         if book_id:
             queryset = queryset.filter(book_id=book_id)
@@ -47,9 +72,14 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_summary="List all reviews",
-        operation_description="Get all reviews. Filter by book with ?book_id=123",
+        operation_description="Get all reviews, newest first. Filter by book with ?book_id=123. "
+                              "?search= ranks by full-text relevance and pages with ?page= instead of a cursor.",
         manual_parameters=[
-            openapi.Parameter('book_id', openapi.IN_QUERY, description="Filter by book ID", type=openapi.TYPE_INTEGER, required=False)
+            openapi.Parameter('book_id', openapi.IN_QUERY, description="Filter by book ID", type=openapi.TYPE_INTEGER, required=False),
+            openapi.Parameter('search', openapi.IN_QUERY, description="Full-text search in review text", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('page', openapi.IN_QUERY, description="Page number (with search)", type=openapi.TYPE_INTEGER, required=False),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Page cursor from the next/previous link", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Items per page (max: 100)", type=openapi.TYPE_INTEGER, required=False, default=20),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -96,12 +126,19 @@ class ReviewViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         return super().destroy(request, *args, **kwargs)
 
-    @swagger_auto_schema(operation_summary="My reviews")
+    @swagger_auto_schema(
+        operation_summary="My reviews",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Page cursor from the next/previous link", type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Items per page (max: 100)", type=openapi.TYPE_INTEGER, required=False, default=20),
+        ]
+    )
     @action(detail=False, methods=['get'])
     def my_reviews(self, request):
         """Get current user's reviews."""
         if not request.user.is_authenticated:
             return Response({'error': 'Authentication required.'}, status=status.HTTP_401_UNAUTHORIZED)
-        queryset = Review.objects.filter(user=request.user).select_related('book').order_by('-created_at')
-        serializer = ReviewSerializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = Review.objects.filter(user=request.user).select_related('user', 'book').defer('search_vector')
+        page = self.paginate_queryset(queryset)
+        serializer = ReviewSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
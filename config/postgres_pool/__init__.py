@@ -0,0 +1,11 @@
+"""
+PostgreSQL backend with a bounded connection pool per process.
+
+    DATABASES = {'default': {'ENGINE': 'config.postgres_pool', ..., 'CONN_MAX_AGE': 0,
+                             'OPTIONS': {'pool': {'max_size': 4, 'timeout': 10}}}}
+
+With CONN_MAX_AGE = 0, Django closes its connection at the end of each
+request, which returns it to the pool instead of disconnecting. Pool
+options and their defaults are in pool.DEFAULTS. Pool sizes, wait times
+and timeouts are exported at /metrics (apps/observability/metrics.py).
+"""
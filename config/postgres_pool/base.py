@@ -0,0 +1,64 @@
+"""
+The pooled PostgreSQL DatabaseWrapper; see __init__.py.
+"""
+import logging
+import threading
+from functools import partial
+
+from django.db import connections
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from .pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def _get_pool(self, conn_params):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        return get_pool(
+            self.alias, tuple(sorted((key, repr(value)) for key, value in conn_params.items())),
+            options if isinstance(options, dict) else {},
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self._get_pool(conn_params)
+        connection = pool.getconn(partial(super().get_new_connection, conn_params))
+        # The parent sets this when it opens a connection; pooled ones need it too
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel.READ_COMMITTED if isolation_level is None else IsolationLevel(isolation_level)
+        self.pool = pool
+        return connection
+
+    def fill_pool(self):
+        """Open the pool's min_size connections ahead of the first request."""
+        conn_params = self.get_connection_params()
+        self._get_pool(conn_params).fill(partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+
+
+def warm():
+    """Fill the pools of all pooled databases to min_size, in the background."""
+    def fill():
+        for alias in connections:
+            wrapper = connections[alias]
+            if isinstance(wrapper, DatabaseWrapper):
+                try:
+                    wrapper.fill_pool()
+                except Exception:
+                    logger.warning('Could not open the pool connections for %s', alias, exc_info=True)
+    threading.Thread(target=fill, name='pool-warmer', daemon=True).start()
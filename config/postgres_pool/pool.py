@@ -0,0 +1,273 @@
+"""
+A bounded, thread-safe pool of database connections, one per alias and
+process.
+
+Checkout takes the most recently returned idle connection (its server
+backend is warm), opens a new one while fewer than max_size are open, or
+waits up to timeout seconds for one to be returned, then raises
+PoolTimeout. Before handing out a connection the pool
+- discards it if it is closed or older than max_lifetime;
+- runs SELECT 1 on it if it has been idle for check_after seconds or
+  more, and discards it if that fails (the database restarted, a proxy
+  dropped it).
+A returned connection is rolled back if a transaction was left open, and
+discarded if it is broken. Idle connections beyond min_size are closed
+once idle for max_idle seconds. Connections a thread never returns are
+released when they are garbage collected.
+
+After a fork the child starts with an empty pool; the parent's sockets
+are left to the parent.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# connection.info.transaction_status values, the same in psycopg2 and psycopg 3
+TRANSACTION_IDLE = 0
+TRANSACTION_UNKNOWN = 4
+
+DEFAULTS = {
+    'min_size': 0,
+    'max_size': 4,
+    'timeout': 10.0,
+    'max_idle': 300.0,
+    'max_lifetime': 3600.0,
+    'check_after': 5.0,
+}
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the pool's timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, alias, min_size=0, max_size=4, timeout=10.0, max_idle=300.0, max_lifetime=3600.0,
+                 check_after=5.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f'Pool {alias}: need 1 <= max_size and min_size <= max_size')
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.condition = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.retired = False
+        self.idle = deque()         # (connection, opened_at, returned_at), most recent last
+        # Keyed by id(): holding the connections would keep lost ones alive
+        self.opened_at = {}         # id(connection) -> monotonic time it was opened
+        self.finalizers = {}        # id(checked-out connection) -> weakref.finalize
+        self.size = 0               # Open connections, idle and checked out
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+        self.timeouts = 0
+        self.opened = 0
+        self.discarded = 0
+
+    def _check_fork(self):
+        if self.pid != os.getpid():
+            # The parent's connections share its sockets: forget, never close
+            self._reset()
+
+    def getconn(self, connect):
+        """Check out a connection, calling connect() to open one if needed."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            with self.condition:
+                self._check_fork()
+                self._close_expired()
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f'No connection to {self.alias} available within {self.timeout}s '
+                            f'({self.max_size} in use)'
+                        )
+                    self.condition.wait(remaining)
+                if self.idle:
+                    connection, opened_at, returned_at = self.idle.pop()
+                else:
+                    connection = None
+                    self.size += 1
+
+            if connection is None:
+                connection = self._open(connect)
+            elif not self._usable(connection, opened_at, returned_at):
+                self._discard(connection)
+                continue
+            self._checked_out(connection, time.monotonic() - started)
+            return connection
+
+    def putconn(self, connection):
+        """Return a checked-out connection; broken ones are closed."""
+        with self.condition:
+            finalizer = self.finalizers.pop(id(connection), None)
+            if finalizer is None:
+                return  # Opened before a fork, or already returned
+            finalizer.detach()
+        try:
+            status = connection.info.transaction_status
+            if not connection.closed and status != TRANSACTION_IDLE and status != TRANSACTION_UNKNOWN:
+                connection.rollback()
+            reusable = not connection.closed and connection.info.transaction_status == TRANSACTION_IDLE
+        except Exception:
+            reusable = False
+        if not reusable or self.retired:
+            self._discard(connection)
+            return
+        with self.condition:
+            self.idle.append((connection, self.opened_at[id(connection)], time.monotonic()))
+            self.condition.notify()
+
+    def _open(self, connect):
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.opened_at[id(connection)] = time.monotonic()
+            self.opened += 1
+        return connection
+
+    def _usable(self, connection, opened_at, returned_at):
+        now = time.monotonic()
+        if connection.closed or now - opened_at > self.max_lifetime:
+            return False
+        if now - returned_at < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != TRANSACTION_IDLE:
+                connection.rollback()
+            return True
+        except Exception:
+            logger.info('Discarding a broken connection to %s', self.alias)
+            return False
+
+    def _checked_out(self, connection, waited):
+        with self.condition:
+            # Released if the thread holding it drops it without returning it
+            self.finalizers[id(connection)] = weakref.finalize(connection, self._lost, id(connection), self.pid)
+            self.checkouts += 1
+            self.wait_time += waited
+            self.wait_buckets[bisect_left(WAIT_BUCKETS, waited)] += 1
+
+    def _lost(self, key, pid):
+        with self.condition:
+            if pid == self.pid and self.finalizers.pop(key, None) is not None:
+                self.opened_at.pop(key, None)
+                self.size -= 1
+                self.discarded += 1
+                self.condition.notify()
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.opened_at.pop(id(connection), None)
+            self.size -= 1
+            self.discarded += 1
+            self.condition.notify()
+
+    def _close_expired(self):
+        # Called with the condition held; the oldest idle connections are first
+        now = time.monotonic()
+        while self.idle and self.size > self.min_size and now - self.idle[0][2] > self.max_idle:
+            connection = self.idle.popleft()[0]
+            self.opened_at.pop(id(connection), None)
+            self.size -= 1
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def fill(self, connect):
+        """Open connections until min_size are open (warming a new worker)."""
+        while True:
+            with self.condition:
+                self._check_fork()
+                if self.size >= self.min_size:
+                    return
+                self.size += 1
+            connection = self._open(connect)
+            with self.condition:
+                self.idle.appendleft((connection, self.opened_at[id(connection)], time.monotonic()))
+                self.condition.notify()
+
+    def retire(self):
+        """Close the idle connections; checked-out ones are closed when returned."""
+        with self.condition:
+            self._check_fork()
+            self.retired = True
+            idle, self.idle = self.idle, deque()
+            self.size -= len(idle)
+        for connection, _, _ in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self.condition:
+            self._check_fork()
+            return {
+                'max_size': self.max_size,
+                'size': self.size,
+                'idle': len(self.idle),
+                'checkouts': self.checkouts,
+                'wait_seconds': self.wait_time,
+                'wait_buckets': list(self.wait_buckets),
+                'timeouts': self.timeouts,
+                'opened': self.opened,
+                'discarded': self.discarded,
+            }
+
+
+pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, params, options):
+    """
+    The pool for alias, created from its OPTIONS['pool'] on first use.
+    params identify the server and database; if they change (the test
+    runner switching to the test database), a new pool replaces the old.
+    """
+    pool = pools.get(alias)
+    if pool is None or pool.params != params:
+        with _pools_lock:
+            pool = pools.get(alias)
+            if pool is None or pool.params != params:
+                if pool is not None:
+                    pool.retire()
+                pool = pools[alias] = ConnectionPool(alias, **{**DEFAULTS, **options})
+                pool.params = params
+    return pool
+
+
+def stats():
+    """{alias: stats} of this process's pools."""
+    return {alias: pool.stats() for alias, pool in list(pools.items())}
@@ -0,0 +1,145 @@
+"""
+Read replica routing.
+
+Views opt in with ReplicaReadsMixin and a replica_actions set; safe-method
+requests to those actions read from one of REPLICA_DATABASES, picked at
+random per request. Everything else, including management commands and
+the authentication lookups before the view runs, uses the primary.
+
+Read-your-writes: a replica can lag behind the primary, so
+- once a request writes, the rest of it reads from the primary;
+- a request that wrote pins its user to the primary for
+  REPLICA_PIN_SECONDS, so their next reads see the write. The pin travels
+  with the client in a signed cookie, so it holds whichever worker serves
+  the next request. It is also kept in the default cache for clients that
+  drop cookies; for them it only holds across workers if CACHES points at
+  a shared backend (Redis, Memcached).
+Reads inside a transaction on the primary also stay there.
+
+ReplicaMiddleware holds the per-request state and records the pins; place
+it anywhere in MIDDLEWARE. Replicas are never migrated.
+"""
+import contextvars
+import math
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'replica_pin'
+
+# Routing state of the request being handled in this context
+_state = contextvars.ContextVar('replica_routing', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, f'REPLICA_{name}', default)
+
+
+def replica_databases(urls, **options):
+    """DATABASES entries replica1, replica2, ... for database URLs."""
+    import dj_database_url
+
+    return {
+        f'replica{number}': {**dj_database_url.parse(url, **options), 'TEST': {'MIRROR': DEFAULT_DB_ALIAS}}
+        for number, url in enumerate(urls, start=1)
+    }
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin(user_id):
+    """Send user_id's reads to the primary for the next REPLICA_PIN_SECONDS."""
+    cache.set(_pin_key(user_id), True, _setting('PIN_SECONDS', 5))
+
+
+def is_pinned(request, user_id):
+    """Whether request's pin cookie, or the cache, pins user_id to the primary."""
+    pinned = request.get_signed_cookie(PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=_setting('PIN_SECONDS', 5))
+    return pinned == str(user_id) or cache.get(_pin_key(user_id)) is not None
+
+
+class RoutingState:
+    """Where the current request reads from, and whether it has written."""
+
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+class ReplicaRouter:
+    # The primary is named explicitly: left to Django, reads and writes of
+    # an instance loaded from a replica would go back to that replica
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            state.replica = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in _setting('DATABASES', []):
+            return False
+        return None
+
+
+class ReplicaReadsMixin:
+    """
+    Route the view's safe-method replica_actions to a replica, unless the
+    user is pinned to the primary.
+    """
+
+    replica_actions = frozenset()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _state.get()
+        replicas = _setting('DATABASES', [])
+        if (
+            state is None or not replicas or state.wrote
+            or request.method not in SAFE_METHODS or getattr(self, 'action', None) not in self.replica_actions
+        ):
+            return
+        user = request.user
+        if user.is_authenticated and is_pinned(request, user.pk):
+            return
+        state.replica = random.choice(replicas)
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        # DRF sets the authenticated user on the underlying request too
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin(user.pk)
+            response.set_signed_cookie(
+                PIN_COOKIE, str(user.pk), salt=PIN_COOKIE, max_age=math.ceil(_setting('PIN_SECONDS', 5)),
+                secure=request.is_secure(), httponly=True, samesite='Lax',
+            )
+        return response
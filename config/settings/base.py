@@ -3,6 +3,7 @@ Base Django settings for Library Management System.
 Common settings shared across all environments.
 """
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -32,9 +33,14 @@ INSTALLED_APPS = [
     'apps.books',
     'apps.loans',
     'apps.reviews',
+    'apps.observability',
 ]
 
 MIDDLEWARE = [
+    'apps.observability.middleware.MetricsMiddleware',  # First, to time the whole stack
+    'apps.observability.middleware.TracingMiddleware',
+    'apps.observability.middleware.ProfilingMiddleware',
+    'config.routers.ReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -69,6 +75,13 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Custom User Model
 AUTH_USER_MODEL = 'accounts.User'
 
+# Case-insensitive email login with pooled password hashing
+AUTHENTICATION_BACKENDS = ['apps.accounts.backends.EmailBackend']
+
+# Password hashing pool (apps/accounts/hashing.py)
+PASSWORD_HASH_WORKERS = None    # Concurrent hashes per process; None = min(4, CPU count)
+PASSWORD_HASH_QUEUE = 64        # Requests allowed to wait for the pool before 503
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -124,21 +137,95 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser',
     ],
     'EXCEPTION_HANDLER': 'rest_framework.views.exception_handler',
+    # Proxies in front of the app. Throttles key on the client address; with
+    # 0 that is REMOTE_ADDR, otherwise the entry this many hops from the end
+    # of X-Forwarded-For. Left unset, DRF would trust a client-sent header.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '0')),
+    # Token bucket rates per throttle scope (apps/accounts/throttling.py)
+    'DEFAULT_THROTTLE_RATES': {
+        'anon_search': os.getenv('THROTTLE_ANON_SEARCH', '60/min'),
+        'borrow': os.getenv('THROTTLE_BORROW', '30/min'),
+        'auth': os.getenv('THROTTLE_AUTH', '20/min'),
+    },
 }
 
+# Where throttle buckets are shared between workers. The SQLite file is
+# shared by the workers on one host; with several hosts use
+# 'apps.accounts.throttling.CacheBucketBackend' over a networked CACHES.
+THROTTLE_BACKEND = os.getenv('THROTTLE_BACKEND', 'apps.accounts.throttling.SQLiteBucketBackend')
+THROTTLE_SQLITE_PATH = os.getenv('THROTTLE_SQLITE_PATH', os.path.join(tempfile.gettempdir(), 'library-throttle.sqlite3'))
+THROTTLE_LEASE = 0.1    # Share of a bucket a worker takes at once and spends locally
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    # Rotated refresh tokens are revoked by apps/accounts/revocation.py
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     'TOKEN_TYPE_CLAIM': 'token_type',
+    # Embed role claims (apps/accounts/tokens.py)
+    'TOKEN_OBTAIN_SERIALIZER': 'apps.accounts.tokens.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.accounts.tokens.RoleTokenRefreshSerializer',
 }
 
+# Cache. Process-local by default (the default gunicorn setup runs one
+# worker); with several workers or hosts point this at a shared backend so
+# user cache invalidations reach every process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'library',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Seconds an authenticated user is served from the cache (apps/accounts/user_cache.py).
+# Other workers see a deactivation or password change only once this passes,
+# unless CACHES is shared; raise it (e.g. 300) with Redis or Memcached.
+USER_CACHE_TIMEOUT = int(os.getenv('USER_CACHE_TIMEOUT', '5'))
+
+# Revoked JWTs (apps/accounts/revocation.py)
+REVOCATION_FILTER_CAPACITY = 100000     # Minimum revocations the filter is sized for
+REVOCATION_FILTER_ERROR_RATE = 0.001    # Share of unrevoked tokens that cost a lookup
+REVOCATION_SYNC_INTERVAL = 5            # Seconds before revocations by other processes are seen
+REVOCATION_REBUILD_INTERVAL = 3600      # Seconds between rebuilds that drop expired tokens
+
+# Read replicas (config/routers.py). The environment settings add a
+# replicaN database per URL and list them in REPLICA_DATABASES.
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv('REPLICA_DATABASE_URLS', '').split(',') if url.strip()]
+REPLICA_DATABASES = []
+REPLICA_PIN_SECONDS = 5     # Seconds a user's reads stay on the primary after they write
+
+# Request metrics (apps/observability/metrics.py), served at /metrics
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'library-metrics'))
+METRICS_FLUSH_INTERVAL = 5      # Seconds between a worker's writes to METRICS_DIR
+METRICS_SERVER_TIMING = True    # Add a Server-Timing header to responses
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # Bearer token required to scrape, if set
+METRICS_REQUIRE_TOKEN = False  # Refuse scrapes while METRICS_TOKEN is unset (on in production)
+METRICS_SQL_COMMENTS = os.getenv('METRICS_SQL_COMMENTS', '').lower() in ('1', 'true')  # Tag SQL with its view
+
+# Request tracing (apps/observability/tracing.py)
+TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', '0'))  # Share of requests traced
+TRACING_PARENT_RATE_LIMIT = float(os.getenv('TRACING_PARENT_RATE_LIMIT', '1'))  # Traces/s per worker forced by traceparent
+TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'file')             # 'file' or 'otlp'
+TRACING_FILE = os.getenv('TRACING_FILE', os.path.join(tempfile.gettempdir(), 'library-traces.jsonl'))
+TRACING_FILE_MAX_BYTES = 100 * 1024 * 1024  # TRACING_FILE is moved to TRACING_FILE.1 beyond this
+TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+TRACING_SERVICE_NAME = 'library-api'
+TRACING_MAX_SPANS = 1000    # Spans kept per trace; SQL-heavy requests beyond this are cut short
+
+# Per-request profiles for administrators (apps/observability/profiling.py)
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'library-profiles'))
+PROFILING_INTERVAL = 0.001          # Seconds between CPU samples
+PROFILING_TRACEMALLOC_FRAMES = 25   # Frames kept per allocation traceback
+PROFILING_TOP = 25                  # Allocation sites listed in inline memory profiles
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', 'http://localhost:3000').split(',')
@@ -163,3 +250,9 @@ SWAGGER_SETTINGS = {
     'OPERATIONS_SORTER': 'alpha',
     'TAGS_SORTER': 'alpha',
 }
+
+# Top-rated books leaderboard (apps/books/leaderboard.py)
+LEADERBOARD_PRIOR_WEIGHT = 10        # Phantom reviews at the board mean in the Bayesian average
+LEADERBOARD_SIZE = 100               # Books kept per board
+LEADERBOARD_VELOCITY_DAYS = 30       # Window for the trending rank
+LEADERBOARD_REFRESH_INTERVAL = 60    # Minimum seconds between review-triggered refreshes
@@ -1,6 +1,8 @@
 """
 Development settings for Library Management System.
 """
+from config.routers import replica_databases
+
 from .base import *
 
 DEBUG = True
@@ -33,6 +35,10 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 if DATABASE_URL:
     DATABASES['default'] = dj_database_url.parse(DATABASE_URL)
 
+# Read replicas, from REPLICA_DATABASE_URLS (comma-separated)
+DATABASES.update(replica_databases(REPLICA_DATABASE_URLS))
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
 # CORS - Allow all in development
 CORS_ALLOW_ALL_ORIGINS = True
 
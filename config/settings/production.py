@@ -4,6 +4,8 @@ Configured for Render deployment.
 """
 import os
 import dj_database_url
+from config.routers import replica_databases
+
 from .base import *
 
 DEBUG = False
@@ -11,18 +13,52 @@ DEBUG = False
 # Allowed hosts from environment
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '.onrender.com').split(',')
 
-# Database - Use DATABASE_URL from Railway/Render
+# Database - Use DATABASE_URL from Railway/Render.
+# With DATABASE_POOL_SIZE > 0 (default: GUNICORN_THREADS, else 4) each worker
+# process keeps a bounded pool of connections (config/postgres_pool), checked
+# out per request and health-checked before reuse. 0 keeps one persistent
+# connection per thread instead. Set PGBOUNCER=true when DATABASE_URL points
+# at PgBouncer in transaction mode.
+DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', os.getenv('GUNICORN_THREADS', '4')))
+PGBOUNCER = os.getenv('PGBOUNCER', '').lower() in ('1', 'true')
+DATABASE_OPTIONS = {
+    'engine': 'config.postgres_pool' if DATABASE_POOL_SIZE else None,
+    # Pooled connections go back to the pool at the end of each request
+    'conn_max_age': 0 if DATABASE_POOL_SIZE else 600,
+    'conn_health_checks': True,
+    # PgBouncer may run each transaction on a different server connection,
+    # which a named (server-side) cursor would not survive
+    'disable_server_side_cursors': PGBOUNCER,
+}
 DATABASES = {
     'default': dj_database_url.config(
         default=os.getenv('DATABASE_URL'),
-        conn_max_age=600,
         ssl_require=False,  # Railway doesn't require SSL
+        **DATABASE_OPTIONS,
     )
 }
 
+# Read replicas, from REPLICA_DATABASE_URLS (comma-separated)
+DATABASES.update(replica_databases(REPLICA_DATABASE_URLS, **DATABASE_OPTIONS))
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
+if DATABASE_POOL_SIZE:
+    for database in DATABASES.values():
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': min(int(os.getenv('DATABASE_POOL_MIN_SIZE', '1')), DATABASE_POOL_SIZE),
+            'max_size': DATABASE_POOL_SIZE,
+            'timeout': float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),  # Seconds to wait for a free connection
+        }
+
+# /metrics exposes per-view traffic and pool state: only serve it to
+# scrapers holding METRICS_TOKEN
+METRICS_REQUIRE_TOKEN = True
+
 # Security settings for production
 SECURE_SSL_REDIRECT = True
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+# The platform's router appends the client address to X-Forwarded-For
+REST_FRAMEWORK['NUM_PROXIES'] = int(os.getenv('NUM_PROXIES', '1'))
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 SECURE_HSTS_SECONDS = 31536000  # 1 year
@@ -14,15 +14,28 @@ DATABASES = {
     }
 }
 
+# A mirror of the primary for the read replica tests; reads are only routed
+# to it when a test lists it in REPLICA_DATABASES
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
 # Disable password hashing for faster tests
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
 ]
 
-# Disable throttling in tests
+# Disable throttling in tests (scopes without a rate are not throttled);
+# throttle tests set rates and keep buckets in the per-test cache
 REST_FRAMEWORK['DEFAULT_THROTTLE_CLASSES'] = []
 REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {}
+THROTTLE_BACKEND = 'apps.accounts.throttling.CacheBucketBackend'
 
 # Email backend for testing
 EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 
+
+# Refresh the leaderboard on every review change instead of debouncing
+LEADERBOARD_REFRESH_INTERVAL = 0
+
+# Tests revoke tokens in-process, which updates the filter directly; skip
+# the periodic sync query so it doesn't land in request query budgets
+REVOCATION_SYNC_INTERVAL = 3600
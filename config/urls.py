@@ -33,6 +33,9 @@ urlpatterns = [
     path('api/', include('apps.loans.urls')),
     path('api/', include('apps.reviews.urls')),
 
+    # Prometheus metrics
+    path('', include('apps.observability.urls')),
+
     # API Documentation
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='redoc'),
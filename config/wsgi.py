@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Open pooled database connections before the first request (config/postgres_pool)
+from config.postgres_pool.base import warm  # noqa: E402
+
+warm()
@@ -32,4 +32,5 @@ else:
 "
 
 # Start Gunicorn
-gunicorn config.wsgi:application --bind 0.0.0.0:$PORT
+# Threads share each worker's database pool (DATABASE_POOL_SIZE defaults to GUNICORN_THREADS)
+gunicorn config.wsgi:application --bind 0.0.0.0:$PORT --worker-class gthread --threads ${GUNICORN_THREADS:-4}
@@ -0,0 +1,147 @@
+"""
+Micro-benchmark harness for the test suite.
+
+Benchmarks live in tests/benchmarks/ and only run with --benchmark. Each
+one hands a callable to the benchmark fixture, which measures:
+- time: the callable is looped until a round takes BENCHMARK_ROUND_TIME,
+  then timed over ROUNDS rounds with the garbage collector off. The best
+  round is compared (the least disturbed by the rest of the machine); the
+  median is reported alongside.
+- allocations: one call under tracemalloc. peak_bytes is the most memory
+  the call held at once; blocks is the number of allocations still alive
+  when it returns (its result included).
+
+Results are compared with tests/benchmarks/baseline.json. A benchmark
+fails when its time grows by more than --benchmark-threshold (default
+25%) or its allocations by more than --benchmark-alloc-threshold (default
+10%). Timings are only comparable on the machine that recorded them: the
+committed baseline records its machine, and elsewhere only allocations are
+compared until a local baseline is saved. Record one before changing code
+and compare after:
+
+    pytest tests/benchmarks --benchmark --benchmark-save   # before
+    pytest tests/benchmarks --benchmark                    # after
+"""
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+BASELINE = Path(__file__).resolve().parent / 'benchmarks' / 'baseline.json'
+
+ROUNDS = 15
+BENCHMARK_ROUND_TIME = 0.1
+# Allocation growth below this many blocks is noise (interned strings, caches)
+BLOCK_SLACK = 16
+
+
+def machine():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.machine()}
+
+
+class Result:
+    """Measurements of one benchmark."""
+
+    def __init__(self, name, best, median, loops, objects, peak_bytes, blocks):
+        self.name = name
+        self.best = best
+        self.median = median
+        self.loops = loops
+        self.objects = objects
+        self.peak_bytes = peak_bytes
+        self.blocks = blocks
+
+    def as_dict(self):
+        return {
+            'best_ns': round(self.best * 1e9),
+            'median_ns': round(self.median * 1e9),
+            'objects': self.objects,
+            'peak_bytes': self.peak_bytes,
+            'blocks': self.blocks,
+        }
+
+
+def measure(name, func, objects=1):
+    """Time and count the allocations of func(), which handles objects items per call."""
+    func()  # Warm up lazily built fields, compiled regexes, caches
+
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= BENCHMARK_ROUND_TIME:
+            break
+        loops *= max(2, min(10, int(BENCHMARK_ROUND_TIME / max(elapsed, 1e-9))))
+
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        rounds = []
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            rounds.append((time.perf_counter() - started) / loops)
+
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            result = func()
+            _, peak = tracemalloc.get_traced_memory()
+            blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+            del result
+        finally:
+            tracemalloc.stop()
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return Result(name, min(rounds), statistics.median(rounds), loops, objects, peak - before, blocks)
+
+
+def load_baseline(path=BASELINE):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {'machine': None, 'benchmarks': {}}
+
+
+def save_baseline(results, path=BASELINE):
+    """Merge results into the baseline, keeping benchmarks that were not run."""
+    baseline = load_baseline(path)
+    baseline['machine'] = machine()
+    baseline['benchmarks'].update({result.name: result.as_dict() for result in results})
+    baseline['benchmarks'] = dict(sorted(baseline['benchmarks'].items()))
+    path.write_text(json.dumps(baseline, indent=2) + '\n')
+
+
+def regressions(result, baseline, threshold, alloc_threshold, compare_time=True):
+    """
+    Messages for each way result is worse than its baseline entry. Pass
+    compare_time=False when the baseline was timed on another machine.
+    """
+    if baseline is None:
+        return []
+    problems = []
+    best_ns = result.best * 1e9
+    if compare_time and best_ns > baseline['best_ns'] * (1 + threshold):
+        problems.append(
+            f'time {best_ns / 1000:.1f}us vs baseline {baseline["best_ns"] / 1000:.1f}us '
+            f'(+{best_ns / baseline["best_ns"] - 1:.0%}, threshold {threshold:.0%})'
+        )
+    if result.peak_bytes > baseline['peak_bytes'] * (1 + alloc_threshold):
+        problems.append(
+            f'peak memory {result.peak_bytes} bytes vs baseline {baseline["peak_bytes"]} '
+            f'(+{result.peak_bytes / max(baseline["peak_bytes"], 1) - 1:.0%}, threshold {alloc_threshold:.0%})'
+        )
+    if result.blocks > baseline['blocks'] * (1 + alloc_threshold) + BLOCK_SLACK:
+        problems.append(
+            f'{result.blocks} allocations vs baseline {baseline["blocks"]} (threshold {alloc_threshold:.0%})'
+        )
+    return problems
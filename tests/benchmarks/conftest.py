@@ -0,0 +1,77 @@
+"""
+Fixtures for the micro-benchmarks; see tests/benchmark.py.
+"""
+import pytest
+from tests.benchmark import load_baseline, machine, measure, regressions, save_baseline
+
+_results = []
+
+
+@pytest.fixture(autouse=True)
+def benchmarks_enabled(request):
+    """Benchmarks are slow and machine-dependent; they run only with --benchmark."""
+    if not request.config.getoption('--benchmark'):
+        pytest.skip('benchmarks run with --benchmark')
+
+
+@pytest.fixture(scope='session')
+def baseline():
+    return load_baseline()
+
+
+@pytest.fixture
+def benchmark(request, baseline):
+    """
+    benchmark(func, objects=n) measures func() and fails the test if it
+    regressed against the baseline. objects is the number of items one
+    call handles, for per-object costs. Times are only compared with a
+    baseline recorded on this machine; allocations always are.
+    """
+    same_machine = baseline['machine'] == machine()
+
+    def run(func, objects=1):
+        result = measure(request.node.name, func, objects)
+        _results.append(result)
+        if request.config.getoption('--benchmark-save'):
+            return result
+        problems = regressions(
+            result,
+            baseline['benchmarks'].get(result.name),
+            request.config.getoption('--benchmark-threshold'),
+            request.config.getoption('--benchmark-alloc-threshold'),
+            compare_time=same_machine,
+        )
+        if problems:
+            pytest.fail(f'{result.name} regressed: ' + '; '.join(problems), pytrace=False)
+        return result
+    return run
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not _results:
+        return
+    baseline = load_baseline()
+    write = terminalreporter.write_line
+    terminalreporter.section('benchmarks')
+    same_machine = baseline['machine'] == machine()
+    if baseline['machine'] and not same_machine:
+        write(
+            f'Baseline recorded on another machine ({baseline["machine"]["platform"]}): times were not compared, '
+            'only allocations. Record a local baseline first with --benchmark-save.'
+        )
+    write(f'{"Benchmark":<40} {"Best":>10} {"Median":>10} {"Per object":>11} {"Peak KiB":>9} {"Blocks":>7} {"vs base":>8}')
+    for result in _results:
+        previous = baseline['benchmarks'].get(result.name)
+        if not previous:
+            change = 'new'
+        elif same_machine:
+            change = f'{result.best * 1e9 / previous["best_ns"] - 1:+.0%}'
+        else:
+            change = 'n/a'
+        write(
+            f'{result.name[:40]:<40} {result.best * 1e6:>8.1f}us {result.median * 1e6:>8.1f}us '
+            f'{result.best / result.objects * 1e6:>9.2f}us {result.peak_bytes / 1024:>9.1f} {result.blocks:>7} {change:>8}'
+        )
+    if config.getoption('--benchmark-save'):
+        save_baseline(_results)
+        write(f'Baseline saved for {len(_results)} benchmarks.')
@@ -0,0 +1,111 @@
+"""
+Micro-benchmarks for the per-object cost of the list endpoints' building blocks.
+
+Fixtures are unsaved model instances, so the numbers exclude the database.
+Run with: pytest tests/benchmarks --benchmark
+"""
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from apps.accounts.models import User
+from apps.books.filters import BookFilter
+from apps.books.models import Book
+from apps.books.ordering import CustomOrderingFilter
+from apps.books.pagination import CustomPageNumberPagination
+from apps.books.serializers import BookListSerializer
+from apps.books.views import BookViewSet
+from apps.loans.models import Loan
+from apps.loans.serializers import LoanSerializer
+
+pytestmark = pytest.mark.benchmark
+
+GENRES = ['Fiction', 'Science', 'History', 'Fantasy', 'Poetry']
+
+
+def make_books(count):
+    return [
+        Book(
+            id=i, title=f'Book title number {i}', author=f'Author {i % 97}', isbn=f'978{i:010d}',
+            genre=GENRES[i % len(GENRES)], is_available=i % 3 != 0,
+            avg_rating=3 + (i % 20) / 10, review_count=i % 40,
+            rating_1_count=i % 2, rating_2_count=i % 3, rating_3_count=i % 5,
+            rating_4_count=i % 7, rating_5_count=i % 11,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+@pytest.fixture(scope='module')
+def books():
+    """A 1000-book page."""
+    return make_books(1000)
+
+
+@pytest.fixture(scope='module')
+def loans():
+    """500 active loans with their user and book attached."""
+    now = timezone.now()
+    users = [User(id=i, email=f'member{i}@library.com', username=f'member{i}') for i in range(1, 51)]
+    return [
+        Loan(id=i, user=users[i % 50], book=book, borrowed_at=now - timedelta(days=i % 20),
+             due_date=now + timedelta(days=14 - i % 20))
+        for i, book in enumerate(make_books(500), start=1)
+    ]
+
+
+def api_request(path, **params):
+    return Request(APIRequestFactory().get(path, params))
+
+
+class TestSerializerBenchmarks:
+    """Serialization of list pages."""
+
+    def test_book_list_serializer_1k(self, benchmark, books):
+        """BookListSerializer over a 1000-book page."""
+        benchmark(lambda: BookListSerializer(books, many=True).data, objects=len(books))
+
+    def test_loan_serializer_nested(self, benchmark, loans):
+        """LoanSerializer with its nested BookListSerializer and user email."""
+        benchmark(lambda: LoanSerializer(loans, many=True).data, objects=len(loans))
+
+
+class TestRequestParsingBenchmarks:
+    """Query parameter handling ahead of the query."""
+
+    def test_ordering_param_parsing(self, benchmark):
+        """CustomOrderingFilter.get_ordering with mixed suffixes and an invalid field."""
+        request = api_request('/api/books/', ordering='title_desc,author_asc,-created_at,bogus_desc,avg_rating')
+        view = BookViewSet()
+        ordering = CustomOrderingFilter()
+        benchmark(lambda: ordering.get_ordering(request, None, view))
+
+    def test_filterset_construction(self, benchmark):
+        """BookFilter built, validated and applied to a queryset (not evaluated)."""
+        request = api_request('/api/books/', title='gatsby', genre='fic', is_available='true', published_year='1925')
+        queryset = Book.objects.all()
+        benchmark(lambda: BookFilter(request.query_params, queryset=queryset, request=request).qs)
+
+
+class TestResponseBenchmarks:
+    """Pagination and rendering of a serialized page."""
+
+    def test_page_number_pagination(self, benchmark, books):
+        """CustomPageNumberPagination slicing 1000 books and building the envelope."""
+        request = api_request('/api/books/', page=3, page_size=100)
+        data = [{'id': book.id} for book in books[:100]]
+
+        def paginate():
+            paginator = CustomPageNumberPagination()
+            paginator.paginate_queryset(books, request)
+            return paginator.get_paginated_response(data)
+        benchmark(paginate, objects=100)
+
+    def test_json_rendering_1k(self, benchmark, books):
+        """JSONRenderer over a serialized 1000-book page."""
+        data = {'total_count': len(books), 'results': BookListSerializer(books, many=True).data}
+        renderer = JSONRenderer()
+        benchmark(lambda: renderer.render(data), objects=len(books))
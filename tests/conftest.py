@@ -2,10 +2,59 @@
 Pytest configuration and fixtures.
 """
 import pytest
+from django.core.cache import cache
 from rest_framework.test import APIClient
 from django.contrib.auth.models import Group
 from apps.accounts.models import User
+from apps.accounts.revocation import revoked
 from apps.books.models import Book
+from tests.query_budget import QueryRecorder
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark', 'micro-benchmarks (tests/benchmark.py)')
+    group.addoption('--benchmark', action='store_true', help='Run the benchmarks in tests/benchmarks')
+    group.addoption('--benchmark-save', action='store_true', help='Record the results as the new baseline')
+    group.addoption(
+        '--benchmark-threshold', type=float, default=0.25,
+        help='Fail when a benchmark is slower than its baseline by more than this share (default: 0.25)'
+    )
+    group.addoption(
+        '--benchmark-alloc-threshold', type=float, default=0.10,
+        help='Fail when a benchmark allocates more than its baseline by more than this share (default: 0.10)'
+    )
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request):
+    """
+    Record the queries of every test-client request and fail the test when
+    an endpoint exceeds its query_budget or repeats a query shape (N+1).
+    Opt out with @pytest.mark.no_query_budget.
+    """
+    if request.node.get_closest_marker('no_query_budget'):
+        yield None
+        return
+    with QueryRecorder() as recorder:
+        yield recorder
+    problems = recorder.violations()
+    if problems:
+        pytest.fail('Query budget violations:\n' + '\n'.join(problems), pytrace=False)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with an empty cache; user ids are reused across tests."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def revocation_filter():
+    """Start every test with an empty revocation filter; the database has no revocations either."""
+    revoked.rebuild(rows=())
+    return revoked
 
 
 @pytest.fixture
@@ -53,6 +53,50 @@ class TestRegistrationAPI:
         response = api_client.post(url, data)
         assert response.status_code == 400
 
+    def test_user_registration_duplicate_email_any_case(self, api_client, member_user):
+        """Test an email differing only in case counts as taken."""
+        data = {
+            'email': 'Member@Library.com',
+            'username': 'another',
+            'password': 'SecurePass123!',
+            'password_confirm': 'SecurePass123!',
+            'first_name': 'Another',
+            'last_name': 'User'
+        }
+        response = api_client.post(reverse('register'), data)
+        assert response.status_code == 400
+        assert 'email' in response.data
+
+    def test_user_registration_duplicate_username(self, api_client, member_user):
+        """Test registration fails with a taken username."""
+        data = {
+            'email': 'fresh@example.com',
+            'username': member_user.username,
+            'password': 'SecurePass123!',
+            'password_confirm': 'SecurePass123!',
+            'first_name': 'Fresh',
+            'last_name': 'User'
+        }
+        response = api_client.post(reverse('register'), data)
+        assert response.status_code == 400
+        assert 'username' in response.data
+
+    def test_user_registration_assigns_members(self, api_client, query_budget, member_group):
+        """Test new users join Members, and the group id is cached after the first sign-up."""
+        for i in range(2):
+            response = api_client.post(reverse('register'), {
+                'email': f'new{i}@example.com',
+                'username': f'new{i}',
+                'password': 'SecurePass123!',
+                'password_confirm': 'SecurePass123!',
+                'first_name': 'New',
+                'last_name': 'User'
+            })
+            assert response.status_code == 201
+            assert response.data['user']['groups'] == ['Members']
+
+        assert not [sql for sql, _, _ in query_budget.requests[-1].queries if 'FROM "auth_group"' in sql]
+
 
 @pytest.mark.django_db
 class TestLoginAPI:
@@ -80,6 +124,24 @@ class TestLoginAPI:
         response = api_client.post(url, data)
         assert response.status_code == 401
 
+    def test_login_email_case_insensitive(self, api_client, member_user):
+        """Test login matches the email regardless of case."""
+        data = {
+            'email': 'MEMBER@library.com',
+            'password': 'MemberPass123!'
+        }
+        response = api_client.post(reverse('login'), data)
+        assert response.status_code == 200
+
+    def test_login_unknown_email(self, api_client, db):
+        """Test login fails for an unregistered email."""
+        data = {
+            'email': 'nobody@library.com',
+            'password': 'MemberPass123!'
+        }
+        response = api_client.post(reverse('login'), data)
+        assert response.status_code == 401
+
 
 @pytest.mark.django_db
 class TestProfileAPI:
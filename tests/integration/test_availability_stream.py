@@ -0,0 +1,93 @@
+"""
+Integration tests for availability events and the SSE stream.
+"""
+import json
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import AsyncClient
+from django.urls import reverse
+from apps.books.models import AvailabilityEvent
+
+
+def read_stream(url, chunks, headers=None):
+    """Read the first chunks of a streaming response and close it."""
+    async def read():
+        response = await AsyncClient().get(url, headers=headers)
+        received = []
+        iterator = response.streaming_content.__aiter__()
+        try:
+            while len(received) < chunks:
+                received.append((await iterator.__anext__()).decode())
+        finally:
+            await iterator.aclose()
+        return response, received
+    return async_to_sync(read)()
+
+
+@pytest.mark.django_db
+class TestAvailabilityEvents:
+    """Tests for logging availability changes."""
+
+    def test_borrow_and_return_emit_events(self, authenticated_member_client, authenticated_admin_client, sample_book):
+        """Test borrow and return each log one change."""
+        start = AvailabilityEvent.objects.count()
+        response = authenticated_member_client.post(reverse('loan-borrow'), {'book_id': sample_book.id})
+        authenticated_admin_client.post(reverse('loan-return-book', args=[response.data['id']]))
+
+        events = list(AvailabilityEvent.objects.order_by('id')[start:])
+        assert [(e.book_id, e.is_available) for e in events] == [
+            (sample_book.id, False),
+            (sample_book.id, True),
+        ]
+
+    def test_save_without_change_emits_nothing(self, sample_book):
+        """Test saves that keep availability do not log events."""
+        start = AvailabilityEvent.objects.count()
+        sample_book.title = 'Renamed'
+        sample_book.save()
+        assert AvailabilityEvent.objects.count() == start
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAvailabilityStream:
+    """Tests for the Server-Sent Events endpoint."""
+
+    def test_resume_replays_missed_events(self, sample_book, another_book):
+        """Test clients resuming from an id get the events they missed."""
+        first = AvailabilityEvent.objects.order_by('id').first()
+        another_book.is_available = False
+        another_book.save()
+
+        url = reverse('book-availability-stream')
+        response, chunks = read_stream(url, 2, headers={'Last-Event-ID': str(first.id)})
+        assert response['Content-Type'] == 'text/event-stream'
+        assert chunks[0].startswith('retry:')
+
+        payload = json.loads(chunks[1].split('data: ', 1)[1])
+        assert payload['book_id'] == another_book.id
+        assert payload['is_available'] is True
+
+    def test_resume_filters_by_book(self, sample_book, another_book):
+        """Test the book_ids filter applies to replayed events."""
+        url = reverse('book-availability-stream')
+        _, chunks = read_stream(f'{url}?book_ids={another_book.id}&last_event_id=0', 2)
+        payload = json.loads(chunks[1].split('data: ', 1)[1])
+        assert payload['book_id'] == another_book.id
+
+    def test_invalid_book_ids(self, db):
+        """Test malformed filters are rejected."""
+        async def fetch():
+            return await AsyncClient().get(reverse('book-availability-stream'), {'book_ids': 'abc'})
+        assert async_to_sync(fetch)().status_code == 400
+
+    def test_refused_under_wsgi(self, db):
+        """Test the WSGI handler answers 501 instead of buffering the endless stream."""
+        environ = {'PATH_INFO': reverse('book-availability-stream'), 'HTTP_HOST': 'testserver'}
+        setup_testing_defaults(environ)
+        statuses = []
+        body = b''.join(WSGIHandler()(environ, lambda status, headers: statuses.append(status)))
+        assert statuses == ['501 Not Implemented']
+        assert b'ASGI' in body
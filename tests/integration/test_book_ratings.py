@@ -0,0 +1,94 @@
+"""
+Integration tests for the rating aggregates on books.
+"""
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from apps.books.models import Book
+from apps.reviews.models import Review
+
+
+@pytest.mark.django_db
+class TestRatingAggregates:
+    """Tests for incremental maintenance of avg_rating, review_count and histogram."""
+
+    def test_create_review_updates_book(self, authenticated_member_client, sample_book):
+        """Test creating a review through the API counts it."""
+        response = authenticated_member_client.post(reverse('review-list'), {'book_id': sample_book.id, 'rating': 4})
+        assert response.status_code == 201
+
+        sample_book.refresh_from_db()
+        assert sample_book.review_count == 1
+        assert sample_book.avg_rating == 4.0
+        assert sample_book.rating_histogram == {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0}
+
+    def test_update_moves_rating_between_buckets(self, member_user, another_member_user, sample_book):
+        """Test editing a rating applies a delta instead of adding a review."""
+        Review.objects.create(user=another_member_user, book=sample_book, rating=5, text='')
+        review = Review.objects.create(user=member_user, book=sample_book, rating=2, text='')
+
+        review = Review.objects.get(pk=review.pk)
+        review.rating = 3
+        review.save()
+
+        sample_book.refresh_from_db()
+        assert sample_book.review_count == 2
+        assert sample_book.rating_2_count == 0
+        assert sample_book.rating_3_count == 1
+        assert sample_book.avg_rating == 4.0
+
+    def test_delete_review(self, authenticated_member_client, member_user, sample_book):
+        """Test deleting the last review resets the average."""
+        review = Review.objects.create(user=member_user, book=sample_book, rating=1, text='')
+        response = authenticated_member_client.delete(reverse('review-detail', args=[review.id]))
+        assert response.status_code == 204
+
+        sample_book.refresh_from_db()
+        assert sample_book.review_count == 0
+        assert sample_book.rating_1_count == 0
+        assert sample_book.avg_rating is None
+
+    def test_stale_book_save_keeps_counts(self, member_user, sample_book):
+        """Test saving a book loaded before a review does not clobber the counts."""
+        stale = Book.objects.get(pk=sample_book.pk)
+        Review.objects.create(user=member_user, book=sample_book, rating=5, text='')
+
+        stale.is_available = False
+        stale.save()
+
+        sample_book.refresh_from_db()
+        assert sample_book.review_count == 1
+        assert sample_book.is_available is False
+
+    def test_rebuild_ratings_repairs_drift(self, member_user, another_member_user, sample_book, another_book):
+        """Test the repair command recomputes aggregates from the reviews table."""
+        Review.objects.create(user=member_user, book=sample_book, rating=5, text='')
+        Review.objects.create(user=another_member_user, book=sample_book, rating=2, text='')
+        Book.objects.filter(pk__in=[sample_book.pk, another_book.pk]).update(review_count=7, rating_5_count=9)
+
+        call_command('rebuild_ratings', stdout=None)
+
+        sample_book.refresh_from_db()
+        another_book.refresh_from_db()
+        assert sample_book.review_count == 2
+        assert sample_book.rating_5_count == 1
+        assert sample_book.avg_rating == 3.5
+        assert another_book.review_count == 0
+        assert another_book.avg_rating is None
+
+
+@pytest.mark.django_db
+class TestRatingListing:
+    """Tests for ratings in the catalog list."""
+
+    def test_list_includes_and_orders_by_rating(self, api_client, member_user, sample_book, another_book):
+        """Test list exposes the aggregates and sorts by them."""
+        Review.objects.create(user=member_user, book=another_book, rating=5, text='')
+        Review.objects.create(user=member_user, book=sample_book, rating=3, text='')
+
+        response = api_client.get(reverse('book-list'), {'ordering': 'avg_rating_desc'})
+        assert response.status_code == 200
+        results = response.data['results']
+        assert [book['id'] for book in results] == [another_book.id, sample_book.id]
+        assert results[0]['review_count'] == 1
+        assert results[0]['rating_histogram']['5'] == 1
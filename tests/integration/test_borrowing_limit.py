@@ -1,6 +1,8 @@
 import pytest
 from django.urls import reverse
 from apps.books.models import Book
+from apps.loans.models import Loan
+from apps.loans.management.commands.bench_borrow_concurrency import check_invariants
 
 @pytest.mark.django_db
 class TestBorrowingLimit:
@@ -40,3 +42,26 @@ class TestBorrowingLimit:
         # 4. Borrow second book again (Should Succeed now)
         response3 = authenticated_member_client.post(borrow_url, {'book_id': second_book.id})
         assert response3.status_code == 201, "After returning, borrowing should ensure success"
+
+
+@pytest.mark.django_db
+class TestBorrowInvariants:
+    """Test the invariant checks used by the concurrency benchmark."""
+
+    def test_invariants_hold_after_borrow_cycle(self, authenticated_member_client, authenticated_admin_client, member_user, sample_book):
+        """A borrow followed by a return leaves no violations."""
+        response = authenticated_member_client.post(reverse('loan-borrow'), {'book_id': sample_book.id})
+        assert not any(check_invariants([sample_book.id], [member_user.id]).values())
+
+        authenticated_admin_client.post(reverse('loan-return-book', args=[response.data['id']]))
+        assert not any(check_invariants([sample_book.id], [member_user.id]).values())
+
+    def test_invariants_detect_double_loan_and_drift(self, member_user, another_member_user, sample_book):
+        """Two active loans on an available book are both reported."""
+        Loan.objects.create(user=member_user, book=sample_book)
+        Loan.objects.create(user=another_member_user, book=sample_book)
+
+        violations = check_invariants([sample_book.id], [member_user.id, another_member_user.id])
+        assert violations['double_loans'] == [sample_book.id]
+        assert violations['availability_drift'] == [sample_book.id]
+        assert violations['over_limit_users'] == []
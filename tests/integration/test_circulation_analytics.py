@@ -0,0 +1,68 @@
+"""
+Integration tests for circulation rollups and the analytics endpoint.
+"""
+import pytest
+from datetime import timedelta
+from django.urls import reverse
+from django.utils import timezone
+from apps.loans.models import Loan, CirculationRollup
+from apps.loans import rollups
+
+
+@pytest.mark.django_db
+class TestCirculationRollups:
+    """Tests for incremental and rebuilt rollups."""
+
+    def test_borrow_and_return_update_rollup(self, authenticated_member_client, authenticated_admin_client, sample_book):
+        """Test borrow and return bump today's bucket."""
+        response = authenticated_member_client.post(reverse('loan-borrow'), {'book_id': sample_book.id})
+        authenticated_admin_client.post(reverse('loan-return-book', args=[response.data['id']]))
+
+        row = CirculationRollup.objects.get(day=timezone.localdate(), genre='Fiction')
+        assert row.borrows == 1
+        assert row.returns == 1
+
+    def test_rebuild_matches_incremental_and_counts_overdues(self, member_user, sample_book, another_book):
+        """Test the catch-up job recomputes borrows, returns and overdues."""
+        now = timezone.now()
+        Loan.objects.create(user=member_user, book=sample_book, due_date=now - timedelta(hours=1))
+        Loan.objects.create(user=member_user, book=another_book, returned_at=now)
+
+        today = timezone.localdate()
+        rollups.rebuild(today - timedelta(days=1), today)
+
+        row = CirculationRollup.objects.get(day=today, genre='Fiction')
+        assert row.borrows == 2
+        assert row.returns == 1
+        assert row.overdues == 1
+        assert row.cohort == today.replace(day=1)
+
+
+@pytest.mark.django_db
+class TestAnalyticsAPI:
+    """Tests for the admin analytics endpoint."""
+
+    def test_group_by_genre(self, authenticated_admin_client):
+        """Test rollups are summed per genre over the range."""
+        today = timezone.localdate()
+        cohort = today.replace(day=1)
+        CirculationRollup.objects.create(day=today, genre='Fiction', cohort=cohort, borrows=3, returns=1)
+        CirculationRollup.objects.create(day=today - timedelta(days=1), genre='Fiction', cohort=cohort, borrows=2)
+        CirculationRollup.objects.create(day=today, genre='Thriller', cohort=cohort, borrows=1)
+
+        response = authenticated_admin_client.get(reverse('loan-analytics'), {'group_by': 'genre'})
+        assert response.status_code == 200
+        assert response.data['results'] == [
+            {'genre': 'Fiction', 'borrows': 5, 'returns': 1, 'overdues': 0},
+            {'genre': 'Thriller', 'borrows': 1, 'returns': 0, 'overdues': 0},
+        ]
+
+    def test_invalid_grouping(self, authenticated_admin_client):
+        """Test unknown group_by values are rejected."""
+        response = authenticated_admin_client.get(reverse('loan-analytics'), {'group_by': 'isbn'})
+        assert response.status_code == 400
+
+    def test_member_cannot_view_analytics(self, authenticated_member_client):
+        """Test analytics are admin only."""
+        response = authenticated_member_client.get(reverse('loan-analytics'))
+        assert response.status_code == 403
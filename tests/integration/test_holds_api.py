@@ -0,0 +1,122 @@
+"""
+Integration tests for the hold queue API.
+"""
+import copy
+
+import pytest
+from django.urls import reverse
+from apps.loans.models import Loan, Hold
+from apps.loans.views import LoanViewSet
+
+
+@pytest.fixture
+def borrowed_book(member_user, sample_book):
+    """Return a book that is currently on loan to member_user."""
+    Loan.objects.create(user=member_user, book=sample_book)
+    sample_book.is_available = False
+    sample_book.save()
+    return sample_book
+
+
+@pytest.mark.django_db
+class TestPlaceHoldAPI:
+    """Tests for joining the hold queue."""
+
+    def test_member_can_hold_borrowed_book(self, api_client, another_member_user, borrowed_book):
+        """Test member can place a hold on a book that is out."""
+        api_client.force_authenticate(user=another_member_user)
+        response = api_client.post(reverse('hold-list'), {'book_id': borrowed_book.id})
+        assert response.status_code == 201
+        assert response.data['book']['id'] == borrowed_book.id
+        assert response.data['position'] == 1
+
+    def test_cannot_hold_available_book(self, authenticated_member_client, sample_book):
+        """Test holding an available book is rejected."""
+        response = authenticated_member_client.post(reverse('hold-list'), {'book_id': sample_book.id})
+        assert response.status_code == 400
+
+    def test_cannot_hold_own_borrowed_book(self, authenticated_member_client, borrowed_book):
+        """Test borrower cannot queue for the book they already have."""
+        response = authenticated_member_client.post(reverse('hold-list'), {'book_id': borrowed_book.id})
+        assert response.status_code == 400
+
+    def test_cannot_hold_same_book_twice(self, api_client, another_member_user, borrowed_book):
+        """Test a member can only have one open hold per book."""
+        api_client.force_authenticate(user=another_member_user)
+        api_client.post(reverse('hold-list'), {'book_id': borrowed_book.id})
+        response = api_client.post(reverse('hold-list'), {'book_id': borrowed_book.id})
+        assert response.status_code == 400
+
+    def test_queue_position(self, api_client, admin_user, another_member_user, borrowed_book):
+        """Test positions follow FIFO order."""
+        Hold.objects.create(user=another_member_user, book=borrowed_book)
+        api_client.force_authenticate(user=admin_user)
+        response = api_client.post(reverse('hold-list'), {'book_id': borrowed_book.id})
+        assert response.data['position'] == 2
+
+        listing = api_client.get(reverse('hold-list'))
+        assert [hold['position'] for hold in listing.data] == [2]
+
+
+@pytest.mark.django_db
+class TestHoldHandoff:
+    """Tests for handing returned books to the hold queue."""
+
+    def test_return_lends_book_to_head_of_queue(self, authenticated_admin_client, another_member_user, member_user, borrowed_book):
+        """Test the returned book is lent to the first member in the queue."""
+        hold = Hold.objects.create(user=another_member_user, book=borrowed_book)
+        loan = Loan.objects.get(user=member_user, book=borrowed_book)
+
+        response = authenticated_admin_client.post(reverse('loan-return-book', args=[loan.id]))
+        assert response.status_code == 200
+
+        borrowed_book.refresh_from_db()
+        hold.refresh_from_db()
+        assert borrowed_book.is_available is False
+        assert hold.fulfilled_at is not None
+        assert Loan.objects.filter(user=another_member_user, book=borrowed_book, returned_at__isnull=True).exists()
+
+    def test_return_skips_members_with_active_loan(self, authenticated_admin_client, admin_user, another_member_user, member_user, borrowed_book, another_book):
+        """Test members who still have a book out keep their place."""
+        Loan.objects.create(user=another_member_user, book=another_book)
+        waiting = Hold.objects.create(user=another_member_user, book=borrowed_book)
+        Hold.objects.create(user=admin_user, book=borrowed_book)
+        loan = Loan.objects.get(user=member_user, book=borrowed_book)
+
+        authenticated_admin_client.post(reverse('loan-return-book', args=[loan.id]))
+
+        waiting.refresh_from_db()
+        assert waiting.fulfilled_at is None
+        assert Loan.objects.filter(user=admin_user, book=borrowed_book, returned_at__isnull=True).exists()
+
+    def test_return_without_holds_makes_book_available(self, authenticated_admin_client, member_user, borrowed_book):
+        """Test the book becomes available when nobody is waiting."""
+        loan = Loan.objects.get(user=member_user, book=borrowed_book)
+        authenticated_admin_client.post(reverse('loan-return-book', args=[loan.id]))
+        borrowed_book.refresh_from_db()
+        assert borrowed_book.is_available is True
+
+    def test_stale_second_return_does_not_hand_off_twice(self, monkeypatch, authenticated_admin_client, admin_user, another_member_user, member_user, borrowed_book):
+        """Test a return racing a completed one is refused under the loan lock."""
+        Hold.objects.create(user=another_member_user, book=borrowed_book)
+        Hold.objects.create(user=admin_user, book=borrowed_book)
+        loan = Loan.objects.select_related('user', 'book').get(user=member_user, book=borrowed_book)
+        # Both requests fetch the loan before either commits
+        monkeypatch.setattr(LoanViewSet, 'get_object', lambda self: copy.copy(loan))
+        url = reverse('loan-return-book', args=[loan.id])
+
+        first = authenticated_admin_client.post(url)
+        second = authenticated_admin_client.post(url)
+
+        assert first.status_code == 200
+        assert second.status_code == 400
+        assert Loan.objects.filter(book=borrowed_book, returned_at__isnull=True).count() == 1
+        assert Hold.objects.filter(book=borrowed_book, fulfilled_at__isnull=True).count() == 1
+
+    def test_member_can_cancel_hold(self, api_client, another_member_user, borrowed_book):
+        """Test a member can leave the queue."""
+        hold = Hold.objects.create(user=another_member_user, book=borrowed_book)
+        api_client.force_authenticate(user=another_member_user)
+        response = api_client.delete(reverse('hold-detail', args=[hold.id]))
+        assert response.status_code == 204
+        assert not Hold.objects.filter(pk=hold.pk).exists()
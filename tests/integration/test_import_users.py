@@ -0,0 +1,82 @@
+"""
+Integration tests for the import_users management command.
+"""
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from apps.accounts.models import User
+
+
+def run_import(path, *args):
+    """Run import_users and return (stdout, stderr)."""
+    out, err = StringIO(), StringIO()
+    call_command('import_users', str(path), *args, stdout=out, stderr=err)
+    return out.getvalue(), err.getvalue()
+
+
+@pytest.mark.django_db
+class TestImportUsers:
+    """Tests for bulk user import."""
+
+    def test_import_csv(self, tmp_path, member_group):
+        """Test CSV rows become users with hashed passwords and role groups."""
+        path = tmp_path / 'users.csv'
+        path.write_text(
+            'email,username,first_name,last_name,password,role\n'
+            'ada@school.edu,ada,Ada,Lovelace,EnginePass123!,\n'
+            'alan@school.edu,,Alan,Turing,,Administrators\n'
+        )
+        out, err = run_import(path, '--processes', '1')
+
+        assert 'Imported 2 users; 0 rows failed.' in out
+        ada = User.objects.get(email='ada@school.edu')
+        assert ada.check_password('EnginePass123!')
+        assert ada.group_names == {'Members'}
+        alan = User.objects.get(email='alan@school.edu')
+        assert alan.username == 'alan@school.edu'
+        assert not alan.has_usable_password()
+        assert alan.is_administrator
+
+    def test_row_errors_are_reported(self, tmp_path, member_user):
+        """Test invalid, duplicate and already-registered rows are skipped with their line numbers."""
+        path = tmp_path / 'users.csv'
+        path.write_text(
+            'email,username,password\n'
+            'not-an-email,bad,\n'
+            'MEMBER@library.com,someone,\n'
+            'new@school.edu,new,\n'
+            'NEW@school.edu,new2,\n'
+            'weak@school.edu,weak,123\n'
+        )
+        out, err = run_import(path, '--processes', '1')
+
+        assert 'Imported 1 users; 4 rows failed.' in out
+        assert 'line 2: email' in err
+        assert 'line 3: email: MEMBER@library.com is already registered' in err
+        assert 'line 5: email: NEW@school.edu appears earlier in the file' in err
+        assert 'line 6: password' in err
+        assert User.objects.filter(email='new@school.edu').exists()
+
+    def test_import_jsonl_with_process_pool(self, tmp_path, member_group):
+        """Test JSON Lines import in batches with passwords hashed on a process pool."""
+        path = tmp_path / 'users.jsonl'
+        lines = [json.dumps({'email': f'student{i}@school.edu', 'password': f'Quiet-Harbor-{i}9'}) for i in range(5)]
+        path.write_text('\n'.join(lines + ['{broken']) + '\n')
+        out, err = run_import(path, '--processes', '2', '--batch-size', '2')
+
+        assert 'Processed 6 rows: 5 imported, 1 failed' in out
+        assert 'line 6: row is not a JSON object' in err
+        student = User.objects.get(email='student3@school.edu')
+        assert student.check_password('Quiet-Harbor-39')
+        assert User.groups.through.objects.filter(user__email__endswith='@school.edu').count() == 5
+
+    def test_dry_run_writes_nothing(self, tmp_path, member_group):
+        """Test --dry-run validates without creating users."""
+        path = tmp_path / 'users.json'
+        path.write_text(json.dumps([{'email': 'ada@school.edu'}]))
+        out, _ = run_import(path, '--dry-run', '--processes', '1')
+
+        assert 'Would import 1 users' in out
+        assert not User.objects.filter(email='ada@school.edu').exists()
@@ -0,0 +1,155 @@
+"""
+Integration tests for the top-rated books leaderboard.
+"""
+import threading
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.urls import reverse
+from apps.books import leaderboard
+from apps.books.models import Book, BookRanking
+from apps.reviews.models import Review
+
+
+@pytest.fixture
+def reviewers(member_group):
+    """Return 12 member users."""
+    User = get_user_model()
+    users = []
+    for i in range(12):
+        user = User.objects.create_user(email=f'critic{i}@test.com', username=f'critic{i}', password='pass123')
+        user.groups.add(member_group)
+        users.append(user)
+    return users
+
+
+@pytest.fixture
+def rated_books(reviewers, sample_book, another_book):
+    """
+    sample_book: a single 5-star review.
+    another_book: eleven 5-star and one 4-star review.
+    mystery: a Mystery title with two 3-star reviews.
+    """
+    Review.objects.create(user=reviewers[0], book=sample_book, rating=5, text='')
+    for i, user in enumerate(reviewers):
+        Review.objects.create(user=user, book=another_book, rating=4 if i == 0 else 5, text='')
+    mystery = Book.objects.create(title='The Big Sleep', author='Raymond Chandler', isbn='9780394758282', genre='Mystery')
+    for user in reviewers[:2]:
+        Review.objects.create(user=user, book=mystery, rating=3, text='')
+    return sample_book, another_book, mystery
+
+
+@pytest.mark.django_db
+class TestLeaderboardRefresh:
+    """Tests for the set-based ranking refresh."""
+
+    def test_bayesian_average_favours_many_reviews(self, rated_books):
+        """Test a lone 5-star review ranks below a consistently high-rated book."""
+        sample_book, another_book, mystery = rated_books
+        leaderboard.refresh()
+
+        overall = list(BookRanking.objects.filter(genre__isnull=True).order_by('rank'))
+        assert [ranking.book_id for ranking in overall] == [another_book.id, sample_book.id, mystery.id]
+        assert overall[0].review_count == 12
+        assert overall[1].avg_rating == 5.0
+        assert overall[1].score < overall[0].score
+
+    def test_genre_boards(self, rated_books):
+        """Test each genre gets its own board ranked from 1."""
+        sample_book, another_book, mystery = rated_books
+        leaderboard.refresh()
+
+        fiction = BookRanking.objects.filter(genre='Fiction').order_by('rank')
+        assert [ranking.rank for ranking in fiction] == [1, 2]
+        assert {ranking.book_id for ranking in fiction} == {sample_book.id, another_book.id}
+        assert BookRanking.objects.get(genre='Mystery').rank == 1
+
+    def test_refresh_replaces_previous_rankings(self, rated_books):
+        """Test refreshing twice does not duplicate rows."""
+        leaderboard.refresh()
+        count = BookRanking.objects.count()
+        call_command('refresh_leaderboard', stdout=None)
+        assert BookRanking.objects.count() == count
+
+    def test_review_change_triggers_refresh(self, django_capture_on_commit_callbacks, member_user, sample_book):
+        """Test a committed review refreshes the rankings."""
+        with django_capture_on_commit_callbacks(execute=True):
+            Review.objects.create(user=member_user, book=sample_book, rating=4, text='')
+        assert BookRanking.objects.filter(genre__isnull=True, book=sample_book, rank=1).exists()
+
+    def test_refresh_skipped_when_boards_are_newer(self, rated_books):
+        """Test a requested refresh is skipped if the boards were computed after the change."""
+        leaderboard.refresh()
+        computed_at = BookRanking.objects.first().computed_at
+        assert leaderboard.refresh(changed_at=timezone.now() - timedelta(minutes=1)) == 0
+        assert BookRanking.objects.first().computed_at == computed_at
+        leaderboard.refresh(changed_at=timezone.now())
+        assert BookRanking.objects.first().computed_at > computed_at
+
+    def test_book_once_per_board(self, rated_books):
+        """Test the constraints reject a second row for a book on the same board."""
+        sample_book = rated_books[0]
+        leaderboard.refresh()
+        for genre in (None, 'Fiction'):
+            row = BookRanking.objects.get(genre=genre, book=sample_book)
+            row.pk = None
+            with pytest.raises(IntegrityError), transaction.atomic():
+                row.save()
+
+
+class TestRefreshScheduler:
+    """Tests for the debounce of review-triggered refreshes."""
+
+    def test_leading_and_trailing_refresh(self, settings, monkeypatch):
+        """Test the first change refreshes at once and later ones once the interval is up."""
+        settings.LEADERBOARD_REFRESH_INTERVAL = 0.2
+        calls = []
+        done = threading.Semaphore(0)
+
+        def refresh(changed_at=None):
+            calls.append(changed_at)
+            done.release()
+        monkeypatch.setattr(leaderboard, 'refresh', refresh)
+        scheduler = leaderboard.RefreshScheduler()
+
+        scheduler.request()
+        assert done.acquire(timeout=1)
+        scheduler.request()
+        scheduler.request()
+        assert len(calls) == 1
+        assert done.acquire(timeout=1)
+        assert len(calls) == 2
+        assert not done.acquire(timeout=0.4)
+
+
+@pytest.mark.django_db
+class TestLeaderboardAPI:
+    """Tests for GET /api/books/leaderboard/."""
+
+    def test_overall_board(self, api_client, rated_books):
+        """Test the overall board lists books in rank order."""
+        sample_book, another_book, mystery = rated_books
+        leaderboard.refresh()
+
+        response = api_client.get(reverse('book-leaderboard'), {'limit': 2})
+        assert response.status_code == 200
+        assert [entry['book']['id'] for entry in response.data] == [another_book.id, sample_book.id]
+        assert response.data[0]['rank'] == 1
+
+    def test_genre_and_trending(self, api_client, rated_books):
+        """Test genre boards and the trending ranking."""
+        sample_book, another_book, mystery = rated_books
+        leaderboard.refresh()
+
+        response = api_client.get(reverse('book-leaderboard'), {'genre': 'Mystery', 'sort': 'trending'})
+        assert [entry['book']['id'] for entry in response.data] == [mystery.id]
+        assert response.data[0]['recent_review_count'] == 2
+
+    def test_invalid_parameters(self, api_client):
+        """Test bad sort and limit values are rejected."""
+        assert api_client.get(reverse('book-leaderboard'), {'sort': 'random'}).status_code == 400
+        assert api_client.get(reverse('book-leaderboard'), {'limit': 0}).status_code == 400
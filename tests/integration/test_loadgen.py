@@ -0,0 +1,103 @@
+"""
+Integration tests for the loadgen management command.
+"""
+import random
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from apps.accounts.models import User
+from apps.books.models import Book
+from apps.observability.management.commands.loadgen import (
+    DEFAULT_SCENARIO, StepFailed, Variables, extract, load_scenarios, render,
+)
+
+SCENARIO = """
+rate: 30
+duration: 1
+users: {members: 3, admins: 1}
+vars:
+  search: [gatsby]
+scenarios:
+  - name: browse
+    weight: 3
+    steps:
+      - name: books search
+        path: /api/books/?search={search}
+      - name: book detail
+        path: /api/books/{book_id}/
+  - name: borrow_return
+    weight: 1
+    auth: member
+    steps:
+      - name: available books
+        path: /api/books/?is_available=true
+        save: {book_id: results.*.id}
+      - name: borrow
+        method: POST
+        path: /api/loans/borrow/
+        json: {book_id: "{book_id}"}
+        save: {loan_id: id}
+      - name: return
+        method: POST
+        path: /api/loans/{loan_id}/return_book/
+        auth: admin
+"""
+
+
+class TestScenarioParsing:
+    """Tests for scenario files and placeholders."""
+
+    def test_default_scenario_is_valid(self):
+        """Test the bundled scenario file parses."""
+        config = load_scenarios(DEFAULT_SCENARIO)
+        assert {scenario['name'] for scenario in config['scenarios']} >= {'browse', 'borrow_return', 'review', 'admin'}
+
+    def test_rejects_unknown_auth(self, tmp_path):
+        """Test a typo in auth is reported up front."""
+        path = tmp_path / 'bad.yaml'
+        path.write_text('scenarios: [{name: x, auth: root, steps: [{path: /api/books/}]}]')
+        with pytest.raises(CommandError, match='unknown auth'):
+            load_scenarios(path)
+
+    def test_render_keeps_types(self):
+        """Test whole-string placeholders keep their type and missing ones fail the step."""
+        variables = Variables({'search': ['war']}, [7], random.Random(0))
+        assert render({'book_id': '{book_id}', 'q': 'x={search}'}, variables) == {'book_id': 7, 'q': 'x=war'}
+        with pytest.raises(StepFailed):
+            render('/api/loans/{loan_id}/', variables)
+
+    def test_extract_paths(self):
+        """Test dotted paths, indexes and random picks."""
+        data = {'results': [{'id': 4}, {'id': 5}]}
+        assert extract(data, 'results.1.id', random.Random(0)) == 5
+        assert extract(data, 'results.*.id', random.Random(0)) in (4, 5)
+        assert extract({'results': []}, 'results.*.id', random.Random(0)) is None
+
+
+@pytest.mark.no_query_budget
+@pytest.mark.django_db(transaction=True)
+class TestLoadgenRun:
+    """Tests for a short run against a live server."""
+
+    def test_run_reports_steps_and_cleans_up(self, live_server, settings, tmp_path, admin_group, member_group):
+        """Test a run exercises every step, reports them and removes its users."""
+        settings.METRICS_DIR = str(tmp_path / 'metrics')
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        for i in range(3):
+            Book.objects.create(title=f'The Great Gatsby {i}', author='F. Scott Fitzgerald', isbn=f'978000000000{i}')
+        path = tmp_path / 'scenario.yaml'
+        path.write_text(SCENARIO)
+        out = StringIO()
+
+        call_command('loadgen', '--scenario', str(path), '--url', live_server.url, '--connections', '4',
+                     '--seed', '1', stdout=out)
+
+        output = out.getvalue()
+        for step in ('books search', 'book detail', 'available books', 'borrow', 'return'):
+            assert step in output
+        assert 'Queries/req' in output
+        assert 'BookViewSet.list' in output
+        assert not User.objects.filter(email__contains='@loadgen-').exists()
+        assert Book.objects.filter(is_available=False).count() == 0
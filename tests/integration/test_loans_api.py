@@ -2,8 +2,11 @@
 Integration tests for loans API.
 """
 import pytest
+from datetime import timedelta
 from django.urls import reverse
+from django.utils import timezone
 from apps.books.models import Book
+from apps.loans.models import Loan
 
 
 @pytest.mark.django_db
@@ -160,3 +163,23 @@ class TestLoanListAPI:
         admin_response = api_client.get(url)
         assert admin_response.status_code == 200
 
+
+    def test_my_loans_borrowed_range(self, authenticated_member_client, member_user, sample_book, another_book):
+        """Test my_loans can be narrowed to a borrowed_at range."""
+        old_loan = Loan.objects.create(user=member_user, book=sample_book, returned_at=timezone.now())
+        Loan.objects.filter(pk=old_loan.pk).update(borrowed_at=timezone.now() - timedelta(days=400))
+        Loan.objects.create(user=member_user, book=another_book)
+
+        url = reverse('loan-my-loans')
+        since = (timezone.now() - timedelta(days=30)).date().isoformat()
+        response = authenticated_member_client.get(url, {'since': since})
+        assert response.status_code == 200
+        assert [loan['book']['id'] for loan in response.data] == [another_book.id]
+
+        response = authenticated_member_client.get(url, {'until': since})
+        assert [loan['book']['id'] for loan in response.data] == [sample_book.id]
+
+    def test_my_loans_rejects_bad_date(self, authenticated_member_client):
+        """Test malformed range dates are rejected."""
+        response = authenticated_member_client.get(reverse('loan-my-loans'), {'since': 'yesterday'})
+        assert response.status_code == 400
@@ -0,0 +1,138 @@
+"""
+Integration tests for request metrics, Server-Timing, the Prometheus endpoint
+and the index advisor.
+"""
+import json
+import os
+import re
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.observability.metrics import ROW_SIZE, registry
+from config.postgres_pool import pool as pool_module
+from config.postgres_pool.pool import ConnectionPool
+
+
+@pytest.fixture(autouse=True)
+def metrics(settings, tmp_path):
+    """Fresh series, written to a per-test directory."""
+    settings.METRICS_DIR = str(tmp_path)
+    registry.reset()
+    yield registry
+    registry.reset()
+
+
+def sample(text, name, **labels):
+    """Value of the sample with exactly these labels."""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{re.escape(name)}\{{{re.escape(label_text)}\}} (\S+)$', text, re.MULTILINE)
+    assert match, f'{name}{{{label_text}}} not exposed'
+    return float(match.group(1))
+
+
+@pytest.mark.django_db
+class TestRequestMetrics:
+    """Tests for per-view request metrics."""
+
+    def test_server_timing_header(self, query_budget, api_client, sample_book):
+        """Test responses carry the app, db and serializer timings."""
+        response = api_client.get(reverse('book-list'))
+        assert response.status_code == 200
+        timing = response['Server-Timing']
+        assert re.fullmatch(
+            r'app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", serializer;dur=[\d.]+', timing
+        )
+        queries = int(re.search(r'"(\d+) queries"', timing).group(1))
+        assert queries == len(query_budget.requests[-1].queries)
+
+    def test_records_view_actions(self, api_client, sample_book):
+        """Test requests are recorded under their viewset action."""
+        api_client.get(reverse('book-list'))
+        api_client.get(reverse('book-list'))
+        api_client.get(reverse('book-detail', args=[sample_book.id]))
+        api_client.get(reverse('book-detail', args=[999999]))
+
+        text = api_client.get(reverse('metrics')).content.decode()
+
+        assert sample(text, 'library_http_request_duration_seconds_count', view='BookViewSet.list', method='GET') == 2
+        assert sample(
+            text, 'library_http_request_duration_seconds_bucket', view='BookViewSet.list', method='GET', le='+Inf'
+        ) == 2
+        assert sample(text, 'library_http_requests_total', view='BookViewSet.retrieve', method='GET', status='200') == 1
+        assert sample(text, 'library_http_requests_total', view='BookViewSet.retrieve', method='GET', status='404') == 1
+        assert sample(text, 'library_db_queries_total', view='BookViewSet.list', method='GET') >= 2
+        assert sample(text, 'library_serializer_duration_seconds_total', view='BookViewSet.list', method='GET') > 0
+        assert sample(text, 'library_http_response_bytes_total', view='BookViewSet.list', method='GET') > 0
+
+    def test_aggregates_workers(self, api_client, sample_book, tmp_path):
+        """Test the endpoint sums the files of sibling workers and drops stale ones."""
+        row = [0] * ROW_SIZE
+        row[0], row[-1] = 3, 3
+        worker = {
+            'requests': [['BookViewSet.list', 'GET', row]],
+            'statuses': [['BookViewSet.list', 'GET', '200', 3]],
+        }
+        (tmp_path / f'{os.getppid()}-999999.json').write_text(json.dumps(worker))
+        stale = tmp_path / f'{os.getppid() + 1}-999998.json'
+        stale.write_text(json.dumps(worker))
+
+        api_client.get(reverse('book-list'))
+        text = api_client.get(reverse('metrics')).content.decode()
+
+        assert sample(text, 'library_http_requests_total', view='BookViewSet.list', method='GET', status='200') == 4
+        assert not stale.exists()
+
+    def test_token_required_when_configured(self, api_client, settings):
+        """Test METRICS_TOKEN protects the endpoint."""
+        settings.METRICS_TOKEN = 'scrape-secret'
+        assert api_client.get(reverse('metrics')).status_code == 401
+
+        api_client.credentials(HTTP_AUTHORIZATION='Bearer scrape-secret')
+        response = api_client.get(reverse('metrics'))
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+
+    def test_refused_without_token_when_required(self, api_client, settings):
+        """Test scrapes are refused while METRICS_REQUIRE_TOKEN is on and no token is configured."""
+        settings.METRICS_REQUIRE_TOKEN = True
+        assert api_client.get(reverse('metrics')).status_code == 403
+
+
+    def test_sql_comments(self, query_budget, api_client, sample_book, settings):
+        """Test METRICS_SQL_COMMENTS tags each statement with the view that ran it."""
+        api_client.get(reverse('book-list'))
+        assert not any('/* view=' in sql for sql, _, _ in query_budget.requests[-1].queries)
+
+        settings.METRICS_SQL_COMMENTS = True
+        # The setting is read when the client's middleware is loaded
+        APIClient().get(reverse('book-list'))
+        queries = query_budget.requests[-1].queries
+        assert queries
+        assert all(sql.endswith(' /* view=BookViewSet.list */') for sql, _, _ in queries)
+
+
+    def test_pool_metrics(self, api_client, monkeypatch):
+        """Test connection pool usage and checkout waits are exposed."""
+        pool = ConnectionPool('default', max_size=4)
+        monkeypatch.setattr(pool_module, 'pools', {'default': pool})
+        held = [pool.getconn(lambda: type('Connection', (), {'closed': 0})()) for _ in range(3)]
+
+        text = api_client.get(reverse('metrics')).content.decode()
+        assert sample(text, 'library_db_pool_connections', alias='default', state='in_use') == len(held)
+        assert sample(text, 'library_db_pool_connections', alias='default', state='idle') == 0
+        assert sample(text, 'library_db_pool_max_connections', alias='default') == 4
+        assert sample(text, 'library_db_pool_wait_seconds_count', alias='default') == 3
+        assert sample(text, 'library_db_pool_wait_seconds_bucket', alias='default', le='+Inf') == 3
+        assert sample(text, 'library_db_pool_timeouts_total', alias='default') == 0
+
+
+class TestIndexAdvisor:
+    """Tests for the index_advisor command."""
+
+    def test_requires_postgresql(self, db):
+        """Test the command refuses to run on other databases."""
+        with pytest.raises(CommandError, match='requires PostgreSQL'):
+            call_command('index_advisor')
@@ -0,0 +1,76 @@
+"""
+Integration tests for on-demand request profiling.
+"""
+import re
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+@pytest.fixture(autouse=True)
+def profiles(settings, tmp_path):
+    """Write profiles to a per-test directory."""
+    settings.PROFILING_DIR = str(tmp_path)
+    return tmp_path
+
+
+def bearer_client(email, password):
+    """Client carrying a JWT obtained through the login endpoint."""
+    client = APIClient()
+    response = client.post(reverse('login'), {'email': email, 'password': password})
+    assert response.status_code == 200
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+    return client
+
+
+FOLDED_LINE = re.compile(r'^\S.* \d+$')
+
+
+@pytest.mark.django_db
+class TestProfiling:
+    """Tests for the X-Profile header."""
+
+    def test_admin_cpu_profile_written(self, admin_user, sample_book, profiles):
+        """Test an administrator's request writes a folded CPU profile."""
+        client = bearer_client('admin@library.com', 'AdminPass123!')
+        response = client.get(reverse('book-list'), HTTP_X_PROFILE='cpu')
+
+        assert response.status_code == 200
+        assert len(response.data['results']) == 1
+        profile_id = response['X-Profile-Id']
+        assert profile_id.endswith('-BookViewSet.list')
+        path = profiles / f'{profile_id}.cpu.folded'
+        assert path.exists()
+        assert all(FOLDED_LINE.match(line) for line in path.read_text().splitlines())
+        assert not (profiles / f'{profile_id}.memory.folded').exists()
+
+    def test_admin_inline_memory_profile(self, admin_user, sample_book):
+        """Test inline profiles replace the body and keep the original status."""
+        client = bearer_client('admin@library.com', 'AdminPass123!')
+        response = client.get(reverse('book-detail', args=[sample_book.id]), HTTP_X_PROFILE='memory, inline')
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data['status'] == 200
+        assert 'cpu' not in data
+        assert data['memory']['peak_bytes'] > 0
+        assert data['memory']['top']
+        assert all(FOLDED_LINE.match(line) for line in data['memory']['folded'].splitlines())
+
+    def test_member_header_ignored(self, member_user, sample_book, profiles):
+        """Test non-administrators get a normal response and no profile."""
+        client = bearer_client('member@library.com', 'MemberPass123!')
+        response = client.get(reverse('book-list'), HTTP_X_PROFILE='cpu,inline')
+
+        assert response.status_code == 200
+        assert len(response.data['results']) == 1
+        assert 'X-Profile-Id' not in response
+        assert list(profiles.iterdir()) == []
+
+    def test_anonymous_header_ignored(self, api_client, sample_book, profiles):
+        """Test anonymous requests can't trigger profiling."""
+        response = api_client.get(reverse('book-list'), HTTP_X_PROFILE='cpu')
+        assert response.status_code == 200
+        assert 'X-Profile-Id' not in response
+        assert list(profiles.iterdir()) == []
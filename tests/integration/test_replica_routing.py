@@ -0,0 +1,136 @@
+"""
+Integration tests for read replica routing.
+
+The replica is a test mirror of the primary, so tests commit their data
+(transaction=True) for the replica's connection to see it.
+"""
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from config.routers import ReplicaRouter, RoutingState, _state
+
+pytestmark = [
+    pytest.mark.django_db(transaction=True, databases=['default', 'replica']),
+    pytest.mark.no_query_budget,
+]
+
+
+@pytest.fixture(autouse=True)
+def replica(settings):
+    settings.REPLICA_DATABASES = ['replica']
+    settings.REPLICA_PIN_SECONDS = 60
+
+
+class Capture:
+    """Queries on the primary and the replica during the block."""
+
+    def __enter__(self):
+        self.primary = CaptureQueriesContext(connections['default'])
+        self.replica = CaptureQueriesContext(connections['replica'])
+        self.primary.__enter__()
+        self.replica.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.replica.__exit__(*exc_info)
+        self.primary.__exit__(*exc_info)
+
+    @staticmethod
+    def reads(context, table):
+        return [query['sql'] for query in context.captured_queries if f'FROM "{table}"' in query['sql']]
+
+
+class TestReplicaRouting:
+    """Tests for sending catalog and listing reads to replicas."""
+
+    def test_catalog_reads_from_replica(self, api_client, sample_book):
+        """Test anonymous book list and detail reads are served by the replica."""
+        with Capture() as queries:
+            assert api_client.get(reverse('book-list')).status_code == 200
+            response = api_client.get(reverse('book-detail', args=[sample_book.id]))
+        assert response.data['title'] == sample_book.title
+        assert Capture.reads(queries.replica, 'books')
+        assert not Capture.reads(queries.primary, 'books')
+
+    def test_unlisted_actions_and_writes_use_primary(self, authenticated_admin_client, sample_book):
+        """Test writes, and reads of actions not in replica_actions, stay on the primary."""
+        with Capture() as queries:
+            response = authenticated_admin_client.patch(
+                reverse('book-detail', args=[sample_book.id]), {'genre': 'Classic'}
+            )
+            assert response.status_code == 200
+        assert not queries.replica.captured_queries
+
+    def test_disabled_without_replicas(self, api_client, sample_book, settings):
+        """Test nothing is routed when REPLICA_DATABASES is empty."""
+        settings.REPLICA_DATABASES = []
+        with Capture() as queries:
+            api_client.get(reverse('book-list'))
+        assert not queries.replica.captured_queries
+        assert Capture.reads(queries.primary, 'books')
+
+    def test_user_pinned_after_write(self, authenticated_member_client, member_user, sample_book):
+        """Test a user's reads go to the primary for REPLICA_PIN_SECONDS after they write."""
+        with Capture() as queries:
+            authenticated_member_client.get(reverse('loan-my-loans'))
+        assert Capture.reads(queries.replica, 'loans')
+
+        response = authenticated_member_client.post(reverse('loan-borrow'), {'book_id': sample_book.id})
+        assert response.status_code == 201
+        with Capture() as queries:
+            response = authenticated_member_client.get(reverse('loan-my-loans'))
+        assert len(response.data) == 1
+        assert not Capture.reads(queries.replica, 'loans')
+        assert Capture.reads(queries.primary, 'loans')
+
+    def test_pin_cookie_holds_across_workers(self, authenticated_member_client, sample_book):
+        """Test the pin cookie keeps reads on the primary when another worker's cache never saw the pin."""
+        response = authenticated_member_client.post(reverse('loan-borrow'), {'book_id': sample_book.id})
+        assert response.cookies['replica_pin']['max-age'] == 60
+        cache.clear()
+        with Capture() as queries:
+            authenticated_member_client.get(reverse('loan-my-loans'))
+        assert not Capture.reads(queries.replica, 'loans')
+
+    def test_pin_expires(self, authenticated_member_client, sample_book, settings):
+        """Test reads return to the replica once the pin expires."""
+        settings.REPLICA_PIN_SECONDS = 0.01
+        authenticated_member_client.post(reverse('loan-borrow'), {'book_id': sample_book.id})
+        time.sleep(0.05)
+        with Capture() as queries:
+            authenticated_member_client.get(reverse('loan-my-loans'))
+        assert Capture.reads(queries.replica, 'loans')
+
+
+class TestReplicaRouter:
+    """Tests for the router's decisions within a request."""
+
+    def test_write_switches_request_to_primary(self):
+        """Test reads after a write in the same request come from the primary."""
+        router = ReplicaRouter()
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            state.replica = 'replica'
+            assert router.db_for_read(None) == 'replica'
+            assert router.db_for_write(None) == 'default'
+            assert router.db_for_read(None) == 'default'
+            assert state.wrote
+        finally:
+            _state.reset(token)
+
+    def test_outside_requests_use_primary(self):
+        """Test management commands and other code outside a request use the primary."""
+        router = ReplicaRouter()
+        assert router.db_for_read(None) == 'default'
+        assert router.db_for_write(None) == 'default'
+
+    def test_replicas_not_migrated(self):
+        """Test migrations never run on a replica."""
+        router = ReplicaRouter()
+        assert router.allow_migrate('replica', 'books') is False
+        assert router.allow_migrate('default', 'books') is None
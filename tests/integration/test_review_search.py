@@ -0,0 +1,64 @@
+"""
+Integration tests for review search.
+"""
+import pytest
+from django.contrib import admin
+from django.test import RequestFactory
+from django.urls import reverse
+from apps.reviews.models import Review
+
+
+@pytest.fixture
+def reviews(member_user, another_member_user, sample_book, another_book):
+    """Create reviews with distinct text."""
+    return [
+        Review.objects.create(user=member_user, book=sample_book, rating=5, text='A haunting portrait of ambition'),
+        Review.objects.create(user=another_member_user, book=sample_book, rating=3, text='Too slow for my taste'),
+        Review.objects.create(user=member_user, book=another_book, rating=4, text='Ambition and justice in a small town'),
+    ]
+
+
+@pytest.mark.django_db
+class TestReviewSearchAPI:
+    """Tests for ?search= on the review list."""
+
+    def test_search_matches_text(self, api_client, reviews):
+        """Test only reviews mentioning the term are returned."""
+        response = api_client.get(reverse('review-list'), {'search': 'ambition'})
+        assert response.status_code == 200
+        assert {review['id'] for review in response.data['results']} == {reviews[0].id, reviews[2].id}
+
+    def test_search_is_page_numbered(self, api_client, reviews):
+        """Test ranked results use page-number pagination."""
+        response = api_client.get(reverse('review-list'), {'search': 'ambition', 'page_size': 1})
+        assert response.data['total_count'] == 2
+        assert response.data['total_pages'] == 2
+        assert len(response.data['results']) == 1
+
+    def test_search_combines_with_book_filter(self, api_client, reviews, another_book):
+        """Test search and ?book_id= narrow together."""
+        response = api_client.get(reverse('review-list'), {'search': 'ambition', 'book_id': another_book.id})
+        assert [review['id'] for review in response.data['results']] == [reviews[2].id]
+
+    def test_no_search_keeps_cursor(self, api_client, reviews):
+        """Test plain listing is still cursor-paginated."""
+        response = api_client.get(reverse('review-list'))
+        assert 'total_count' not in response.data
+        assert len(response.data['results']) == 3
+
+
+@pytest.mark.django_db
+class TestReviewAdminSearch:
+    """Tests for the admin changelist search."""
+
+    def test_admin_search_matches_text_and_user(self, admin_user, reviews):
+        """Test admin search finds reviews by text as well as by reviewer."""
+        model_admin = admin.site._registry[Review]
+        request = RequestFactory().get('/admin/reviews/review/')
+        request.user = admin_user
+        queryset = model_admin.get_queryset(request)
+
+        results, _ = model_admin.get_search_results(request, queryset, 'justice')
+        assert list(results) == [reviews[2]]
+        results, _ = model_admin.get_search_results(request, queryset, 'another@library.com')
+        assert list(results) == [reviews[1]]
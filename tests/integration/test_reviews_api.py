@@ -0,0 +1,60 @@
+"""
+Integration tests for the reviews API.
+"""
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from apps.reviews.models import Review
+
+
+@pytest.fixture
+def many_reviews(member_group, sample_book):
+    """Create 25 reviews of sample_book, each by a different member."""
+    User = get_user_model()
+    reviews = []
+    for i in range(25):
+        user = User.objects.create_user(email=f'reader{i}@test.com', username=f'reader{i}', password='pass123')
+        user.groups.add(member_group)
+        reviews.append(Review.objects.create(user=user, book=sample_book, rating=i % 5 + 1, text=f'Review {i}'))
+    return reviews
+
+
+@pytest.mark.django_db
+class TestReviewListAPI:
+    """Tests for cursor-paginated review listings."""
+
+    def test_list_is_paginated_newest_first(self, api_client, many_reviews, sample_book):
+        """Test the first page holds the newest reviews and links to the next."""
+        response = api_client.get(reverse('review-list'), {'book_id': sample_book.id})
+        assert response.status_code == 200
+        assert len(response.data['results']) == 20
+        assert response.data['results'][0]['id'] == many_reviews[-1].id
+        assert response.data['next'] is not None
+        assert response.data['previous'] is None
+
+    def test_follow_cursor_to_last_page(self, api_client, many_reviews, sample_book):
+        """Test following the next link returns the remaining reviews once."""
+        first = api_client.get(reverse('review-list'), {'book_id': sample_book.id})
+        second = api_client.get(first.data['next'])
+        assert second.status_code == 200
+        assert second.data['next'] is None
+
+        ids = [review['id'] for review in first.data['results'] + second.data['results']]
+        assert sorted(ids) == sorted(review.id for review in many_reviews)
+
+    def test_book_filter(self, api_client, member_user, sample_book, another_book):
+        """Test ?book_id= only returns that book's reviews."""
+        Review.objects.create(user=member_user, book=sample_book, rating=5, text='')
+        Review.objects.create(user=member_user, book=another_book, rating=3, text='')
+        response = api_client.get(reverse('review-list'), {'book_id': another_book.id})
+        assert [review['book'] for review in response.data['results']] == [another_book.id]
+
+    def test_my_reviews_paginated(self, authenticated_member_client, member_user, sample_book, another_book):
+        """Test my_reviews pages through the user's own reviews."""
+        Review.objects.create(user=member_user, book=sample_book, rating=5, text='')
+        Review.objects.create(user=member_user, book=another_book, rating=3, text='')
+        response = authenticated_member_client.get(reverse('review-my-reviews'), {'page_size': 1})
+        assert response.status_code == 200
+        assert len(response.data['results']) == 1
+        assert response.data['results'][0]['book'] == another_book.id
+        assert response.data['next'] is not None
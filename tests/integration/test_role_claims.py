@@ -0,0 +1,65 @@
+"""
+Integration tests for role claims in JWT tokens.
+"""
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def login(email, password):
+    """Log in through the API and return the token pair."""
+    response = APIClient().post(reverse('login'), {'email': email, 'password': password})
+    assert response.status_code == 200
+    return response.data
+
+
+def bearer_client(access):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    return client
+
+
+@pytest.mark.django_db
+class TestRoleClaims:
+    """Tests for issuing and verifying role claims."""
+
+    def test_login_embeds_roles(self, admin_user):
+        """Test access tokens carry the user's roles and token version."""
+        tokens = login('admin@library.com', 'AdminPass123!')
+        access = AccessToken(tokens['access'])
+        assert access['roles'] == ['Administrators', 'Members']
+        assert access['ver'] == admin_user.token_version
+
+    def test_role_checks_cost_no_queries(self, query_budget, admin_user):
+        """Test an admin request authorizes without touching auth_group."""
+        tokens = login('admin@library.com', 'AdminPass123!')
+        response = bearer_client(tokens['access']).get(reverse('loan-list'))
+        assert response.status_code == 200
+
+        request = query_budget.requests[-1]
+        assert not [sql for sql, _, _ in request.queries if 'auth_group' in sql]
+
+    def test_role_change_revokes_tokens(self, authenticated_admin_client, member_user):
+        """Test changing a user's groups via the API invalidates their tokens."""
+        tokens = login('member@library.com', 'MemberPass123!')
+
+        response = authenticated_admin_client.patch(
+            reverse('user-detail', args=[member_user.id]), {'groups': ['Administrators']}, format='json'
+        )
+        assert response.status_code == 200
+
+        assert bearer_client(tokens['access']).get(reverse('profile')).status_code == 401
+        refresh = APIClient().post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        assert refresh.status_code == 401
+
+        fresh = login('member@library.com', 'MemberPass123!')
+        assert AccessToken(fresh['access'])['roles'] == ['Administrators']
+        assert bearer_client(fresh['access']).get(reverse('user-list')).status_code == 200
+
+    def test_refresh_reissues_roles(self, member_user):
+        """Test refreshing keeps role claims on the new access token."""
+        tokens = login('member@library.com', 'MemberPass123!')
+        response = APIClient().post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        assert response.status_code == 200
+        assert AccessToken(response.data['access'])['roles'] == ['Members']
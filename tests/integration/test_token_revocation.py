@@ -0,0 +1,143 @@
+"""
+Integration tests for token revocation (logout, refresh rotation).
+"""
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from apps.accounts.models import RevokedToken
+from apps.accounts.revocation import BloomFilter, is_revoked, revoke
+
+
+def login(email, password):
+    """Log in through the API and return the token pair."""
+    response = APIClient().post(reverse('login'), {'email': email, 'password': password})
+    assert response.status_code == 200
+    return response.data
+
+
+def bearer_client(access):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    return client
+
+
+def revocation_lookups(request):
+    return [sql for sql, _, _ in request.queries if 'revoked_tokens' in sql]
+
+
+@pytest.mark.django_db
+class TestTokenRevocation:
+    """Tests for revoking tokens and checking revocations."""
+
+    def test_logout_revokes_tokens(self, member_user):
+        """Test logout revokes both the refresh token and the access token used."""
+        tokens = login('member@library.com', 'MemberPass123!')
+        client = bearer_client(tokens['access'])
+
+        response = client.post(reverse('logout'), {'refresh': tokens['refresh']})
+        assert response.status_code == 204
+
+        assert client.get(reverse('profile')).status_code == 401
+        refresh = APIClient().post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        assert refresh.status_code == 401
+
+    def test_logout_rejects_invalid_refresh(self, db):
+        """Test logout with a malformed refresh token is refused."""
+        response = APIClient().post(reverse('logout'), {'refresh': 'not-a-token'})
+        assert response.status_code == 401
+
+    def test_rotated_refresh_token_is_revoked(self, member_user):
+        """Test a refresh token cannot be used again after rotation."""
+        tokens = login('member@library.com', 'MemberPass123!')
+
+        first = APIClient().post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        assert first.status_code == 200
+        assert first.data['refresh'] != tokens['refresh']
+
+        reuse = APIClient().post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+        assert reuse.status_code == 401
+        assert APIClient().post(reverse('token_refresh'), {'refresh': first.data['refresh']}).status_code == 200
+
+    def test_unrevoked_tokens_skip_lookup(self, query_budget, member_user):
+        """Test authenticating with an unrevoked token does not query revoked_tokens."""
+        tokens = login('member@library.com', 'MemberPass123!')
+        revoke(RefreshToken(login('member@library.com', 'MemberPass123!')['refresh']))
+
+        assert bearer_client(tokens['access']).get(reverse('profile')).status_code == 200
+        assert revocation_lookups(query_budget.requests[-1]) == []
+
+    def test_sync_picks_up_revocations_from_other_processes(self, revocation_filter, member_user):
+        """Test revocations written elsewhere reach the filter on sync."""
+        access = AccessToken.for_user(member_user)
+        RevokedToken.objects.create(
+            jti=access['jti'], token_type='access', user=member_user,
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        assert not is_revoked(access)
+
+        revocation_filter.sync()
+        assert is_revoked(access)
+
+    def test_rebuild_drops_expired_revocations(self, revocation_filter, member_user):
+        """Test rebuilding leaves expired revocations out and prune deletes them."""
+        RevokedToken.objects.create(
+            jti='expired', token_type='access', user=member_user,
+            expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        revocation_filter.rebuild()
+        assert not revocation_filter.might_contain('expired')
+
+        call_command('prune_revoked_tokens')
+        assert not RevokedToken.objects.exists()
+
+    def test_repeated_syncs_do_not_fill_filter(self, revocation_filter, member_user):
+        """Test re-reading the late-commit window does not count revocations twice."""
+        RevokedToken.objects.bulk_create([
+            RevokedToken(
+                jti=f'jti-{i}', token_type='access', user=member_user,
+                expires_at=timezone.now() + timedelta(hours=1),
+            )
+            for i in range(3)
+        ])
+        for _ in range(5):
+            revocation_filter.sync()
+        assert revocation_filter.bloom.count == 3
+
+    def test_rebuild_sized_from_revocations(self, revocation_filter, settings):
+        """Test a rebuild leaves room for twice the revocations, so it is not repeated at once."""
+        settings.REVOCATION_FILTER_CAPACITY = 10
+        revocation_filter.rebuild(rows=[(i, f'jti-{i}') for i in range(1, 31)])
+        assert revocation_filter.bloom.capacity == 60
+        assert revocation_filter._due() is None
+
+
+class TestBloomFilter:
+    """Tests for the Bloom filter behind the revocation check."""
+
+    def test_no_false_negatives(self):
+        """Test every added key is reported as present."""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        keys = [f'jti-{i}' for i in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(key in bloom for key in keys)
+
+    def test_duplicates_counted_once(self):
+        """Test adding a key again does not count toward capacity."""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        bloom.add('jti')
+        bloom.add('jti')
+        assert bloom.count == 1
+
+    def test_false_positive_rate(self):
+        """Test the false positive rate stays near the configured rate at capacity."""
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        assert false_positives < 300
@@ -0,0 +1,140 @@
+"""
+Integration tests for request tracing.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from django.urls import reverse
+from apps.observability.management.commands.collect_traces import format_traces
+from apps.observability import tracing
+from apps.observability.tracing import ParentSampling, exporter
+
+
+@pytest.fixture
+def traced(settings, tmp_path, monkeypatch):
+    """Trace every request into a per-test file."""
+    settings.TRACING_SAMPLE_RATE = 1.0
+    settings.TRACING_EXPORTER = 'file'
+    settings.TRACING_FILE = str(tmp_path / 'traces.jsonl')
+    monkeypatch.setattr(exporter, 'BATCH_DELAY', 0)
+    monkeypatch.setattr(tracing, 'parent_sampling', ParentSampling())
+    return tmp_path / 'traces.jsonl'
+
+
+def exported_spans(path):
+    """Spans of every trace exported to path."""
+    exporter.flush()
+    spans = []
+    for line in path.read_text().splitlines():
+        for resource_spans in json.loads(line)['resourceSpans']:
+            for scope_spans in resource_spans['scopeSpans']:
+                spans.extend(scope_spans['spans'])
+    return spans
+
+
+def attributes(span):
+    return {item['key']: next(iter(item['value'].values())) for item in span['attributes']}
+
+
+@pytest.mark.django_db
+class TestTracing:
+    """Tests for spans around DRF stages and SQL."""
+
+    def test_book_list_spans(self, api_client, sample_book, traced):
+        """Test a list request has nested spans for each stage and statement."""
+        response = api_client.get(reverse('book-list'), {'search': 'gatsby', 'ordering': 'title'})
+        assert response.status_code == 200
+
+        spans = exported_spans(traced)
+        by_id = {span['spanId']: span for span in spans}
+        names = [span['name'] for span in spans]
+        root = next(span for span in spans if span['name'] == 'GET BookViewSet.list')
+        assert root['parentSpanId'] == ''
+        assert attributes(root)['http.response.status_code'] == str(response.status_code)
+        assert 'search=gatsby' in attributes(root)['url.query']
+        assert response['traceresponse'].split('-')[1] == root['traceId']
+
+        for name in (
+            'authenticate', 'check_permissions', 'check_throttles',
+            'filter BookSearchFilter', 'filter DjangoFilterBackend', 'filter CustomOrderingFilter',
+            'paginate CustomPageNumberPagination', 'serialize BookListSerializer(many=True)', 'render JSONRenderer',
+        ):
+            assert name in names
+
+        queries = [span for span in spans if span['name'] == 'SELECT']
+        assert queries
+        assert all(attributes(span)['db.system'] == 'sqlite' for span in queries)
+        # Statements are exported without their parameters
+        assert not any('gatsby' in attributes(span)['db.statement'] for span in queries)
+        # The count query runs inside the paginator's span
+        count = next(span for span in queries if 'COUNT(' in attributes(span)['db.statement'])
+        assert by_id[count['parentSpanId']]['name'] == 'paginate CustomPageNumberPagination'
+
+    def test_unsampled_requests_not_traced(self, api_client, sample_book, traced, settings):
+        """Test requests outside the sample leave no trace."""
+        settings.TRACING_SAMPLE_RATE = 0.0
+        response = api_client.get(reverse('book-list'))
+        exporter.flush()
+        assert 'traceresponse' not in response
+        assert not traced.exists()
+
+    def test_traceparent_joins_trace(self, api_client, sample_book, traced, settings):
+        """Test a sampled traceparent header is honoured regardless of the rate."""
+        settings.TRACING_SAMPLE_RATE = 0.0
+        trace_id, parent_id = '4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7'
+        api_client.get(reverse('book-detail', args=[sample_book.id]), HTTP_TRACEPARENT=f'00-{trace_id}-{parent_id}-01')
+
+        spans = exported_spans(traced)
+        assert {span['traceId'] for span in spans} == {trace_id}
+        root = next(span for span in spans if span['name'] == 'GET BookViewSet.retrieve')
+        assert root['parentSpanId'] == parent_id
+
+    def test_traceparent_rate_limited(self, api_client, sample_book, traced, settings):
+        """Test clients cannot force more traces than TRACING_PARENT_RATE_LIMIT allows."""
+        settings.TRACING_SAMPLE_RATE = 0.0
+        headers = {'HTTP_TRACEPARENT': '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'}
+        responses = [api_client.get(reverse('book-detail', args=[sample_book.id]), **headers) for _ in range(3)]
+        assert ['traceresponse' in response for response in responses] == [True, False, False]
+
+        settings.TRACING_PARENT_RATE_LIMIT = 0
+        assert 'traceresponse' not in api_client.get(reverse('book-detail', args=[sample_book.id]), **headers)
+
+    def test_trace_file_rotated(self, api_client, sample_book, traced, settings):
+        """Test the trace file is moved aside once it exceeds TRACING_FILE_MAX_BYTES."""
+        settings.TRACING_FILE_MAX_BYTES = 10
+        traced.write_text('x' * 100)
+        api_client.get(reverse('book-detail', args=[sample_book.id]))
+        exporter.flush()
+        assert traced.with_name('traces.jsonl.1').read_text() == 'x' * 100
+        assert exported_spans(traced)
+
+    def test_otlp_export(self, api_client, sample_book, traced, settings):
+        """Test traces are POSTed as OTLP/JSON to a collector."""
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            settings.TRACING_EXPORTER = 'otlp'
+            settings.TRACING_OTLP_ENDPOINT = f'http://127.0.0.1:{server.server_port}/v1/traces'
+            api_client.get(reverse('book-list'))
+            exporter.flush()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert len(received) == 1
+        lines = format_traces(received[0])
+        assert lines[0].startswith('trace ')
+        assert lines[1].strip().startswith('GET BookViewSet.list')
@@ -0,0 +1,101 @@
+"""
+Integration tests for cached user resolution in JWT authentication.
+"""
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from apps.accounts import user_cache
+
+
+def login(email, password):
+    """Log in through the API and return the access token."""
+    response = APIClient().post(reverse('login'), {'email': email, 'password': password})
+    assert response.status_code == 200
+    return response.data['access']
+
+
+def bearer_client(access):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    return client
+
+
+def user_lookups(request):
+    """Queries of a recorded request that load a user by id."""
+    return [sql for sql, _, _ in request.queries if sql.startswith('SELECT') and 'FROM "users" WHERE "users"."id"' in sql]
+
+
+@pytest.mark.django_db
+class TestUserCache:
+    """Tests for serving the authenticated user from the cache."""
+
+    @pytest.mark.parametrize('url_name', ['loan-my-loans', 'review-my-reviews'])
+    def test_repeat_requests_skip_user_lookup(self, query_budget, member_user, url_name):
+        """Test only the first request with a token loads the user row."""
+        client = bearer_client(login('member@library.com', 'MemberPass123!'))
+
+        assert client.get(reverse(url_name)).status_code == 200
+        assert len(user_lookups(query_budget.requests[-1])) == 1
+
+        assert client.get(reverse(url_name)).status_code == 200
+        assert user_lookups(query_budget.requests[-1]) == []
+
+    def test_cached_user_defers_password(self, member_user):
+        """Test the cached user carries its fields but not the password hash."""
+        user_cache.cache_user(member_user)
+        cached = user_cache.cached_user(member_user.id, member_user.token_version)
+        assert cached.email == 'member@library.com'
+        assert 'password' in cached.get_deferred_fields()
+        assert cached._state.db == member_user._state.db
+        assert cached.check_password('MemberPass123!')
+
+    def test_entry_recached_before_commit_is_dropped(self, member_user, django_capture_on_commit_callbacks):
+        """Test an entry cached from the pre-commit row while a save is in flight is dropped at commit."""
+        with django_capture_on_commit_callbacks(execute=True):
+            member_user.is_active = False
+            member_user.save()
+            # A concurrent request loading the old row
+            user_cache.cache_user(member_user)
+        assert user_cache.cached_user(member_user.id, member_user.token_version) is None
+
+    def test_deactivation_rejects_cached_user(self, member_user):
+        """Test deactivating a user ends their cached session."""
+        client = bearer_client(login('member@library.com', 'MemberPass123!'))
+        assert client.get(reverse('profile')).status_code == 200
+
+        member_user.is_active = False
+        member_user.save()
+
+        assert client.get(reverse('profile')).status_code == 401
+
+    def test_password_change_reloads_user(self, query_budget, member_user):
+        """Test saving a user drops the cached entry."""
+        client = bearer_client(login('member@library.com', 'MemberPass123!'))
+        client.get(reverse('profile'))
+
+        member_user.set_password('NewPass123!')
+        member_user.save()
+
+        assert client.get(reverse('profile')).status_code == 200
+        assert len(user_lookups(query_budget.requests[-1])) == 1
+
+    def test_role_change_rejects_cached_user(self, member_user, admin_group):
+        """Test a group change revokes the token even with the user cached."""
+        client = bearer_client(login('member@library.com', 'MemberPass123!'))
+        assert client.get(reverse('profile')).status_code == 200
+
+        member_user.groups.add(admin_group)
+
+        assert client.get(reverse('profile')).status_code == 401
+
+    def test_profile_update_from_cached_user(self, member_user):
+        """Test a cached user can be saved without overwriting its password."""
+        client = bearer_client(login('member@library.com', 'MemberPass123!'))
+        client.get(reverse('profile'))
+
+        response = client.patch(reverse('profile'), {'first_name': 'Cached'}, format='json')
+        assert response.status_code == 200
+
+        member_user.refresh_from_db()
+        assert member_user.first_name == 'Cached'
+        assert member_user.check_password('MemberPass123!')
@@ -0,0 +1,61 @@
+"""
+Integration tests for the admin user listing.
+"""
+import pytest
+from django.urls import reverse
+from apps.accounts.models import User
+
+
+@pytest.fixture
+def many_members(member_group):
+    """Create 12 member users."""
+    users = []
+    for i in range(12):
+        user = User.objects.create_user(
+            email=f'student{i}@school.edu', username=f'student{i}', password=None,
+            first_name='Grace' if i == 7 else 'Student', last_name=f'Number{i}',
+        )
+        users.append(user)
+    return users
+
+
+@pytest.mark.django_db
+class TestUserListing:
+    """Tests for paginating and searching users."""
+
+    def test_list_is_cursor_paginated(self, authenticated_admin_client, many_members):
+        """Test pages follow next links newest first without repeats."""
+        url = reverse('user-list') + '?page_size=5'
+        seen = []
+        while url:
+            response = authenticated_admin_client.get(url)
+            assert response.status_code == 200
+            seen.extend(user['email'] for user in response.data['results'])
+            url = response.data['next']
+
+        assert len(seen) == len(set(seen)) == 13
+        assert seen[:2] == ['student11@school.edu', 'student10@school.edu']
+
+    def test_list_reads_roles_from_prefetch(self, authenticated_admin_client, query_budget, many_members, admin_user):
+        """Test is_administrator and groups cost no query per row."""
+        response = authenticated_admin_client.get(reverse('user-list'))
+        assert response.status_code == 200
+
+        by_email = {user['email']: user for user in response.data['results']}
+        assert by_email['admin@library.com']['is_administrator'] is True
+        assert by_email['student3@school.edu']['is_administrator'] is False
+        assert by_email['student3@school.edu']['groups'] == ['Members']
+        assert query_budget.requests[-1].count <= 4
+
+    @pytest.mark.parametrize('term, expected', [
+        ('SCHOOL.edu', 12),
+        ('student1', 3),
+        ('grace', 1),
+        ('number11', 1),
+        ('nobody', 0),
+    ])
+    def test_search(self, authenticated_admin_client, many_members, term, expected):
+        """Test search matches email, username and names case-insensitively."""
+        response = authenticated_admin_client.get(reverse('user-list'), {'search': term, 'page_size': 50})
+        assert response.status_code == 200
+        assert len(response.data['results']) == expected
@@ -0,0 +1,166 @@
+"""
+Per-request query recording for the test suite.
+
+Every request made through the Django test client is recorded: the SQL it
+ran, grouped by query shape, and the application stack (view, serializer,
+permission) behind each query. Views declare a ``query_budget`` dict keyed
+by action (viewsets) or lower-case HTTP method (plain API views), and the
+autouse fixture in conftest.py fails a test whose requests exceed their
+budget or repeat a query shape N+1 style.
+
+    class BookViewSet(viewsets.ModelViewSet):
+        query_budget = {'list': 2, 'retrieve': 1, ...}
+"""
+import re
+import traceback
+from collections import Counter
+from pathlib import Path
+
+from django.core.signals import request_started, request_finished
+from django.db import connection
+from django.urls import Resolver404, resolve
+
+APPS_DIR = str(Path(__file__).resolve().parent.parent / 'apps')
+
+# A shape repeated this many times in one request is reported as N+1
+REPEAT_THRESHOLD = 3
+
+# Transaction bookkeeping is not work the view chose to do
+IGNORED_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT')
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def query_shape(sql):
+    """SQL with IN lists collapsed, so batches of different sizes match."""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def app_stack():
+    """The apps/ frames of the current stack, outermost first."""
+    return [
+        f'{Path(frame.filename).relative_to(APPS_DIR).as_posix()}:{frame.lineno} {frame.name}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(APPS_DIR)
+    ]
+
+
+def resolve_endpoint(path, method):
+    """
+    Return (view class, action) for a request path, or (None, None) if it
+    is not served by a class-based view under apps/.
+    """
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None, None
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None or not view_class.__module__.startswith('apps.'):
+        return None, None
+    actions = getattr(match.func, 'actions', None)
+    action = actions.get(method.lower()) if actions else method.lower()
+    return view_class, action
+
+
+class RecordedRequest:
+    """Queries executed while serving one request."""
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.queries = []  # (sql, params, stack)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated_shapes(self, threshold=REPEAT_THRESHOLD):
+        """Shapes executed at least threshold times, with the stack of the first."""
+        counts = Counter(query_shape(sql) for sql, _, _ in self.queries)
+        repeated = []
+        for shape, count in counts.items():
+            if count >= threshold:
+                stack = next(stack for sql, _, stack in self.queries if query_shape(sql) == shape)
+                repeated.append((shape, count, stack))
+        return repeated
+
+    def duplicates(self):
+        """Identical statements (same SQL and parameters) run more than once, with the stack of the first repeat."""
+        counts = Counter((sql, repr(params)) for sql, params, _ in self.queries)
+        duplicates = []
+        for (sql, params), count in counts.items():
+            if count > 1:
+                stacks = [stack for query_sql, query_params, stack in self.queries
+                          if query_sql == sql and repr(query_params) == params]
+                duplicates.append((sql, count, stacks[1]))
+        return duplicates
+
+
+class QueryRecorder:
+    """
+    Records queries per test-client request on the default connection.
+    Use as a context manager around a test.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.current = None
+        self._wrapper = None
+
+    def __enter__(self):
+        request_started.connect(self._started)
+        request_finished.connect(self._finished)
+        self._wrapper = connection.execute_wrapper(self._record)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        request_started.disconnect(self._started)
+        request_finished.disconnect(self._finished)
+
+    def _started(self, sender, environ=None, scope=None, **kwargs):
+        if environ is not None:
+            method, path = environ['REQUEST_METHOD'], environ['PATH_INFO']
+        elif scope is not None:
+            method, path = scope.get('method', 'GET'), scope.get('path', '')
+        else:
+            return
+        self.current = RecordedRequest(method, path)
+        self.requests.append(self.current)
+
+    def _finished(self, sender, **kwargs):
+        self.current = None
+
+    def _record(self, execute, sql, params, many, context):
+        if self.current is not None and not sql.lstrip().upper().startswith(IGNORED_PREFIXES):
+            self.current.queries.append((sql, params, app_stack()))
+        return execute(sql, params, many, context)
+
+    def violations(self):
+        """Human-readable budget and N+1 violations across all recorded requests."""
+        problems = []
+        for request in self.requests:
+            view_class, action = resolve_endpoint(request.path, request.method)
+            if view_class is None:
+                continue
+            endpoint = f'{request.method} {request.path} ({view_class.__name__}.{action})'
+            budget = getattr(view_class, 'query_budget', {}).get(action)
+            if budget is None:
+                problems.append(f'{endpoint}: no query_budget declared for {action!r}')
+            elif request.count > budget:
+                problems.append(
+                    f'{endpoint}: {request.count} queries, budget {budget}\n'
+                    + '\n'.join(f'    {sql}' for sql, _, _ in request.queries)
+                )
+            for shape, count, stack in request.repeated_shapes():
+                problems.append(
+                    f'{endpoint}: query shape repeated {count} times (N+1?)\n    {shape}\n'
+                    + '\n'.join(f'      at {frame}' for frame in stack)
+                )
+            for sql, count, stack in request.duplicates():
+                problems.append(
+                    f'{endpoint}: identical query ran {count} times\n    {sql}\n'
+                    + '\n'.join(f'      at {frame}' for frame in stack)
+                )
+        return problems
@@ -0,0 +1,161 @@
+"""
+Unit tests for the database connection pool.
+
+The pool only needs a connection's closed, info.transaction_status,
+cursor(), rollback() and close(); FakeConnection provides them without a
+PostgreSQL server.
+"""
+import gc
+import threading
+import time
+
+import pytest
+from config.postgres_pool import pool as pool_module
+from config.postgres_pool.pool import TRANSACTION_IDLE, ConnectionPool, PoolTimeout
+
+INTRANS = 2
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = type('Info', (), {'transaction_status': TRANSACTION_IDLE})()
+        self.broken = False
+        self.queries = 0
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+            def execute(self, sql):
+                if connection.broken:
+                    raise OSError('server closed the connection unexpectedly')
+                connection.queries += 1
+
+        return Cursor()
+
+    def rollback(self):
+        self.info.transaction_status = TRANSACTION_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connect():
+    opened = []
+
+    def factory():
+        connection = FakeConnection()
+        opened.append(connection)
+        return connection
+    factory.opened = opened
+    return factory
+
+
+class TestConnectionPool:
+    """Tests for checkout, return and health checks."""
+
+    def test_reuses_returned_connections(self, connect):
+        """Test a returned connection is handed out again instead of opening another."""
+        pool = ConnectionPool('default', max_size=2)
+        first = pool.getconn(connect)
+        pool.putconn(first)
+        assert pool.getconn(connect) is first
+        assert len(connect.opened) == 1
+        assert pool.stats()['checkouts'] == 2
+
+    def test_bounded_with_timeout(self, connect):
+        """Test checkouts beyond max_size wait for a return, then time out."""
+        pool = ConnectionPool('default', max_size=1, timeout=0.05)
+        held = pool.getconn(connect)
+        with pytest.raises(PoolTimeout):
+            pool.getconn(connect)
+
+        threading.Timer(0.02, pool.putconn, [held]).start()
+        pool.timeout = 1
+        assert pool.getconn(connect) is held
+        stats = pool.stats()
+        assert stats['timeouts'] == 1
+        assert stats['size'] == 1
+        assert stats['wait_seconds'] > 0.01
+        assert sum(stats['wait_buckets']) == stats['checkouts'] == 2
+
+    def test_open_transaction_rolled_back_on_return(self, connect):
+        """Test a connection returned mid-transaction is rolled back before reuse."""
+        pool = ConnectionPool('default', max_size=1)
+        connection = pool.getconn(connect)
+        connection.info.transaction_status = INTRANS
+        pool.putconn(connection)
+        assert connection.info.transaction_status == TRANSACTION_IDLE
+        assert pool.getconn(connect) is connection
+
+    def test_broken_connection_replaced_after_health_check(self, connect):
+        """Test an idle connection that fails SELECT 1 is discarded and a new one opened."""
+        pool = ConnectionPool('default', max_size=1, check_after=0)
+        connection = pool.getconn(connect)
+        pool.putconn(connection)
+        connection.broken = True
+
+        replacement = pool.getconn(connect)
+        assert replacement is not connection
+        assert connection.closed
+        assert pool.stats()['discarded'] == 1
+        assert pool.stats()['size'] == 1
+
+    def test_recently_used_connection_not_checked(self, connect):
+        """Test no health check query runs for connections returned within check_after."""
+        pool = ConnectionPool('default', max_size=1, check_after=60)
+        connection = pool.getconn(connect)
+        pool.putconn(connection)
+        pool.getconn(connect)
+        assert connection.queries == 0
+
+    def test_expired_connections_closed(self, connect):
+        """Test connections past max_lifetime are replaced, and idle ones past max_idle closed."""
+        pool = ConnectionPool('default', max_size=2, max_lifetime=0)
+        connection = pool.getconn(connect)
+        pool.putconn(connection)
+        assert pool.getconn(connect) is not connection
+
+        pool = ConnectionPool('default', max_size=2, max_idle=0.01)
+        connection = pool.getconn(connect)
+        pool.putconn(connection)
+        time.sleep(0.02)
+        pool.getconn(connect)
+        assert connection.closed
+        assert pool.stats()['size'] == 1
+
+    def test_lost_connection_released(self, connect):
+        """Test a checked-out connection that is never returned frees its slot when collected."""
+        pool = ConnectionPool('default', max_size=1, timeout=0.1)
+        pool.getconn(connect)
+        connect.opened.clear()
+        gc.collect()
+        assert pool.stats()['size'] == 0
+        pool.getconn(connect)
+
+    def test_fill_to_min_size(self, connect):
+        """Test fill opens min_size idle connections ahead of use."""
+        pool = ConnectionPool('default', min_size=2, max_size=4)
+        pool.fill(connect)
+        stats = pool.stats()
+        assert (stats['size'], stats['idle'], stats['opened']) == (2, 2, 2)
+
+    def test_new_pool_when_parameters_change(self, connect, monkeypatch):
+        """Test switching an alias to another database retires its pool and closes idle connections."""
+        monkeypatch.setattr(pool_module, 'pools', {})
+        old = pool_module.get_pool('default', (('dbname', 'library'),), {'max_size': 2})
+        connection = old.getconn(connect)
+        old.putconn(connection)
+
+        new = pool_module.get_pool('default', (('dbname', 'test_library'),), {'max_size': 2})
+        assert new is not old
+        assert connection.closed
+        assert pool_module.get_pool('default', (('dbname', 'test_library'),), {}) is new
@@ -0,0 +1,39 @@
+"""
+Unit tests for the password hashing pool.
+"""
+import threading
+
+import pytest
+from django.contrib.auth.hashers import check_password, make_password
+from apps.accounts.hashing import HashingBusy, HashingPool, hash_password
+
+
+class TestHashingPool:
+    """Tests for hashing on the bounded pool."""
+
+    def test_hash_password(self):
+        """Test hashes made on the pool verify."""
+        encoded = hash_password('SecurePass123!')
+        assert check_password('SecurePass123!', encoded)
+
+    def test_full_queue_is_refused(self, settings):
+        """Test requests beyond the pool and its queue get HashingBusy."""
+        settings.PASSWORD_HASH_WORKERS = 1
+        settings.PASSWORD_HASH_QUEUE = 0
+        pool = HashingPool()
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=pool.run, args=(block,))
+        worker.start()
+        started.wait(5)
+        try:
+            with pytest.raises(HashingBusy):
+                pool.run(make_password, 'SecurePass123!')
+        finally:
+            release.set()
+            worker.join()
+        assert check_password('x', pool.run(make_password, 'x'))
@@ -0,0 +1,107 @@
+"""
+Unit tests for the index advisor's statement analysis.
+"""
+from apps.observability.management.commands.index_advisor import (
+    Index, attribute, benefit, propose, trigram_columns,
+)
+
+BOOK_SEARCH = (
+    'SELECT "books"."id", "books"."title" FROM "books" '
+    'WHERE (UPPER("books"."title"::text) LIKE UPPER($1) AND "books"."genre" = $2) '
+    'ORDER BY "books"."created_at" DESC LIMIT $3 /* view=BookViewSet.list */'
+)
+ACTIVE_LOANS = (
+    'SELECT "loans"."id" FROM "loans" INNER JOIN "books" ON ("loans"."book_id" = "books"."id") '
+    'WHERE ("loans"."returned_at" IS NULL AND "loans"."user_id" = $1) ORDER BY "loans"."borrowed_at" DESC'
+)
+
+
+def by_table(proposals):
+    return {(index.table, index.method): index for index in proposals}
+
+
+class TestPropose:
+    """Tests for the indexes proposed for a normalized statement."""
+
+    def test_equality_then_order(self):
+        """Test equality columns lead, followed by the sort column, plus a trigram index for icontains."""
+        proposals = by_table(propose(BOOK_SEARCH))
+        btree = proposals['books', 'btree']
+        assert btree.columns == (('genre', ''), ('created_at', 'DESC'))
+        assert btree.create_sql() == 'CREATE INDEX CONCURRENTLY books_genre_created_at_idx ON books (genre, created_at DESC);'
+        assert proposals['books', 'gin'].create_sql() == (
+            'CREATE INDEX CONCURRENTLY books_upper_title_trgm_idx ON books USING gin (UPPER(title::text) gin_trgm_ops);'
+        )
+
+    def test_ilike_uses_column_trigram_index(self):
+        """Test ILIKE on the bare column gets a trigram index on the column, not on UPPER()."""
+        (index,) = propose('SELECT "books"."id" FROM "books" WHERE "books"."isbn" ILIKE $1')
+        assert index.create_sql() == 'CREATE INDEX CONCURRENTLY books_isbn_trgm_idx ON books USING gin (isbn gin_trgm_ops);'
+
+    def test_is_null_becomes_partial_index(self):
+        """Test IS NULL conditions become the index predicate and join conditions are ignored."""
+        proposals = propose(ACTIVE_LOANS)
+        assert len(proposals) == 1
+        assert proposals[0].create_sql(concurrently=False) == (
+            'CREATE INDEX loans_user_id_borrowed_at_partial_idx ON loans (user_id, borrowed_at DESC) '
+            'WHERE returned_at IS NULL;'
+        )
+
+    def test_range_after_equality(self):
+        """Test a range condition takes the place of the sort column."""
+        sql = (
+            'SELECT "loans"."id" FROM "loans" WHERE ("loans"."book_id" = $1 AND "loans"."borrowed_at" >= $2) '
+            'ORDER BY "loans"."id" ASC'
+        )
+        assert propose(sql)[0].columns == (('book_id', ''), ('borrowed_at', ''))
+
+
+class TestCoverage:
+    """Tests for matching proposals against existing indexes."""
+
+    def test_existing_index_covers_in_any_equality_order(self):
+        """Test an index on the same equality columns in another order covers the proposal."""
+        proposal = Index('loans', [('user_id', ''), ('book_id', '')], equality=2)
+        assert Index('loans', [('book_id', ''), ('user_id', ''), ('returned_at', '')]).covers(proposal)
+        assert not Index('loans', [('book_id', '')]).covers(proposal)
+
+    def test_sort_column_must_follow_equality(self):
+        """Test an index whose columns match but not in sort position does not cover."""
+        proposal = propose(BOOK_SEARCH)[1]
+        assert Index('books', [('genre', ''), ('created_at', '')]).covers(proposal)
+        assert not Index('books', [('created_at', ''), ('genre', '')]).covers(proposal)
+
+    def test_full_index_covers_partial_proposal(self):
+        """Test an index including the IS NULL column serves the partial proposal, a different predicate does not."""
+        proposal = Index('loans', [('user_id', '')], predicate='returned_at IS NULL', equality=1)
+        assert Index('loans', [('user_id', ''), ('returned_at', '')]).covers(proposal)
+        assert Index('loans', [('user_id', '')], predicate='(returned_at IS NULL)').covers(proposal)
+        assert not Index('loans', [('user_id', '')], predicate='(due_date IS NULL)').covers(proposal)
+
+    def test_trigram_expression_index_parsed(self):
+        """Test an existing UPPER() trigram index covers the icontains proposal, a column one does not."""
+        proposal = by_table(propose(BOOK_SEARCH))['books', 'gin']
+        definition = 'CREATE INDEX books_title_upper_trgm ON public.books USING gin (upper((title)::text) gin_trgm_ops)'
+        assert trigram_columns(definition) == ['UPPER(title::text)']
+        assert Index('books', [('UPPER(title::text)', '')], 'gin').covers(proposal)
+        assert not Index('books', [('title', '')], 'gin').covers(proposal)
+
+
+class TestAttribution:
+    """Tests for statement attribution and benefit estimates."""
+
+    def test_tagged_statement(self):
+        """Test the view comment names the view."""
+        assert attribute(BOOK_SEARCH, {}) == 'BookViewSet.list'
+
+    def test_untagged_statement_guessed_from_tables(self):
+        """Test untagged statements list the viewsets of their tables."""
+        viewsets = {'loans': ['LoanViewSet'], 'books': ['BookViewSet']}
+        assert attribute(ACTIVE_LOANS, viewsets) == '~BookViewSet, LoanViewSet'
+        assert attribute('SELECT 1', viewsets) == '~unknown'
+
+    def test_benefit(self):
+        """Test the benefit is the sequential-scan share of the time, scaled by the rows not returned."""
+        # 100 calls, 1000ms, 10 rows each; half the table's scans are sequential and read 1000 rows
+        assert benefit(1000.0, 100, 1000, (50, 50000, 50, 1000)) == 1000.0 * 0.5 * 0.99
+        assert benefit(1000.0, 100, 1000, (0, 0, 50, 1000)) == 0.0
@@ -0,0 +1,30 @@
+"""
+Unit tests for the loan partition naming and bounds helpers.
+"""
+from datetime import date, datetime, timezone
+from apps.loans import partitions
+
+
+class TestPartitionHelpers:
+    """Tests for monthly partition arithmetic."""
+
+    def test_add_months_rolls_over_year(self):
+        """Test month arithmetic across year boundaries."""
+        assert partitions.add_months(date(2025, 11, 1), 3) == date(2026, 2, 1)
+        assert partitions.add_months(date(2025, 1, 1), -1) == date(2024, 12, 1)
+
+    def test_partition_name_round_trip(self):
+        """Test partition names map back to their month."""
+        name = partitions.partition_name(date(2025, 3, 1))
+        assert name == 'loans_p2025_03'
+        assert partitions.partition_month(name) == date(2025, 3, 1)
+
+    def test_default_partition_is_not_monthly(self):
+        """Test the default partition is never treated as a monthly one."""
+        assert partitions.partition_month(partitions.DEFAULT_PARTITION) is None
+
+    def test_partition_bounds(self):
+        """Test bounds cover exactly one calendar month in UTC."""
+        lower, upper = partitions.partition_bounds(date(2025, 12, 1))
+        assert lower == datetime(2025, 12, 1, tzinfo=timezone.utc)
+        assert upper == datetime(2026, 1, 1, tzinfo=timezone.utc)
@@ -0,0 +1,43 @@
+"""
+Unit tests for the sampling profiler.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+
+from apps.observability.profiling import Sampler, folded
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestSampler:
+    """Tests for Sampler and the folded output."""
+
+    def test_samples_target_thread(self):
+        """Test samples are taken from the profiled thread, root frame first."""
+        sampler = Sampler(threading.get_ident(), interval=0.001)
+        sampler.start()
+        spin(0.1)
+        sampler.stop()
+
+        assert sampler.samples > 10
+        assert any(stack[-1].startswith('spin (') for stack in sampler.stacks)
+        assert all(not frame.startswith('Sampler._run') for stack in sampler.stacks for frame in stack)
+
+    def test_restores_switch_interval(self):
+        """Test the interpreter switch interval is put back."""
+        before = sys.getswitchinterval()
+        sampler = Sampler(threading.get_ident(), interval=0.0005)
+        sampler.start()
+        sampler.stop()
+        assert sys.getswitchinterval() == before
+
+    def test_folded_format(self):
+        """Test folded output is one 'root;...;leaf weight' line per stack, heaviest first."""
+        stacks = Counter({('main', 'handler'): 2, ('main', 'handler', 'query'): 5})
+        assert folded(stacks) == 'main;handler;query 5\nmain;handler 2\n'
@@ -0,0 +1,82 @@
+"""
+Unit tests for the per-request query budget instrumentation.
+"""
+import pytest
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from tests.query_budget import RecordedRequest, query_shape
+
+
+def routed_endpoints(patterns=None):
+    """Yield (view class, action) for every class-based view under apps/."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(pattern, URLResolver):
+            yield from routed_endpoints(pattern.url_patterns)
+            continue
+        if not isinstance(pattern, URLPattern):
+            continue
+        view_class = getattr(pattern.callback, 'cls', None)
+        if view_class is None or not view_class.__module__.startswith('apps.'):
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        if actions:
+            for method, action in actions.items():
+                if method in view_class.http_method_names:
+                    yield view_class, action
+        else:
+            for method in view_class.http_method_names:
+                if method not in ('head', 'options') and hasattr(view_class, method):
+                    yield view_class, method
+
+
+class TestQueryBudgetCoverage:
+    """Every endpoint must declare a query budget."""
+
+    def test_all_endpoints_declare_budgets(self):
+        """Test each routed action of each view under apps/ has a budget."""
+        missing = sorted({
+            f'{view_class.__module__}.{view_class.__name__}.{action}'
+            for view_class, action in routed_endpoints()
+            if action not in getattr(view_class, 'query_budget', {})
+        })
+        assert missing == []
+
+
+class TestQueryShapes:
+    """Tests for repeated query detection."""
+
+    def test_in_lists_share_a_shape(self):
+        """Test IN lists of different lengths collapse to one shape."""
+        assert query_shape('SELECT 1 WHERE id IN (%s, %s)') == query_shape('SELECT 1 WHERE id IN (%s)')
+
+    def test_repeated_shape_is_reported(self):
+        """Test a per-row query pattern is flagged with its stack."""
+        request = RecordedRequest('GET', '/api/books/')
+        for book_id in range(3):
+            request.queries.append(('SELECT * FROM reviews WHERE book_id = %s', (book_id,), ['books/views.py:1 list']))
+        request.queries.append(('SELECT COUNT(*) FROM books', (), []))
+
+        [(shape, count, stack)] = request.repeated_shapes()
+        assert count == 3
+        assert 'reviews' in shape
+        assert stack == ['books/views.py:1 list']
+        assert request.duplicates() == []
+
+    def test_identical_query_is_reported(self):
+        """Test the same statement with the same parameters is flagged."""
+        request = RecordedRequest('POST', '/api/loans/borrow/')
+        request.queries.append(('SELECT * FROM books WHERE id = %s', (1,), ['a']))
+        request.queries.append(('SELECT * FROM books WHERE id = %s', (1,), ['b']))
+        assert request.duplicates() == [('SELECT * FROM books WHERE id = %s', 2, ['b'])]
+
+
+@pytest.mark.django_db
+class TestRecorder:
+    """Tests for per-request recording through the test client."""
+
+    def test_user_list_does_not_query_per_row(self, query_budget, authenticated_admin_client, member_user, another_member_user):
+        """Test is_administrator on listed users is served from prefetched groups."""
+        response = authenticated_admin_client.get(reverse('user-list'))
+        assert response.status_code == 200
+        [request] = query_budget.requests
+        assert request.repeated_shapes(threshold=2) == []
+        assert request.count <= 4
@@ -0,0 +1,127 @@
+"""
+Unit tests for the token bucket throttles.
+"""
+import time
+
+import pytest
+from rest_framework.test import APIRequestFactory
+from apps.accounts.throttling import (
+    AuthThrottle, CacheBucketBackend, SQLiteBucketBackend, clear_leases, gcra, parse_rate,
+)
+from apps.loans.management.commands.bench_borrow_concurrency import unthrottled
+
+
+class TestTokenBucket:
+    """Tests for the bucket arithmetic and the shared backends."""
+
+    def test_parse_rate(self):
+        """Test rates use DRF's N/period notation."""
+        assert parse_rate('60/min') == (60, 60.0)
+        assert parse_rate('5/s') == (5, 1.0)
+        assert parse_rate('100/day') == (100, 86400.0)
+
+    def test_gcra_burst_then_refill(self):
+        """Test a full bucket grants its capacity, then one token per interval."""
+        tat = None
+        for _ in range(3):
+            granted, tat, _ = gcra(tat, 100.0, 1, 1.0, 3)
+            assert granted == 1
+        granted, tat, wait = gcra(tat, 100.0, 1, 1.0, 3)
+        assert granted == 0
+        assert wait == pytest.approx(1.0)
+        granted, tat, _ = gcra(tat, 101.0, 1, 1.0, 3)
+        assert granted == 1
+
+    def test_gcra_partial_lease(self):
+        """Test asking for more tokens than are left grants what remains."""
+        granted, tat, _ = gcra(None, 0.0, 2, 1.0, 3)
+        assert granted == 2
+        granted, _, _ = gcra(tat, 0.0, 2, 1.0, 3)
+        assert granted == 1
+
+    def test_gcra_returned_tokens(self):
+        """Test tokens given back are available again without waiting for the refill."""
+        granted, tat, _ = gcra(None, 0.0, 3, 1.0, 3)
+        assert gcra(tat, 0.0, 1, 1.0, 3)[0] == 0
+        granted, tat, _ = gcra(tat, 0.0, 1, 1.0, 3, returned=2)
+        assert granted == 1
+        assert gcra(tat, 0.0, 2, 1.0, 3)[0] == 1
+
+    def test_sqlite_backend_is_shared(self, tmp_path, settings):
+        """Test two backend instances (as in two workers) draw from one bucket."""
+        settings.THROTTLE_SQLITE_PATH = str(tmp_path / 'throttle.sqlite3')
+        first, second = SQLiteBucketBackend(), SQLiteBucketBackend()
+        now = time.time()
+
+        assert first.take('auth:1.2.3.4', 1, 30.0, 2, now)[0] == 1
+        assert second.take('auth:1.2.3.4', 1, 30.0, 2, now)[0] == 1
+        granted, wait = first.take('auth:1.2.3.4', 1, 30.0, 2, now)
+        assert granted == 0
+        assert wait == pytest.approx(30.0)
+        assert second.take('auth:5.6.7.8', 1, 30.0, 2, now)[0] == 1
+
+
+@pytest.fixture
+def auth_rate(settings):
+    """Throttle auth endpoints at 2 requests a minute."""
+    settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'auth': '2/min', 'anon_search': '600/min'}}
+    clear_leases()
+    yield
+    clear_leases()
+
+
+@pytest.mark.django_db
+class TestThrottles:
+    """Tests for throttled endpoints."""
+
+    def test_auth_throttle(self, api_client, member_user, auth_rate):
+        """Test login is limited per client address with Retry-After."""
+        data = {'email': 'member@library.com', 'password': 'MemberPass123!'}
+        assert api_client.post('/api/auth/login/', data).status_code == 200
+        assert api_client.post('/api/auth/login/', data).status_code == 200
+
+        response = api_client.post('/api/auth/login/', data)
+        assert response.status_code == 429
+        assert int(response['Retry-After']) > 0
+
+    def test_anon_search_uses_leases(self, api_client, auth_rate, monkeypatch):
+        """Test anonymous searches spend locally leased tokens between backend calls."""
+        calls = []
+        take = CacheBucketBackend.take
+        monkeypatch.setattr(CacheBucketBackend, 'take', lambda self, *args: calls.append(args) or take(self, *args))
+
+        for _ in range(15):
+            assert api_client.get('/api/books/', {'search': 'gatsby'}).status_code == 200
+        # 600/min leases 10 tokens at a time (one second's refill)
+        assert len(calls) == 2
+        assert api_client.get('/api/books/').status_code == 200
+        assert len(calls) == 2
+
+    def test_slow_scope_admits_paced_requests(self, settings, monkeypatch):
+        """Test 20 logins 1.1s apart fit a 20/min bucket: no tokens are burned in unspent leases."""
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'auth': '20/min'}}
+        clear_leases()
+        now = [time.time()]
+        monkeypatch.setattr('apps.accounts.throttling.time.time', lambda: now[0])
+        throttle, request = AuthThrottle(), APIRequestFactory().post('/api/auth/login/')
+        admitted = []
+        for _ in range(20):
+            admitted.append(throttle.allow_request(request, None))
+            now[0] += 1.1
+        clear_leases()
+        assert all(admitted)
+
+    def test_unscoped_rate_is_not_throttled(self, authenticated_member_client, auth_rate):
+        """Test scopes without a configured rate are not throttled."""
+        for _ in range(5):
+            response = authenticated_member_client.post('/api/loans/borrow/', {'book_id': 999999}, format='json')
+            assert response.status_code != 429
+
+    def test_benchmarks_run_unthrottled(self, api_client, member_user, auth_rate):
+        """Test the in-process benchmarks switch the throttle rates off for their run."""
+        data = {'email': 'member@library.com', 'password': 'MemberPass123!'}
+        with unthrottled():
+            for _ in range(4):
+                assert api_client.post('/api/auth/login/', data).status_code == 200
+        # The run drew no tokens; the rate applies again afterwards
+        assert [api_client.post('/api/auth/login/', data).status_code for _ in range(3)] == [200, 200, 429]